@@ -1,13 +1,89 @@
-from .analyze_clusters import *
-from .clusters import *
-from .contacts import *
-from .data import *
-from .parameters import *
-from .plot import *
-from .policy_updates import *
-from .scenarios import *
-from .user_interface import *
-from .utils import *
+"""
+Submodules are imported when they are first used, rather than all at once, so that processes that only run
+simulations don't import the plotting and analysis code. Everything the submodules define can still be
+accessed from the package, e.g. `covasim_australia.make_people`, which imports `covasim_australia.contacts`.
+"""
 
+import importlib
 import pathlib
-datadir = pathlib.Path(__file__).parent.parent/'data'
\ No newline at end of file
+
+datadir = pathlib.Path(__file__).parent.parent/'data'
+
+# The names each submodule provides at the package level. If a name is defined by several submodules,
+# it is listed under the last of them
+_submodule_names = {
+    'analyze_clusters': [
+        'get_clusters', 'cluster_timeseries', 'get_cluster_timeseries', 'get_cluster_timeseries_2', 'plot_clusters',
+        'get_cluster_graph', 'get_notifications', 'get_clusters_2', 'plot_clusters_2'],
+    'clusters': [
+        'cluster_sizes', 'create_cluster_ids', 'create_clustering', 'sample', 'AliasSample',
+        'sample_household_members', 'make_household_clusters', 'make_sclusters', 'make_wclusters',
+        'make_custom_clusters'],
+    'collate': [
+        'collate_results'],
+    'contacts': [
+        'clusters_to_contacts', 'clusters_to_ids', 'cluster_edges', 'undirected_edges', 'undirected_beta',
+        'GroupLayer', 'check_group_transmission', 'ContactIndex', 'get_contact_index', 'edge_capacity', 'EdgeBuffer', 'make_random_contacts',
+        'rewire_random_contacts', 'make_hcontacts', 'make_scontacts', 'make_lo_high_wcontacts', 'make_wcontacts',
+        'make_custom_contacts', 'convert_contacts', 'make_undirected', 'make_cv_contacts', 'get_uids',
+        'get_numhouseholds', 'get_household_heads', 'make_lo_hi_contacts', 'make_contacts', 'make_people'],
+    'data': [
+        'get_dispersion_parameter', 'read_policies', 'read_popdata', 'read_imported_cases', 'format_daily_tests',
+        'extrapolate_tests', 'read_daily_tests', 'read_epi_data', 'format_epidata', 'subset_epidata',
+        'get_daily_tests', 'get_epi_data', 'read_contact_matrix', 'load_databook', 'read_params',
+        'databook_cache_version', 'databook_key', 'compile_databook', 'load_databook_cached', 'read_data'],
+    'ensemble': [
+        'EnsembleStore', 'result_keys', 'is_complete', 'load_ensemble'],
+    'events': [
+        'EventIndex', 'IndexedPeople', 'people_on'],
+    'infection_log': [
+        'InfectionLog', 'get_infection_log'],
+    'parameters': [
+        'Parameters', 'setup_params'],
+    'plot': [
+        'plot_scens'],
+    'policy_updates': [
+        'PolicySchedule', 'beta_timelines', 'read_layer_betas', 'LayerBetaTimeline', 'AppBasedTracing',
+        'UpdateNetworks', 'GroupTransmission', 'check_policy_changes', 'turn_off_policies', 'turn_on_policies',
+        'replace_policies', 'make_tracing'],
+    'population': [
+        'cache_version', 'population_inputs', 'population_key', 'make_people_cached', 'save_people_arrays',
+        'load_people_arrays', 'load_popfile', 'save_popfile', 'check_popfile'],
+    'runner': [
+        'run_msim', 'run_batch'],
+    'scenarios': [
+        'set_baseline', 'create_scen', 'create_scens', 'define_scenarios'],
+    'sweep': [
+        'expand_grid', 'task_id', 'SweepManifest', 'run_sweep'],
+    'user_interface': [
+        'policy_plot', 'setup_scens', 'run_scens'],
+    'utils': [
+        'get_ndays', 'epi_data_url', 'colnames', 'get_file_paths', 'set_rand_seed', 'par_keys', 'metapar_keys',
+        'extrapar_keys', 'layerchar_keys', 'get_dynamic_lkeys', 'get_default_lkeys', 'get_all_lkeys',
+        'get_custom_lkeys', 'get_lkeys', 'clean_pars', 'clean_calibration_end', 'policy_plot2', 'SeedInfection',
+        'generate_seed_infection_dict', 'DynamicTrigger', 'test_prob_with_quarantine', 'limited_contact_tracing',
+        'NotificationLog', 'limited_contact_tracing_2', 'story', 'result_df', 'save_csv', 'get_individual_traces',
+        'get_ensemble_trace', 'detect_outbreak', 'detect_first_case', 'detect_first_case_less_equal_than',
+        'detect_zeros', 'detect_outbreak_case', 'detect_outbreak_batch', 'detect_first_case_batch',
+        'detect_first_case_less_equal_than_batch', 'detect_zeros_batch', 'calculate_first_case_stats_batch',
+        'calculate_outbreak_stats_batch', 'calculate_sct_supression_batch', 'calculate_sct_dies_off_batch',
+        'calculate_first_case_stats', 'calculate_outbreak_stats', 'calculate_sct_supression',
+        'calculate_sct_dies_off'],
+}
+_name_submodules = {name: submodule for submodule, names in _submodule_names.items() for name in names}
+
+__all__ = ['datadir'] + list(_name_submodules)
+
+
+def __getattr__(name):
+    if name in _submodule_names:
+        return importlib.import_module(f'{__name__}.{name}')
+    elif name in _name_submodules:
+        value = getattr(importlib.import_module(f'{__name__}.{_name_submodules[name]}'), name)
+        globals()[name] = value  # Don't look it up again
+        return value
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_submodule_names) | set(_name_submodules))
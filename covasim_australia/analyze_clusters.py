@@ -1,7 +1,11 @@
 import covasim as cv
+import matplotlib.pyplot as plt
+import numba as nb
 import numpy as np
+import sciris as sc
 from functools import partial
 # import outbreak
+import covasim_australia.infection_log as il
 import covasim_australia.utils as utils
 import networkx as nx
 
@@ -45,13 +49,11 @@ def get_clusters(sim: cv.Sim, t: int) -> dict:
 
     G = nx.DiGraph()
 
-    for infection in sim.people.infection_log:
-        # if infection['date'] > t:
-        #     break
-        ind = infection['target']
+    infection_log = il.get_infection_log(sim.people)
+    for source, ind, date in zip(infection_log.source.tolist(), infection_log.target.tolist(), infection_log.date.tolist()):
         G.add_node(ind, date_known_contact=sim.people.date_known_contact[ind],date_diagnosed=sim.people.date_diagnosed[ind])
-        if infection['source'] is not None:
-            G.add_edge(infection['source'], infection['target'], date=infection['date'])
+        if source >= 0:
+            G.add_edge(source, ind, date=date)
 
     def filter_diagnosed_nodes(n1, G, t):
         # Return True if the person was diagnosed by day t
@@ -63,7 +65,7 @@ def get_clusters(sim: cv.Sim, t: int) -> dict:
         return G.nodes[n2]['date_known_contact'] <= t
 
     # diagnosed_graph = nx.subgraph_view(G,partial(filter_diagnosed_nodes,G=G,t=t)) # Include everyone diagnosed but don't filter by tracing
-    traced_graph = nx.subgraph_view(G,partial(filter_diagnosed_nodes,G=G,t=t),partial(filter_known_edges,G=G,t=t)) # Filter by both diagnosis and tracing
+    traced_graph = nx.subgraph_view(G,filter_node=partial(filter_diagnosed_nodes,G=G,t=t),filter_edge=partial(filter_known_edges,G=G,t=t)) # Filter by both diagnosis and tracing
 
     clusters = {}
     for cluster in nx.weakly_connected_components(traced_graph):
@@ -80,6 +82,168 @@ def get_clusters(sim: cv.Sim, t: int) -> dict:
 
     return clusters
 
+@nb.njit
+def _find(parent, i):
+    root = i
+    while parent[root] != root:
+        root = parent[root]
+    while parent[i] != root:  # Path compression
+        next_i = parent[i]
+        parent[i] = root
+        i = next_i
+    return root
+
+
+@nb.njit
+def _track_clusters(node_day, node_key, edge_a, edge_b, edge_day, npts, directed):
+    # Union-find over nodes and edges added in order of the day they become visible
+    n = len(node_day)
+    parent = np.arange(n)
+    size = np.zeros(n, dtype=np.int64)
+    label = np.arange(n)  # Label of the cluster, stored at its root
+    node_order = np.argsort(node_day, kind='mergesort')
+    row = np.full(n, -1, dtype=np.int64)  # Row of the output for each node that is ever visible
+    n_visible = 0
+    for node in node_order:
+        if node_day[node] < npts:
+            row[node] = n_visible
+            n_visible += 1
+    sizes = np.zeros((n_visible, npts), dtype=np.int32)  # Size of the cluster labelled by each visible node on each day
+
+    edge_order = np.argsort(edge_day, kind='mergesort')
+    active = np.zeros(n, dtype=np.int64)  # Visible nodes, in the order they were added
+    n_active = 0
+    i_node = 0
+    i_edge = 0
+    for t in range(npts):
+        while i_node < n and node_day[node_order[i_node]] <= t:
+            node = node_order[i_node]
+            size[node] = 1
+            active[n_active] = node
+            n_active += 1
+            i_node += 1
+        while i_edge < len(edge_order) and edge_day[edge_order[i_edge]] <= t:
+            k = edge_order[i_edge]
+            i_edge += 1
+            root_a = _find(parent, edge_a[k])
+            root_b = _find(parent, edge_b[k])
+            if root_a == root_b:
+                continue
+            if directed:
+                # The target joins the cluster of the source, so the source's label is kept
+                new_label = label[root_a]
+            elif node_key[label[root_b]] < node_key[label[root_a]] or (node_key[label[root_b]] == node_key[label[root_a]] and label[root_b] < label[root_a]):
+                new_label = label[root_b]
+            else:
+                new_label = label[root_a]
+            if size[root_a] < size[root_b]:
+                root_a, root_b = root_b, root_a
+            parent[root_b] = root_a
+            size[root_a] += size[root_b]
+            label[root_a] = new_label
+        for j in range(n_active):
+            node = active[j]
+            if parent[node] == node:
+                sizes[row[label[node]], t] = size[node]
+    return row, sizes
+
+
+def cluster_timeseries(node_day, edge_a, edge_b, edge_day, npts, directed=True, node_key=None) -> np.ndarray:
+    """
+    Calculate the size of every cluster on every day in one pass
+
+    Nodes and edges become visible on the day given for them, and a cluster is a connected component of the
+    visible graph. Nodes and edges are added to a union-find structure in date order, so this takes about the same
+    time as building the graph once, rather than building and searching it again for each day.
+
+    Args:
+        node_day: Array with the day each node becomes visible, or a value >= npts if it never does
+        edge_a: Array of the first node of each edge (e.g. the source of an infection)
+        edge_b: Array of the second node of each edge
+        edge_day: Array with the day each edge becomes visible, which should be no earlier than both its nodes
+        npts: Number of days
+        directed: If True, each edge connects node b to the cluster of node a, which keeps its label, so clusters
+                  are labelled by their root node. Otherwise, clusters are labelled by the node with the smallest key
+        node_key: Array with the key of each node if directed=False, ties are broken by the node index
+
+    Returns: - Array with the row of `sizes` for each node, or -1 for nodes that are never visible
+             - A (rows, days) array with the size of the cluster labelled by each visible node on each day, or 0 if
+               no cluster had that label
+    """
+    node_day = np.asarray(node_day, dtype=np.int64)
+    if node_key is None:
+        node_key = np.zeros(len(node_day))
+    return _track_clusters(node_day, np.asarray(node_key, dtype=np.float64), np.asarray(edge_a, dtype=np.int64),
+                           np.asarray(edge_b, dtype=np.int64), np.asarray(edge_day, dtype=np.int64), npts, directed)
+
+
+def _visible_day(dates, npts):
+    # Day on which something dated `dates` becomes visible, or npts if never
+    days = np.full(len(dates), npts, dtype=np.int64)
+    known = np.isfinite(dates)
+    days[known] = np.clip(np.ceil(dates[known]), 0, npts)
+    return days
+
+
+def _cluster_sizes_dict(people, row, sizes):
+    labels = people[row >= 0][np.argsort(row[row >= 0])]  # Person for each row
+    return {int(labels[i]): sizes[i].astype(float) for i in np.nonzero(sizes.any(axis=1))[0]}
+
+
+def get_cluster_timeseries(sim: cv.Sim) -> dict:
+    """
+    Return the size of every cluster from get_clusters() on every day of the simulation
+
+    This gives the same result as calling get_clusters() for every day, without building the cluster graph
+    for each day.
+
+    Args:
+        sim: A cv.Sim that has been run
+
+    Returns: {person_index: array of cluster sizes}, for every person that labels a cluster on at least one day
+    """
+    infection_log = il.get_infection_log(sim.people)
+    people = np.unique(np.concatenate([infection_log.target, infection_log.source[infection_log.source >= 0]]))
+    diagnosed = _visible_day(sim.people.date_diagnosed[people], sim.npts)
+
+    # An infection is visible once both people are diagnosed and the target is known to be a contact
+    has_source = infection_log.source >= 0
+    edge_a = np.searchsorted(people, infection_log.source[has_source])
+    edge_b = np.searchsorted(people, infection_log.target[has_source])
+    known = _visible_day(sim.people.date_known_contact[infection_log.target[has_source]], sim.npts)
+    edge_day = np.maximum.reduce([diagnosed[edge_a], diagnosed[edge_b], known])
+
+    row, sizes = cluster_timeseries(diagnosed, edge_a, edge_b, edge_day, sim.npts, directed=True)
+    return _cluster_sizes_dict(people, row, sizes)
+
+
+def get_cluster_timeseries_2(sim: cv.Sim) -> dict:
+    """
+    Return the size of every cluster from get_clusters_2() on every day of the simulation
+
+    Clusters are connected by the notifications recorded by utils.limited_contact_tracing_2, and labelled by their
+    earliest diagnosed member.
+
+    Args:
+        sim: A cv.Sim that has been run with utils.limited_contact_tracing_2
+
+    Returns: {person_index: array of cluster sizes}, for every person that labels a cluster on at least one day
+    """
+    notifier, notified, date_notified = get_notifications(sim)
+    infection_log = il.get_infection_log(sim.people)
+    people = np.unique(np.concatenate([infection_log.target, infection_log.source[infection_log.source >= 0]]))
+    diagnosed = _visible_day(sim.people.date_diagnosed[people], sim.npts)
+
+    # Only notifications between infected people connect clusters
+    is_edge = np.isin(notifier, people) & np.isin(notified, people)
+    edge_a = np.searchsorted(people, notifier[is_edge])
+    edge_b = np.searchsorted(people, notified[is_edge])
+    edge_day = np.maximum.reduce([diagnosed[edge_a], diagnosed[edge_b], _visible_day(date_notified[is_edge], sim.npts)])
+
+    row, sizes = cluster_timeseries(diagnosed, edge_a, edge_b, edge_day, sim.npts, directed=False, node_key=sim.people.date_diagnosed[people])
+    return _cluster_sizes_dict(people, row, sizes)
+
+
 def plot_clusters(sim: cv.Sim, max_clusters=200):
     """
     Plot clusters for a simulation
@@ -97,13 +261,7 @@ def plot_clusters(sim: cv.Sim, max_clusters=200):
 
     """
 
-    cluster_sizes = {i: np.zeros(sim.npts) for i in range(sim.n)}
-    for t in range(sim.npts):
-        clusters = get_clusters(sim, t)
-        for idx, members in clusters.items():
-            cluster_sizes[idx][t] = len(members)
-
-    cluster_sizes = {k:v for k,v in cluster_sizes.items() if np.any(v)}
+    cluster_sizes = get_cluster_timeseries(sim)
 
     if len(cluster_sizes) == 0:
         raise Exception('No clusters were found (not enough infections?)')
@@ -141,28 +299,41 @@ def get_cluster_graph(sim: cv.Sim) -> nx.DiGraph():
 
     infections = nx.DiGraph()
 
-    for infection in sim.people.infection_log:
-        ind = infection['target']
+    infection_log = il.get_infection_log(sim.people)
+    for source, ind, date in zip(infection_log.source.tolist(), infection_log.target.tolist(), infection_log.date.tolist()):
         infections.add_node(ind, date_known_contact=sim.people.date_known_contact[ind],date_diagnosed=sim.people.date_diagnosed[ind])
-        if infection['source'] is not None:
-            infections.add_edge(infection['source'], infection['target'], date=infection['date'])
+        if source >= 0:
+            infections.add_edge(source, ind, date=date)
 
-    try:
-        iv = [x for x in sim.pars['interventions'] if isinstance(x, utils.limited_contact_tracing_2)][0]
-    except IndexError as e:
-        raise Exception('This function can only be used with utils.limited_contact_tracing_2 which records notifications')
-    notifications = iv.notifications.copy()
+    notifier, notified, date_notified = get_notifications(sim)
 
     # The cluster graph consists of diagnosed nodes and traced edges
     G = nx.create_empty_copy(infections)
     G.add_nodes_from(infections)
-    for edge in notifications.edges():
+    for edge in zip(notifier.tolist(), notified.tolist(), date_notified.tolist()):
         if edge[0] in G and edge[1] in G:
-            G.add_edge(*edge, date_notified=notifications.edges[edge]['t'])
+            G.add_edge(edge[0], edge[1], date_notified=edge[2])
 
     return G
 
 
+def get_notifications(sim: cv.Sim):
+    """
+    Return the notifications recorded by utils.limited_contact_tracing_2
+
+    Args:
+        sim: A cv.Sim that has been run with utils.limited_contact_tracing_2
+
+    Returns: Arrays of the person who was traced, the contact who was notified, and the day they were first notified
+    """
+    try:
+        iv = [x for x in sim.pars['interventions'] if isinstance(x, utils.limited_contact_tracing_2)][0]
+    except IndexError as e:
+        raise Exception('This function can only be used with utils.limited_contact_tracing_2 which records notifications')
+    notifier, notified, date_notified, _ = iv.notifications.first()
+    return notifier.astype(np.int64), notified.astype(np.int64), date_notified.astype(np.float64)
+
+
 def get_clusters_2(G: nx.DiGraph, t: int) -> dict:
     """
     Get observed infection clusters
@@ -185,7 +356,7 @@ def get_clusters_2(G: nx.DiGraph, t: int) -> dict:
         # Two diagnosed cases are connected if a contact took place between them
         return G.edges[n1,n2]['date_notified'] <= t
 
-    traced_graph = nx.subgraph_view(G,partial(filter_diagnosed_nodes,G=G,t=t),partial(filter_known_edges,G=G,t=t)) # Filter by both diagnosis and tracing
+    traced_graph = nx.subgraph_view(G,filter_node=partial(filter_diagnosed_nodes,G=G,t=t),filter_edge=partial(filter_known_edges,G=G,t=t)) # Filter by both diagnosis and tracing
 
     label = lambda nodes: min(nodes,key=lambda node: (traced_graph.nodes[node]['date_diagnosed'], node))
     return {label(cluster):cluster for cluster in nx.weakly_connected_components(traced_graph)}
@@ -199,15 +370,7 @@ def plot_clusters_2(sim: cv.Sim, max_clusters=200):
 
     """
 
-    G = get_cluster_graph(sim)
-
-    cluster_sizes = {i: np.zeros(sim.npts) for i in range(sim.n)}
-    for t in range(sim.npts):
-        clusters = get_clusters_2(G, t)
-        for idx, members in clusters.items():
-            cluster_sizes[idx][t] = len(members)
-
-    cluster_sizes = {k:v for k,v in cluster_sizes.items() if np.any(v)}
+    cluster_sizes = get_cluster_timeseries_2(sim)
 
     if len(cluster_sizes) == 0:
         raise Exception('No clusters were found (not enough infections?)')
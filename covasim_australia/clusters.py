@@ -2,30 +2,67 @@ import covasim.utils as cvu
 import numpy as np
 import numba as nb
 
-def create_clustering(people_to_cluster, mean_cluster_size):
+def cluster_sizes(n_people, mean_cluster_size):
     """
-    Return random clustering of people
+    Return random cluster sizes that add up to n_people
+
+    Sizes are drawn from a Poisson distribution in batches, the last cluster is
+    truncated so that the total is n_people, and empty clusters are dropped.
 
     Args:
-        people_to_cluster: Indexes of people to cluster e.g. [1,5,10,12,13]
+        n_people: Number of people to cluster
         mean_cluster_size: Mean cluster size (poisson distribution)
 
-    Returns: List of lists of clusters e.g. [[1,5],[10,12,13]]
+    Returns: Array of cluster sizes
     """
+    if n_people == 0:
+        return np.zeros(0, dtype=int)
+    if mean_cluster_size <= 0:
+        raise Exception(f'Mean cluster size must be positive, not {mean_cluster_size}')
 
-    # people_to_cluster = np.random.permutation(people_to_cluster) # Optionally shuffle people to cluster - in theory not necessary?
-    clusters = []
-    n_people = len(people_to_cluster)
+    sizes = []
     n_remaining = n_people
-
     while n_remaining > 0:
-        this_cluster = cvu.poisson(mean_cluster_size)  # Sample the cluster size
-        if this_cluster > n_remaining:
-            this_cluster = n_remaining
-        clusters.append(people_to_cluster[(n_people-n_remaining)+np.arange(this_cluster)].tolist())
-        n_remaining -= this_cluster
+        n_draws = int(n_remaining/mean_cluster_size + 3*np.sqrt(n_remaining/mean_cluster_size)) + 1  # Usually enough clusters in one draw
+        these_sizes = np.random.poisson(mean_cluster_size, n_draws)
+        these_sizes = these_sizes[these_sizes > 0]
+        n_clusters = np.searchsorted(np.cumsum(these_sizes), n_remaining) + 1  # Clusters needed to reach n_remaining
+        these_sizes = these_sizes[:n_clusters]
+        sizes.append(these_sizes)
+        n_remaining -= these_sizes.sum()
 
-    return clusters
+    sizes = np.concatenate(sizes)
+    sizes[-1] += n_remaining  # n_remaining <= 0, truncate the last cluster
+    return sizes
+
+
+def create_cluster_ids(n_people, mean_cluster_size):
+    """
+    Return random clustering of people as cluster IDs
+
+    Args:
+        n_people: Number of people to cluster
+        mean_cluster_size: Mean cluster size (poisson distribution)
+
+    Returns: Array with the cluster ID of each person e.g. [0,0,1,1,1], for use with contacts.cluster_edges()
+    """
+    sizes = cluster_sizes(n_people, mean_cluster_size)
+    return np.repeat(np.arange(len(sizes)), sizes)
+
+
+def create_clustering(people_to_cluster, mean_cluster_size):
+    """
+    Return random clustering of people
+
+    Args:
+        people_to_cluster: Indexes of people to cluster e.g. [1,5,10,12,13]
+        mean_cluster_size: Mean cluster size (poisson distribution)
+
+    Returns: List of lists of clusters e.g. [[1,5],[10,12,13]]
+    """
+    people_to_cluster = np.asarray(people_to_cluster)
+    sizes = cluster_sizes(len(people_to_cluster), mean_cluster_size)
+    return [cluster.tolist() for cluster in np.split(people_to_cluster, np.cumsum(sizes)[:-1])] if len(sizes) else []
 
 ## Fast choice implementation
 # From https://gist.github.com/jph00/30cfed589a8008325eae8f36e2c5b087
@@ -70,21 +107,36 @@ class AliasSample():
         return sample(n,self.q,self.J,r1,r2)
 
 
-def sample_household_cluster(sampler, bin_lower, bin_upper, reference_age, n):
-    """
-    Return list of ages in a household/location based on mixing matrix and reference person age
+def sample_household_members(sampler, bin_lower, bin_upper, reference_ages, n):
     """
+    Return ages of the other members of households/locations of size `n`, based on mixing matrix and reference person ages
 
-    ages = [reference_age]  # The reference person is in the household/location
+    All households of the same size are sampled together, with one draw from the alias sampler for
+    each reference age bin
 
-    if n > 1:
-        idx = np.digitize(reference_age, bin_lower) - 1  # First, find the index of the bin that the reference person belongs to
-        sampled_bins = sampler[idx].draw_n(n-1)
+    Args:
+        sampler: List of AliasSample instances, one for each reference age bin
+        bin_lower: Lower age of each bin
+        bin_upper: Upper age of each bin
+        reference_ages: Array with the age of the reference person in each household
+        n: Number of people in each household (including the reference person)
+
+    Returns: Array of shape (len(reference_ages), n-1) with the ages of everyone except the reference person
+
+    """
+    ages = np.zeros((len(reference_ages), n-1), dtype=int)
 
-        for bin in sampled_bins:
-            ages.append(int(round(np.random.uniform(bin_lower[bin]-0.5, bin_upper[bin]+0.5))))
+    if n > 1:
+        bin_lower = np.asarray(bin_lower)
+        bin_upper = np.asarray(bin_upper)
+        idx = np.digitize(reference_ages, bin_lower) - 1  # First, find the index of the bin that each reference person belongs to
+        for ref_bin in np.unique(idx):
+            households = idx == ref_bin
+            sampled_bins = sampler[ref_bin].draw_n(np.count_nonzero(households)*(n-1))
+            sampled_ages = np.round(np.random.uniform(bin_lower[sampled_bins]-0.5, bin_upper[sampled_bins]+0.5))
+            ages[households] = sampled_ages.reshape(-1, n-1)
 
-    return np.array(ages)
+    return ages
 
 
 def make_household_clusters(n_households, pop_size, household_heads, uids, contact_matrix):
@@ -94,8 +146,7 @@ def make_household_clusters(n_households, pop_size, household_heads, uids, conta
     :param pop_size:
     :param household_heads:
     :return:
-        h_clusters: a list of lists in which each sublist contains
-                    the IDs of the people who live in a specific household
+        household_ids: array with the household that each person lives in, corresponding to the UID positions
         ages: flattened array of ages, corresponding to the UID positions
     """
     mixing_matrix = contact_matrix['matrix']
@@ -105,51 +156,61 @@ def make_household_clusters(n_households, pop_size, household_heads, uids, conta
     age_lb = contact_matrix['age_lb']
     age_ub = contact_matrix['age_ub']
 
-    h_clusters = []
+    household_ids = np.zeros(pop_size, dtype=int)
     ages = np.zeros(pop_size, dtype=int)
     h_added = 0
     p_added = 0
 
-    for h_size, h_num in n_households.iteritems():
-        for household in range(h_num):
-            head = household_heads[h_added]
-            # get ages of people in household
-            household_ages = sample_household_cluster(samplers,
-                                                      age_lb,
-                                                      age_ub,
-                                                      head,
-                                                      h_size)
-            # add ages to ages array
-            ub = p_added + h_size
-            ages[p_added:ub] = household_ages
-            # get associated UID that defines a household cluster
-            h_ids = uids[p_added:ub]
-            h_clusters.append(h_ids)
-            # increment sliding windows
-            h_added += 1
-            p_added += h_size
-    return h_clusters, ages
+    for h_size, h_num in n_households.items():
+        if h_num == 0:
+            continue
+        ub = p_added + h_size*h_num
+        # people in households of this size are stored contiguously, one household per row
+        household_ages = ages[p_added:ub].reshape(h_num, h_size)
+        household_ages[:, 0] = household_heads[h_added:h_added+h_num]
+        household_ages[:, 1:] = sample_household_members(samplers,
+                                                         age_lb,
+                                                         age_ub,
+                                                         household_ages[:, 0],
+                                                         h_size)
+        household_ids[p_added:ub] = np.repeat(np.arange(h_added, h_added+h_num), h_size)
+        # increment sliding windows
+        h_added += h_num
+        p_added = ub
+    return household_ids, ages
 
 
 def make_sclusters(uids, ages, s_contacts):
-    # filter UIDs array so that it only contains children between ages 5-18
-    classrooms = []
-    for age in range(5, 18):
-        age_idx = ages == age
-        children_thisage = uids[age_idx]
-        classrooms.extend(create_clustering(children_thisage, s_contacts))
-    for i in range(len(classrooms)):
-        adult_idx = ages > 18
-        adult_uid = [np.random.choice(uids[adult_idx])]
-        classrooms[i].extend(adult_uid)
-    return classrooms
+    """
+    Cluster children into classrooms by age, with one adult (teacher) in each classroom
+
+    Returns: - Array of people in classrooms
+             - Array of the classroom ID of each of them
+    """
+    # children aged 5-17, sorted so each age cohort is contiguous
+    is_child = (ages >= 5) & (ages < 18)
+    children = uids[is_child][np.argsort(ages[is_child], kind='stable')]
+    cohort_sizes = np.bincount(ages[is_child].astype(int) - 5, minlength=13)
+
+    # classrooms never span two cohorts, so cluster each cohort separately and number the classrooms consecutively
+    sizes = np.concatenate([cluster_sizes(n, s_contacts) for n in cohort_sizes])
+    n_classrooms = len(sizes)
+    classroom_ids = np.repeat(np.arange(n_classrooms), sizes)
+
+    teachers = np.random.choice(uids[ages > 18], n_classrooms)
+    return np.concatenate([children, teachers]), np.concatenate([classroom_ids, np.arange(n_classrooms)])
 
 
 def make_wclusters(uids, ages, w_contacts):
+    """
+    Cluster working age adults into workplaces
+
+    Returns: - Array of people in workplaces
+             - Array of the workplace ID of each of them
+    """
     work_idx = np.logical_and(ages > 18, ages <= 65)
     work_uids = uids[work_idx]
-    workplace_clusters = create_clustering(work_uids, w_contacts)
-    return workplace_clusters
+    return work_uids, create_cluster_ids(len(work_uids), w_contacts)
 
 
 def make_custom_clusters(uids, pop_size, ages, custom_lkeys, pop_proportion, age_lb, age_ub):
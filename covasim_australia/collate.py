@@ -0,0 +1,102 @@
+import json
+import multiprocessing as mp
+import os
+import pandas as pd
+import pathlib
+
+
+def _read_result(args):
+    fname, path, reader = args
+    frame = reader(path)
+    frame['source_file'] = fname
+    return frame
+
+
+def _read_summary(summary_file):
+    if summary_file.suffix == '.parquet':
+        return pd.read_parquet(summary_file)
+    return pd.read_pickle(summary_file)
+
+
+def _write_summary(summary, summary_file, filename):
+    # Written to `filename`, in the format given by the name of `summary_file`
+    if summary_file.suffix == '.parquet':
+        summary.to_parquet(filename)
+    else:
+        summary.to_pickle(filename)
+
+
+def collate_results(results_path, summary_file, pattern='*.csv', ncpus=None, reader=pd.read_csv, exclude=None, verbose=True):
+    """
+    Collate per-job result files into a single table, reading only new or changed files
+
+    All files matching `pattern` anywhere under `results_path` are read with
+    `reader` in a process pool and concatenated, with a 'source_file' column
+    giving the path of each file relative to `results_path`. Each row keeps
+    the index it had in its file, like pd.concat() of the files would give.
+    The table is saved to `summary_file`, along with a manifest
+    (`<summary_file>.manifest.json`) of the modification time of every file
+    read. Calling this again only reads the files that were added or modified
+    since, and drops the rows of files that were deleted.
+
+    Args:
+        results_path: The root of the results tree
+        summary_file: The file to save the collated table to, as parquet (a columnar format, needs pyarrow) if
+                      its name ends in '.parquet' and as a pickled DataFrame otherwise
+        pattern: Glob pattern of the result files, searched recursively
+        ncpus: Number of processes used to read the files, defaults to the number of CPUs
+        reader: Function that reads a result file into a DataFrame, must be picklable (e.g. not a lambda)
+        exclude: Optionally, a list of paths to skip, e.g. a CSV copy of the summary
+        verbose: Print how many files were read
+
+    Returns: The collated DataFrame. Drop its 'source_file' column to get the same table as concatenating the files
+    """
+    results_path = pathlib.Path(results_path)
+    summary_file = pathlib.Path(summary_file)
+    manifest_file = summary_file.with_name(summary_file.name + '.manifest.json')
+    exclude = {pathlib.Path(x).resolve() for x in (exclude or [])} | {summary_file.resolve()}
+
+    if summary_file.exists() and manifest_file.exists():
+        summary = _read_summary(summary_file)
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+    else:
+        summary = None
+        manifest = {}
+
+    files = {}
+    for path in sorted(results_path.rglob(pattern)):
+        if path.resolve() not in exclude:
+            files[str(path.relative_to(results_path))] = path.stat().st_mtime
+
+    changed = [fname for fname, mtime in files.items() if manifest.get(fname) != mtime]
+    removed = [fname for fname in manifest if fname not in files]
+    if verbose:
+        print(f'Collating {len(files)} files: {len(changed)} new or modified, {len(removed)} removed')
+    if summary is not None and not changed and not removed:
+        return summary
+
+    frames = []
+    if summary is not None:
+        frames.append(summary[~summary['source_file'].isin(changed + removed)])
+    if changed:
+        tasks = [(fname, results_path/fname, reader) for fname in changed]
+        if ncpus == 1 or len(tasks) == 1:
+            frames.extend(map(_read_result, tasks))
+        else:
+            with mp.Pool(ncpus) as pool:
+                frames.extend(pool.imap(_read_result, tasks, chunksize=max(1, len(tasks)//(4*(ncpus or os.cpu_count())))))
+
+    if frames:
+        summary = pd.concat(frames).sort_values('source_file', kind='stable')
+    else:
+        summary = pd.DataFrame({'source_file': []})
+
+    # Save the table before the manifest, so an interrupted run at worst re-reads some files next time
+    tmp_file = summary_file.with_name(summary_file.name + f'.{os.getpid()}.tmp')
+    _write_summary(summary, summary_file, tmp_file)
+    os.replace(tmp_file, summary_file)
+    with open(manifest_file, 'w') as f:
+        json.dump(files, f)
+
+    return summary
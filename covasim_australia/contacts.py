@@ -1,4 +1,6 @@
 import covasim_australia.clusters as cl
+import covasim_australia.events as ev
+import covasim_australia.infection_log as il
 import collections
 import covasim as cv
 import covasim.defaults as cvd
@@ -30,6 +32,374 @@ def clusters_to_contacts(clusters):
     return {x: np.array(list(y)) for x, y in contacts.items()}
 
 
+@nb.njit
+def _get_cluster_edges(members, offsets):
+    # Emit every ordered pair of distinct positions within each cluster. `members` is sorted by
+    # cluster, and cluster `i` occupies members[offsets[i]:offsets[i+1]]
+    sizes = offsets[1:] - offsets[:-1]
+    n_edges = np.sum(sizes * (sizes - 1))
+
+    count = 0
+    p1 = np.zeros((n_edges,), dtype=cvd.default_int)
+    p2 = np.zeros((n_edges,), dtype=cvd.default_int)
+    for c in range(len(sizes)):
+        for i in range(offsets[c], offsets[c+1]):
+            for j in range(offsets[c], offsets[c+1]):
+                if i != j:
+                    p1[count] = members[i]
+                    p2[count] = members[j]
+                    count += 1
+
+    return p1, p2
+
+
+def clusters_to_ids(clusters):
+    """
+    Convert a list of clusters to cluster assignment arrays
+
+    Clusters [[1,2,3],[4,5]] would result in
+        inds = [1,2,3,4,5]
+        cluster_ids = [0,0,0,1,1]
+
+    """
+    sizes = np.array([len(cluster) for cluster in clusters], dtype=cvd.default_int)
+    if len(clusters):
+        inds = np.concatenate(clusters).astype(cvd.default_int)
+    else:
+        inds = np.zeros(0, dtype=cvd.default_int)
+    cluster_ids = np.repeat(np.arange(len(clusters), dtype=cvd.default_int), sizes)
+    return inds, cluster_ids
+
+
+def cluster_edges(inds, cluster_ids):
+    """
+    Convert cluster assignments to an edge list
+
+    This is the array equivalent of `clusters_to_contacts`. Everyone in a cluster is connected
+    to everyone else in the same cluster, in both directions. For instance, a cluster of people
+    [1,2,3] would result in edges
+
+        p1 = [1,1,2,2,3,3]
+        p2 = [2,3,1,3,1,2]
+
+    If a person appears more than once (e.g. a teacher assigned to several classrooms, or
+    custom layers sampled with replacement) then self-contacts and duplicate edges are removed,
+    so the edges are the same as the contacts returned by `clusters_to_contacts`.
+
+    Args:
+        inds: Array of person indexes
+        cluster_ids: Array the same length as `inds` with the (non-negative integer) cluster each person belongs to
+
+    Returns: Tuple of arrays (p1, p2)
+
+    """
+    inds = np.asarray(inds, dtype=cvd.default_int)
+    cluster_ids = np.asarray(cluster_ids, dtype=np.int64)
+    if not len(inds):
+        return np.zeros(0, dtype=cvd.default_int), np.zeros(0, dtype=cvd.default_int)
+
+    order = np.argsort(cluster_ids, kind='stable')
+    members = inds[order]
+    offsets = np.zeros(cluster_ids.max() + 2, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(cluster_ids))
+
+    p1, p2 = _get_cluster_edges(members, offsets)
+
+    if len(np.unique(inds)) < len(inds):
+        # Someone belongs to more than one cluster (or appears twice in one) so drop self-contacts and duplicates
+        keep = p1 != p2
+        key = p1[keep].astype(np.int64) * (inds.max() + 1) + p2[keep]
+        key = np.unique(key)
+        p1 = (key // (inds.max() + 1)).astype(cvd.default_int)
+        p2 = (key % (inds.max() + 1)).astype(cvd.default_int)
+
+    return p1, p2
+
+
+def undirected_edges(p1, p2):
+    """
+    Keep one direction of each edge of a symmetric edge list
+
+    Covasim evaluates transmission across every edge in both directions (p1->p2 and p2->p1), so a symmetric edge
+    list like the ones from cluster_edges() gives every pair of people two chances of transmission each way. Keeping
+    only the edges with p1 < p2 halves the number of edges, and giving them a beta of `undirected_beta` keeps the
+    transmission rate the same: 2*p instead of 1-(1-p)**2 for a per-edge probability p, so the rate is overestimated
+    by p**2 (e.g. 0.0025 for p=0.05).
+
+    Args:
+        p1: Array of person indexes, where every edge (i, j) has a matching edge (j, i)
+        p2: Array of person indexes
+
+    Returns: Tuple of arrays (p1, p2)
+
+    """
+    keep = p1 < p2
+    return p1[keep], p2[keep]
+
+
+undirected_beta = 2.0  #: Edge beta for edge lists made with undirected_edges()
+
+
+
+class GroupLayer(cv.Layer):
+    """
+    A contact layer where everyone in a group is in contact with everyone else in the same group
+
+    Groups are stored as group membership (a group ID for each member) rather than as edges, so a
+    layer with groups of size n takes O(n) rather than O(n^2) memory. The p1/p2/beta edge arrays are
+    left empty, so covasim itself doesn't transmit anything in this layer - transmission is computed
+    per group by the GroupTransmission intervention, from the total infectiousness of each group. Unlike the edges
+    from cluster_edges(), two people who share more than one group have a chance of transmission in each of them.
+
+    A sim with a group layer and no GroupTransmission intervention for it would silently have no transmission in
+    the layer, so IndexedPeople raises an exception when such a sim is initialized, see check_group_transmission().
+
+    Args:
+        inds: Array of person indexes
+        group_ids: Array the same length as `inds` with the (non-negative integer) group each person belongs to
+
+    """
+
+    needs_group_transmission = True  #: Transmission in the layer has to come from a GroupTransmission intervention
+
+    def __init__(self, inds, group_ids):
+        super().__init__()
+        inds = np.asarray(inds, dtype=cvd.default_int)
+        group_ids = np.asarray(group_ids, dtype=np.int64)
+
+        # Someone appearing twice in the same group is only counted once, like in cluster_edges()
+        n = inds.max(initial=0) + 1
+        key = np.unique(group_ids * n + inds)
+        self.group_members = (key % n).astype(cvd.default_int)  #: Person index of each membership, sorted by group
+        self.group_ids = key // n  #: Group ID of each membership
+        self.n_groups = int(self.group_ids.max(initial=-1)) + 1
+
+    @classmethod
+    def from_groups(cls, group_members, group_ids):
+        """
+        Make a layer from the `group_members` and `group_ids` of an existing one, without copying them
+        """
+        layer = cls(np.zeros(0), np.zeros(0))
+        layer.group_members = group_members
+        layer.group_ids = group_ids
+        layer.n_groups = int(group_ids.max(initial=-1)) + 1
+        return layer
+
+    def _in_contact(self):
+        # Memberships of groups with at least one other person in them
+        sizes = np.bincount(self.group_ids, minlength=self.n_groups)
+        return sizes[self.group_ids] > 1
+
+    @property
+    def members(self):
+        """
+        Return sorted array of everyone with at least one contact, like Layer.members
+        """
+        return np.unique(self.group_members[self._in_contact()])
+
+    def __contains__(self, item):
+        return item in self.group_members[self._in_contact()]
+
+    def find_contacts(self, inds, as_array=True):
+        """
+        Find everyone that shares a group with any of the specified people
+
+        Equivalent to Layer.find_contacts() on the edges of every group
+        """
+        in_inds = np.isin(self.group_members, inds)
+        n_inds = np.bincount(self.group_ids, weights=in_inds, minlength=self.n_groups)
+        is_contact = n_inds[self.group_ids] - in_inds > 0  # In a group with someone in inds other than themselves
+        contact_inds = np.unique(self.group_members[is_contact])
+        if as_array:
+            return contact_inds
+        return set(contact_inds.tolist())
+
+    def find_contact_pairs(self, inds):
+        """
+        Find the contacts of each of the specified people, like ContactIndex.find_contact_pairs()
+
+        Returns: Arrays of each person in `inds` and one of their contacts, with a pair for every group they share
+        """
+        memberships = cvu.true(np.isin(self.group_members, inds))
+        groups = self.group_ids[memberships]
+        which, contact_inds = _gather_ranges(np.searchsorted(self.group_ids, groups, side='left'),
+                                             np.searchsorted(self.group_ids, groups, side='right'),
+                                             self.group_members)
+        owners = self.group_members[memberships][which]
+        not_self = owners != contact_inds
+        return owners[not_self], contact_inds[not_self]
+
+    def compute_infections(self, beta, rel_trans, rel_sus):
+        """
+        Calculate who gets infected in this layer, the equivalent of cvu.compute_infections() for groups
+
+        The probability of transmission between each pair of people is the same as for the two directed edges
+        between them produced by cluster_edges(), which covasim evaluates in both directions (p1->p2 and p2->p1), so
+        a susceptible person j is infected with probability 1-prod((1-beta*rel_trans[i]*rel_sus[j])**2) over the other
+        people i in their group. This is calculated from the sums of rel_trans and rel_trans**2 over each group, using
+        log(1-x) ~= -x-x**2/2, which is accurate to well under a percentage point for per-contact probabilities up to
+        about 0.1.
+
+        Args:
+            beta: Overall transmissibility
+            rel_trans: Relative transmissibility of everyone in the population, as from cvu.compute_trans_sus()
+            rel_sus: Relative susceptibility of everyone in the population, as from cvu.compute_trans_sus()
+
+        Returns: Arrays of the source and target of each infection
+        """
+        trans = rel_trans[self.group_members]
+        is_source = trans > 0
+        if not is_source.any():
+            return np.zeros(0, dtype=cvd.default_int), np.zeros(0, dtype=cvd.default_int)
+
+        # Total infectiousness of each group. Susceptible people have rel_trans=0, so they never count towards their own
+        group_trans = np.bincount(self.group_ids, weights=trans, minlength=self.n_groups)
+        group_trans2 = np.bincount(self.group_ids, weights=trans**2, minlength=self.n_groups)
+
+        # Infect the susceptible members of groups with someone infectious in them
+        sus = rel_sus[self.group_members]
+        at_risk = cvu.true((sus > 0) & (group_trans[self.group_ids] > 0))
+        beta_sus = beta*sus[at_risk]
+        at_risk_groups = self.group_ids[at_risk]
+        hazard = 2*(beta_sus*group_trans[at_risk_groups] + 0.5*beta_sus**2*group_trans2[at_risk_groups])
+        infected = at_risk[np.random.random(len(at_risk)) < -np.expm1(-hazard)]
+        if not len(infected):
+            return np.zeros(0, dtype=cvd.default_int), np.zeros(0, dtype=cvd.default_int)
+
+        # Pick each source from the infectious members of the target's group, weighted by their transmissibility
+        sources = cvu.true(is_source)  # Memberships are sorted by group, so so are the sources
+        cum_trans = np.cumsum(trans[sources])
+        target_groups = self.group_ids[infected]
+        group_start = np.concatenate([[0.0], np.cumsum(group_trans)])[target_groups]
+        draws = group_start + np.random.random(len(infected))*group_trans[target_groups]
+        source_inds = sources[np.minimum(np.searchsorted(cum_trans, draws, side='right'), len(sources)-1)]
+
+        return self.group_members[source_inds], self.group_members[infected]
+
+
+def check_group_transmission(contacts, interventions):
+    """
+    Raise an exception if any GroupLayer in `contacts` has no GroupTransmission intervention transmitting in it
+
+    Covasim only transmits along edges and group layers don't have any, so without the intervention nobody would
+    ever be infected in the layer, and nothing would show that anything was wrong.
+
+    Args:
+        contacts: The contact layers of a population, e.g. `people.contacts`
+        interventions: The interventions of the sim, e.g. `sim['interventions']`
+    """
+    transmitters = [intervention for intervention in interventions if hasattr(intervention, 'transmits')]
+    missing = [lkey for lkey, layer in contacts.items() if getattr(layer, 'needs_group_transmission', False) and not any(x.transmits(lkey) for x in transmitters)]
+    if missing:
+        raise Exception(f'Group layers {missing} have no transmission unless the sim has a policy_updates.GroupTransmission intervention for them')
+
+
+@nb.njit
+def _build_csr(p1, p2, n_people):
+    # Counting sort of both directions of each edge by their source
+    indptr = np.zeros(n_people + 1, dtype=np.int64)
+    for k in range(len(p1)):
+        indptr[p1[k] + 1] += 1
+        indptr[p2[k] + 1] += 1
+    for i in range(n_people):
+        indptr[i + 1] += indptr[i]
+    pos = indptr[:-1].copy()
+    indices = np.empty(2 * len(p1), dtype=p1.dtype)
+    for k in range(len(p1)):
+        indices[pos[p1[k]]] = p2[k]
+        pos[p1[k]] += 1
+        indices[pos[p2[k]]] = p1[k]
+        pos[p2[k]] += 1
+    return indptr, indices
+
+
+@nb.njit
+def _gather_ranges(starts, ends, values):
+    # Concatenate values[starts[i]:ends[i]] for each i, along with the i each value came from
+    n = 0
+    for i in range(len(starts)):
+        n += ends[i] - starts[i]
+    which = np.empty(n, dtype=np.int64)
+    out = np.empty(n, dtype=values.dtype)
+    k = 0
+    for i in range(len(starts)):
+        for j in range(starts[i], ends[i]):
+            which[k] = i
+            out[k] = values[j]
+            k += 1
+    return which, out
+
+
+class ContactIndex():
+    """
+    Compressed sparse row (CSR) index of the contacts of everyone in a layer
+
+    The contacts of person i are `indices[indptr[i]:indptr[i+1]]`, in both directions of every edge, so looking up
+    the contacts of some people takes time proportional to their number of contacts rather than to the number of
+    edges in the layer. The index keeps a reference to the p1/p2 arrays it was built from, so `is_current()` can
+    tell whether the layer has been regenerated since (covasim and UpdateNetworks assign new arrays to dynamic layers
+    rather than changing them in place).
+
+    Args:
+        layer: A cv.Layer
+        n_people: Number of people in the population
+    """
+
+    def __init__(self, layer, n_people):
+        self.p1 = layer['p1']
+        self.p2 = layer['p2']
+        self.indptr, self.indices = _build_csr(self.p1, self.p2, n_people)
+
+    def is_current(self, layer) -> bool:
+        return layer['p1'] is self.p1 and layer['p2'] is self.p2
+
+    def find_contacts(self, inds, as_array=True):
+        """
+        Find all contacts of the specified people, equivalent to Layer.find_contacts()
+        """
+        contact_inds = self.find_contact_pairs(inds)[1]
+        if as_array:
+            return np.unique(contact_inds)
+        return set(contact_inds.tolist())
+
+    def find_contact_pairs(self, inds):
+        """
+        Find the contacts of each of the specified people
+
+        Returns: Arrays of each person in `inds` and one of their contacts, with a pair for every contact
+        """
+        inds = np.asarray(inds, dtype=np.int64)
+        which, contact_inds = _gather_ranges(self.indptr[inds], self.indptr[inds + 1], self.indices)
+        return inds[which], contact_inds
+
+
+def get_contact_index(layer, n_people, index=None):
+    """
+    Return a ContactIndex for a layer, reusing `index` if the layer hasn't changed since it was built
+
+    GroupLayer objects already find contacts from their group membership, so they are returned as they are.
+
+    Args:
+        layer: A cv.Layer or GroupLayer
+        n_people: Number of people in the population
+        index: A ContactIndex previously returned for this layer, or None
+
+    Returns: An object with a `find_contacts()` method
+    """
+    if isinstance(layer, GroupLayer):
+        return layer
+    if index is None or not index.is_current(layer):
+        index = ContactIndex(layer, n_people)
+    return index
+
+
+def _sample_number_of_contacts(n_people, mean_number_of_contacts, dispersion=None):
+    if dispersion is None:
+        return cvu.n_poisson(rate=mean_number_of_contacts, n=n_people)
+    else:
+        return cvu.n_neg_binomial(rate=mean_number_of_contacts, dispersion=dispersion, n=n_people)
+
+
 @nb.njit
 def _get_contacts(include_inds, number_of_contacts):
     total_number_of_half_edges = np.sum(number_of_contacts)
@@ -45,7 +415,97 @@ def _get_contacts(include_inds, number_of_contacts):
     return source, target
 
 
-def make_random_contacts(include_inds, mean_number_of_contacts, dispersion=None, array_output=False):
+@nb.njit
+def _fill_contacts(include_inds, number_of_contacts, p1, p2):
+    # In-place version of `_get_contacts` writing the edges into the start of preallocated arrays
+    count = 0
+    for i, person_id in enumerate(include_inds):
+        n_contacts = number_of_contacts[i]
+        p1[count:count+n_contacts] = person_id
+        count += n_contacts
+    p2[:count] = p1[:count]
+    np.random.shuffle(p2[:count])
+
+    return count
+
+
+def edge_capacity(n_people, mean_number_of_contacts, dispersion=None, n_sd=6):
+    """
+    Return an upper bound for the number of edges in a random layer
+
+    The total number of edges is a sum of Poisson (or negative binomial) draws, so this returns the
+    mean plus `n_sd` standard deviations of that sum, which is practically never exceeded
+
+    Args:
+        n_people: Number of people in the layer
+        mean_number_of_contacts: Mean number of contacts for each person
+        dispersion: If not None, the negative binomial dispersion parameter used for the layer
+        n_sd: Number of standard deviations above the mean
+
+    Returns: Number of edges to allocate
+
+    """
+    mean = n_people * mean_number_of_contacts
+    if dispersion is None:
+        variance = mean
+    else:
+        variance = n_people * (mean_number_of_contacts + mean_number_of_contacts**2 / dispersion)
+    return int(np.ceil(mean + n_sd * np.sqrt(variance)))
+
+
+class EdgeBuffer():
+    """
+    Preallocated storage for the edges of a layer that is regenerated during the simulation
+
+    `make_random_contacts` and `rewire_random_contacts` can fill the buffer in place and return
+    views of the filled part, which can be assigned directly to a `cv.Layer`. This means that
+    no new arrays are allocated each time a dynamic layer is updated. The `beta` array always
+    contains ones, as would be assigned to a newly generated layer.
+
+    The capacity is increased if needed, keeping the current contents, but this should be rare if
+    the buffer was created with `edge_capacity()`.
+
+    """
+
+    def __init__(self, capacity):
+        self.p1 = np.zeros(capacity, dtype=cvd.default_int)
+        self.p2 = np.zeros(capacity, dtype=cvd.default_int)
+        self.beta = np.ones(capacity, dtype=cvd.default_float)
+
+    @property
+    def capacity(self):
+        return len(self.p1)
+
+    def reserve(self, n_edges):
+        # Make sure there is room for `n_edges` edges, keeping the current contents
+        if n_edges <= self.capacity:
+            return
+        capacity = max(n_edges, int(1.5*self.capacity))
+        for key in ['p1', 'p2']:
+            old = getattr(self, key)
+            arr = np.zeros(capacity, dtype=cvd.default_int)
+            arr[:len(old)] = old
+            setattr(self, key, arr)
+        self.beta = np.ones(capacity, dtype=cvd.default_float)
+
+    def load(self, p1, p2):
+        # Copy edges into the start of the buffer, unless they are already stored here
+        if self.holds(p1) and self.holds(p2):
+            return
+        self.reserve(len(p1))
+        self.p1[:len(p1)] = p1
+        self.p2[:len(p2)] = p2
+
+    def holds(self, arr):
+        # Return True if `arr` is a view of this buffer
+        return arr.base is self.p1 or arr.base is self.p2
+
+    def view(self, n_edges):
+        # Return views of the first `n_edges` edges (p1, p2, beta)
+        return self.p1[:n_edges], self.p2[:n_edges], self.beta[:n_edges]
+
+
+def make_random_contacts(include_inds, mean_number_of_contacts, dispersion=None, array_output=False, out=None):
     """
     Makes the random contacts either by sampling the number of contacts per person from a Poisson or Negative Binomial distribution
 
@@ -56,6 +516,7 @@ def make_random_contacts(include_inds, mean_number_of_contacts, dispersion=None,
     mean_number_of_contacts (int) representing the mean number of contacts for each person
     dispersion (float) if not None, use a negative binomial distribution with this dispersion parameter instead of Poisson to make the contacts
     array_output (boolean) return contacts as arrays or as dicts
+    out (EdgeBuffer) if provided with array_output=True, write the edges into this buffer instead of allocating new arrays
 
     Returns
     -------
@@ -63,17 +524,19 @@ def make_random_contacts(include_inds, mean_number_of_contacts, dispersion=None,
         and a values being a list of target contacts.
 
     If array_output=True, return arrays with `source` and `target` indexes. These could be interleaved to produce an edge list
-        representation of the edges
+        representation of the edges. If `out` is provided, these are views of the buffer
 
     """
 
     n_people = len(include_inds)
 
     # sample the number of edges from a given distribution
-    if dispersion is None:
-        number_of_contacts = cvu.n_poisson(rate=mean_number_of_contacts, n=n_people)
-    else:
-        number_of_contacts = cvu.n_neg_binomial(rate=mean_number_of_contacts, dispersion=dispersion, n=n_people)
+    number_of_contacts = _sample_number_of_contacts(n_people, mean_number_of_contacts, dispersion)
+
+    if out is not None and array_output:
+        out.reserve(np.sum(number_of_contacts))
+        n_edges = _fill_contacts(include_inds, number_of_contacts, out.p1, out.p2)
+        return out.p1[:n_edges], out.p2[:n_edges]
 
     source, target = _get_contacts(include_inds, number_of_contacts)
 
@@ -89,55 +552,125 @@ def make_random_contacts(include_inds, mean_number_of_contacts, dispersion=None,
         return contacts
 
 
+@nb.njit
+def _remove_edges(p1, p2, n_edges, resample):
+    # Remove the edges whose source is being resampled by moving the kept edges to the front
+    n_kept = 0
+    for k in range(n_edges):
+        if not resample[p1[k]]:
+            p1[n_kept] = p1[k]
+            p2[n_kept] = p2[k]
+            n_kept += 1
+    return n_kept
+
+
+@nb.njit
+def _append_edges(p1, p2, n_kept, new_sources):
+    # Append the new edges after the kept ones. Targets for the new edges are drawn from the sources
+    # of all edges, which is the same as the half-edge permutation in `_get_contacts` (people are
+    # chosen in proportion to their number of contacts)
+    n_edges = n_kept + len(new_sources)
+    p1[n_kept:n_edges] = new_sources
+    for k in range(n_kept, n_edges):
+        p2[k] = p1[np.random.randint(0, n_edges)]
+    return n_edges
+
+
+def rewire_random_contacts(p1, p2, include_inds, mean_number_of_contacts, turnover, dispersion=None, pop_size=None, out=None):
+    """
+    Resample the contacts of a fraction of the people in a random layer
+
+    Rather than regenerating the whole layer (as `make_random_contacts` does), each person in
+    `include_inds` has their contacts replaced with probability `turnover`. Their existing edges
+    are dropped, a new number of contacts is sampled from the same distribution used to create
+    the layer, and the targets of the new edges are chosen in proportion to everyone's number of
+    contacts. Everyone else keeps their edges, so only around `turnover` of the edges change.
+
+    Args:
+        p1: Array of current edge sources
+        p2: Array of current edge targets
+        include_inds: Array of person indexes (IDs) of everyone eligible for contacts in this layer
+        mean_number_of_contacts: Mean number of contacts for each person
+        turnover: Probability that each person's contacts are resampled
+        dispersion: If not None, use a negative binomial distribution with this dispersion parameter instead of Poisson
+        pop_size: Number of people in the simulation (defaults to one more than the largest index)
+        out: Optionally, an EdgeBuffer to rewire the edges in. If `p1` and `p2` are already views of this buffer
+             then the rewiring is done in place, otherwise they are copied into it first
+
+    Returns: Tuple of arrays (p1, p2) with the rewired edges. These are views of the buffer
+
+    """
+    if pop_size is None:
+        pop_size = max(np.max(include_inds, initial=-1), np.max(p1, initial=-1)) + 1
+
+    resample = np.zeros(pop_size, dtype=np.bool_)
+    resample[cvu.binomial_filter(turnover, include_inds)] = True
+    resample_inds = include_inds[resample[include_inds]]  # People can appear in a layer more than once, and all of their edges are removed
+
+    number_of_contacts = _sample_number_of_contacts(len(resample_inds), mean_number_of_contacts, dispersion)
+    new_sources = np.repeat(resample_inds, number_of_contacts).astype(cvd.default_int)
+
+    if out is None:
+        out = EdgeBuffer(len(p1) + len(new_sources))
+    out.load(p1, p2)
+    n_kept = _remove_edges(out.p1, out.p2, len(p1), resample)
+    out.reserve(n_kept + len(new_sources))
+    n_edges = _append_edges(out.p1, out.p2, n_kept, new_sources)
+    return out.p1[:n_edges], out.p2[:n_edges]
+
+
 def make_hcontacts(n_households, pop_size, household_heads, uids, contact_matrix):
     """
 
     :param n_households:
     :param pop_size:
     :param household_heads:
-    :return:
+    :return: household edges (p1, p2) and the array of ages
     """
-    h_clusters, h_ages = cl.make_household_clusters(n_households, pop_size, household_heads, uids, contact_matrix)
-    h_contacts = clusters_to_contacts(h_clusters)
+    household_ids, h_ages = cl.make_household_clusters(n_households, pop_size, household_heads, uids, contact_matrix)
+    h_contacts = cluster_edges(uids, household_ids)
     return h_contacts, h_ages
 
 
 def make_scontacts(uids, ages, s_contacts):
     """Create school contacts, with children of each age clustered in groups"""
-    class_cl = cl.make_sclusters(uids, ages, s_contacts)
-    class_co = clusters_to_contacts(class_cl)
+    class_co = cluster_edges(*cl.make_sclusters(uids, ages, s_contacts))
     return class_co
 
 
 def make_lo_high_wcontacts(uids, ages, w_contacts, prop_high_risk):
-    work_cl = cl.make_wclusters(uids, ages, w_contacts)
-
-    is_high_risk = np.random.random(len(work_cl)) < prop_high_risk
-    low_risk_cl = []
-    high_risk_cl = []
-    n_high_risk = 0
-    n_low_risk = 0
-    for cluster, high_risk in zip(work_cl, is_high_risk):
-        if high_risk:
-            high_risk_cl.append(cluster)
-            n_high_risk += len(cluster)
-        else:
-            low_risk_cl.append(cluster)
-            n_low_risk += len(cluster)
+    work_inds, work_ids = cl.make_wclusters(uids, ages, w_contacts)
+    n_workplaces = work_ids.max() + 1 if len(work_ids) else 0
+
+    is_high_risk = np.random.random(n_workplaces) < prop_high_risk
+    high_risk = is_high_risk[work_ids]  # Whether each worker is in a high risk workplace
+    n_high_risk = np.count_nonzero(high_risk)
+    n_low_risk = len(work_inds) - n_high_risk
 
     print(f'Input high risk proportion = {prop_high_risk}')
-    print(f'Assigned proportion high risk workplaces = {len(high_risk_cl)/len(work_cl):.4f}')
+    print(f'Assigned proportion high risk workplaces = {np.count_nonzero(is_high_risk)/n_workplaces:.4f}')
     print(f'Assigned proportion high risk workers = {n_high_risk/(n_low_risk+n_high_risk):.4f}')
 
-    return clusters_to_contacts(low_risk_cl), clusters_to_contacts(high_risk_cl)
+    low_risk_co = cluster_edges(work_inds[~high_risk], work_ids[~high_risk])
+    high_risk_co = cluster_edges(work_inds[high_risk], work_ids[high_risk])
+    return low_risk_co, high_risk_co
 
 
 def make_wcontacts(uids, ages, w_contacts):
-    work_cl = cl.make_wclusters(uids, ages, w_contacts)
-    work_co = clusters_to_contacts(work_cl)
+    work_co = cluster_edges(*cl.make_wclusters(uids, ages, w_contacts))
     return work_co    
 
-def make_custom_contacts(uids, n_contacts, pop_size, ages, custom_lkeys, cluster_types, dispersion, pop_proportion, age_lb, age_ub):
+def make_custom_contacts(uids, n_contacts, pop_size, ages, custom_lkeys, cluster_types, dispersion, pop_proportion, age_lb, age_ub, group_layers=False):
+    """
+    Make the contacts for the custom layers
+
+    With group_layers=True, 'complete' and 'cluster' layers are returned as GroupLayer objects storing which group
+    each member is in, rather than as (p1, p2) edge lists. Transmission in them then needs a GroupTransmission
+    intervention.
+
+    Returns: - Dict of contacts by layer, {lkey: (p1, p2) or GroupLayer}
+             - A dictionary of layer members, {lkey: [indexes]}
+    """
     contacts = {}
     layer_members = {}
     for layer_key in custom_lkeys:
@@ -153,14 +686,14 @@ def make_custom_contacts(uids, n_contacts, pop_size, ages, custom_lkeys, cluster
 
         # handle the cluster types differently
         if cl_type == 'complete':   # number of contacts not used for complete clusters
-            contacts[layer_key] = clusters_to_contacts([inds])
+            group_ids = np.zeros(len(inds), dtype=cvd.default_int)
+            contacts[layer_key] = GroupLayer(inds, group_ids) if group_layers else cluster_edges(inds, group_ids)
         elif cl_type == 'random':
-            contacts[layer_key] = make_random_contacts(include_inds=inds, mean_number_of_contacts=num_contacts, dispersion=dispersion[layer_key])
+            contacts[layer_key] = make_random_contacts(include_inds=inds, mean_number_of_contacts=num_contacts, dispersion=dispersion[layer_key], array_output=True)
             # contacts[layer_key] = random_contacts(in_layer, num_contacts)
         elif cl_type == 'cluster':
-            miniclusters = []
-            miniclusters.extend(cl.create_clustering(inds, num_contacts))
-            contacts[layer_key] = clusters_to_contacts(miniclusters)
+            group_ids = cl.create_cluster_ids(len(inds), num_contacts)
+            contacts[layer_key] = GroupLayer(inds, group_ids) if group_layers else cluster_edges(inds, group_ids)
         else:
             raise Exception(f'Error: Unknown network structure: {cl_type}')
 
@@ -184,6 +717,49 @@ def convert_contacts(contacts, uids, all_lkeys):
     return contacts_list
 
 
+def make_undirected(contacts, lkeys):
+    """
+    Replace the (symmetric) edge lists of some layers with undirected_edges()
+
+    Args:
+        contacts: Dict of contacts by layer, {lkey: (p1, p2) or GroupLayer}, modified in place
+        lkeys: Layers to convert. Group layers don't have edges, so they are left as they are
+
+    Returns: List of the layers that were converted
+    """
+    converted = []
+    for lkey in lkeys:
+        if not isinstance(contacts[lkey], GroupLayer):
+            contacts[lkey] = undirected_edges(*contacts[lkey])
+            converted.append(lkey)
+    return converted
+
+
+def make_cv_contacts(contacts, all_lkeys, undirected_lkeys=None):
+    """
+    Construct a cv.Contacts object from edge lists
+
+    Args:
+        contacts: Dict of edge lists by layer, {lkey: (p1, p2)}, or GroupLayer objects
+        all_lkeys: All layer keys in the simulation
+        undirected_lkeys: Layers whose edges were made with undirected_edges(), which get a beta of undirected_beta
+
+    Returns: A cv.Contacts object
+
+    """
+    cv_contacts = cv.Contacts(layer_keys=all_lkeys)
+    for lkey, layer_contacts in contacts.items():
+        if isinstance(layer_contacts, GroupLayer):
+            cv_contacts[lkey] = layer_contacts
+            continue
+        p1, p2 = layer_contacts
+        cv_contacts[lkey]['p1'] = np.asarray(p1, dtype=cvd.default_int)
+        cv_contacts[lkey]['p2'] = np.asarray(p2, dtype=cvd.default_int)
+        cv_contacts[lkey]['beta'] = np.full(len(p1), undirected_beta if lkey in (undirected_lkeys or []) else 1.0, dtype=cvd.default_float)
+        cv_contacts[lkey].validate()
+    return cv_contacts
+
+
 def get_uids(pop_size):
     people_id = np.arange(start=0, stop=pop_size, step=1)
     return people_id
@@ -200,6 +776,7 @@ def get_numhouseholds(household_dist, pop_size):
 
 def get_household_heads(age_dist, n_households):
     """Selects the ages of the household heads by randomly selecting from the available ages"""
+    age_dist = age_dist.copy()  # Don't modify the parameters, they may be used to make another population
     # prevent anyone under the age of 18 being chosen
     age_dist.iloc[0:18] = 0
     # decrease probability of someone aged 18-28 being chosen
@@ -211,7 +788,7 @@ def get_household_heads(age_dist, n_households):
     return household_heads
 
 
-def make_lo_hi_contacts(params):
+def make_lo_hi_contacts(params, group_layers=False, undirected=False):
     contacts = {}
 
     pop_size = params.pars['pop_size']
@@ -249,23 +826,23 @@ def make_lo_hi_contacts(params):
     social_no = n_contacts[key]
     s_contacts = make_scontacts(uids, ages, social_no)
     contacts[key] = s_contacts
-    layer_members['S'] = np.array(list(s_contacts.keys()))
+    layer_members['S'] = np.unique(s_contacts[0])
 
     # workplace contacts
     key = 'low_risk_work'
     work_no = n_contacts[key]
     proportion_high_risk = params.extrapars["prop_high_risk_work"]
-    low_risk_contacts, high_risk_contacts = make_wcontacts(uids, ages, work_no, proportion_high_risk)
+    low_risk_contacts, high_risk_contacts = make_lo_high_wcontacts(uids, ages, work_no, proportion_high_risk)
     contacts['low_risk_work'] = low_risk_contacts
     contacts['high_risk_work'] = high_risk_contacts
-    layer_members['low_risk_work'] = np.array(list(low_risk_contacts.keys()))
-    layer_members['high_risk_work'] = np.array(list(high_risk_contacts.keys()))
+    layer_members['low_risk_work'] = np.unique(low_risk_contacts[0])
+    layer_members['high_risk_work'] = np.unique(high_risk_contacts[0])
 
     # random community contacts
     key = 'C'
     com_no = n_contacts[key]
     include = uids
-    c_contacts = make_random_contacts(include_inds=include, mean_number_of_contacts=com_no, dispersion=dispersion['C'])
+    c_contacts = make_random_contacts(include_inds=include, mean_number_of_contacts=com_no, dispersion=dispersion['C'], array_output=True)
     contacts[key] = c_contacts
     layer_members['C'] = uids
 
@@ -279,29 +856,23 @@ def make_lo_hi_contacts(params):
                                            dispersion,
                                            pop_proportion,
                                            age_lb,
-                                           age_ub)
+                                           age_ub,
+                                           group_layers)
     contacts.update(custom_contacts)
 
     layer_members = sc.mergedicts(layer_members, custom_layer_members)
 
     # Initialize the new contacts
-    cv_contacts = cv.Contacts(layer_keys=all_lkeys)
-    for lkey in contacts.keys():
-        p1 = []
-        p2 = []
-        for a1, b1 in contacts[lkey].items():
-            p1.extend([a1]*len(b1))
-            p2.extend(b1)
-
-        cv_contacts[lkey]['p1'] = np.array(p1,dtype=cvd.default_int)
-        cv_contacts[lkey]['p2'] = np.array(p2,dtype=cvd.default_int)
-        cv_contacts[lkey]['beta'] = np.ones(len(p1),dtype=cvd.default_float)
-        cv_contacts[lkey].validate()
+    undirected_lkeys = []
+    if undirected:
+        undirected_lkeys = ['H', 'S', 'low_risk_work', 'high_risk_work'] + [lkey for lkey in custom_lkeys if cluster_types[lkey] in ['complete', 'cluster']]
+        undirected_lkeys = make_undirected(contacts, undirected_lkeys)
+    cv_contacts = make_cv_contacts(contacts, all_lkeys, undirected_lkeys)
 
     return cv_contacts, ages, uids, layer_members
 
 
-def make_contacts(params):
+def make_contacts(params, group_layers=False, undirected=False):
     contacts = {}
 
     pop_size = params.pars['pop_size']
@@ -339,21 +910,21 @@ def make_contacts(params):
     social_no = n_contacts[key]
     s_contacts = make_scontacts(uids, ages, social_no)
     contacts[key] = s_contacts
-    layer_members['S'] = np.array(list(s_contacts.keys()))
+    layer_members['S'] = np.unique(s_contacts[0])
 
     # workplace contacts
     key = 'W'
     work_no = n_contacts[key]
     w_contacts = make_wcontacts(uids, ages, work_no)
     contacts[key] = w_contacts
-    layer_members['W'] = np.array(list(w_contacts.keys()))
+    layer_members['W'] = np.unique(w_contacts[0])
 
 
     # random community contacts
     key = 'C'
     com_no = n_contacts[key]
     include = uids
-    c_contacts = make_random_contacts(include_inds=include, mean_number_of_contacts=com_no, dispersion=dispersion['C'])
+    c_contacts = make_random_contacts(include_inds=include, mean_number_of_contacts=com_no, dispersion=dispersion['C'], array_output=True)
     contacts[key] = c_contacts
     layer_members['C'] = uids
 
@@ -367,28 +938,22 @@ def make_contacts(params):
                                            dispersion,
                                            pop_proportion,
                                            age_lb,
-                                           age_ub)
+                                           age_ub,
+                                           group_layers)
     contacts.update(custom_contacts)
 
     layer_members = sc.mergedicts(layer_members, custom_layer_members)
 
     # Initialize the new contacts
-    cv_contacts = cv.Contacts(layer_keys=all_lkeys)
-    for lkey in contacts.keys():
-        p1 = []
-        p2 = []
-        for a1, b1 in contacts[lkey].items():
-            p1.extend([a1]*len(b1))
-            p2.extend(b1)
-
-        cv_contacts[lkey]['p1'] = np.array(p1,dtype=cvd.default_int)
-        cv_contacts[lkey]['p2'] = np.array(p2,dtype=cvd.default_int)
-        cv_contacts[lkey]['beta'] = np.ones(len(p1),dtype=cvd.default_float)
-        cv_contacts[lkey].validate()
+    undirected_lkeys = []
+    if undirected:
+        undirected_lkeys = ['H', 'S', 'W'] + [lkey for lkey in custom_lkeys if cluster_types[lkey] in ['complete', 'cluster']]
+        undirected_lkeys = make_undirected(contacts, undirected_lkeys)
+    cv_contacts = make_cv_contacts(contacts, all_lkeys, undirected_lkeys)
 
     return cv_contacts, ages, uids, layer_members
 
-def make_people(params) -> cv.People:
+def make_people(params, group_layers=False, undirected=False) -> cv.People:
     """
     Construct a cv.People object
 
@@ -396,10 +961,18 @@ def make_people(params) -> cv.People:
 
     Args:
         params:
+        group_layers: Store 'complete' and 'cluster' custom layers as GroupLayer objects rather than edges. Sims
+                      using the population then need a policy_updates.GroupTransmission intervention
+        undirected: Store each edge of the household, school, work and clustered custom layers in one direction only,
+                    with a beta of undirected_beta, which halves their size with the same transmission rates
 
     Returns: - People object
              - A dictionary of layer members, {lkey: [indexes]}
     """
-    cv_contacts, ages, uids, layer_members = make_contacts(params)
-    people = cv.People(pars=params.pars, contacts=cv_contacts, age=ages, uid=uids)
+    cv_contacts, ages, uids, layer_members = make_contacts(params, group_layers, undirected)
+    people = ev.IndexedPeople(pars=params.pars, contacts=cv_contacts, age=ages, uid=uids)
+    for lkey, layer in cv_contacts.items():
+        if isinstance(layer, GroupLayer):
+            people.contacts[lkey] = layer  # cv.People() only copies the edges of each layer
+    people.infection_log = il.InfectionLog()
     return people, layer_members
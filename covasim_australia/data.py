@@ -1,6 +1,10 @@
+import hashlib
+import json
 import math
 import numpy as np
+import os
 import pandas as pd
+import pathlib
 import sciris as sc
 import covasim_australia.utils as utils
 import warnings
@@ -434,9 +438,7 @@ def read_contact_matrix(locations, databook):
         contact_matrix = {}
         # make symmetric with ((rowi, colj) + (rowj, coli)) / 2
         mixing_matrix = mixing_matrix0.copy()
-        for i in range(len(mixing_matrix0)):
-            for j in range(len(mixing_matrix0)):
-                mixing_matrix.values[i, j] = (mixing_matrix0.values[i, j] + mixing_matrix0.values[j, i]) / 2.0
+        mixing_matrix.values[:] = (mixing_matrix0.values + mixing_matrix0.values.T) / 2.0
         age_lb = [int(x.split('-')[0]) for x in mixing_matrix.index]  # lower age in bin
         age_ub = [int(x.split('-')[1]) for x in mixing_matrix.index]  # upper age in bin
 
@@ -467,20 +469,102 @@ def read_params(locations, db, all_lkeys):
     return pars, extrapars, layerchars
 
 
-def read_data(locations=None, db_name=None, epi_name=None, all_lkeys=None, dynamic_lkeys=None, calibration_end=None):
-    """Reads in all data in the appropriate format"""
-    db_path, epi_path = utils.get_file_paths(db_name=db_name, epi_name=epi_name)
+# Bump this whenever compile_databook() changes what it reads from the databook, to invalidate old caches
+databook_cache_version = 1
 
-    calibration_end = utils.clean_calibration_end(locations, calibration_end)
 
-    db = load_databook(db_path)
+def databook_key(db_path, locations, all_lkeys) -> str:
+    """
+    Hash the contents of a databook along with the locations and layers read from it
+
+    Returns: A hex string
+    """
+    with open(db_path, 'rb') as f:
+        databook_hash = hashlib.sha256(f.read()).hexdigest()
+    inputs = {'cache_version': databook_cache_version,
+              'databook': databook_hash,
+              'locations': sorted(locations),
+              'all_lkeys': sorted(all_lkeys)}  # Sorted since get_lkeys() doesn't always return the layers in the same order
+    return hashlib.sha256(json.dumps(inputs).encode()).hexdigest()
 
-    # handle layer names
-    all_lkeys, default_lkeys, dynamic_lkeys, custom_lkeys = utils.get_lkeys(all_lkeys, dynamic_lkeys)
 
+def compile_databook(db_path, locations, all_lkeys) -> dict:
+    """
+    Read everything read_data() needs from the databook
+
+    Returns: A dictionary {location: {'pars':..., 'extrapars':..., 'layerchars':..., 'policies':...,
+             'contact_matrix':..., 'age_dist':..., 'household_dist':...}}
+    """
+    db = load_databook(db_path)
     pars, extrapars, layerchars = read_params(locations, db, all_lkeys)
     policies = read_policies(locations, db, all_lkeys)
     contact_matrix = read_contact_matrix(locations, db)
+    age_dist, household_dist = read_popdata(locations, db)
+    return {location: {'pars': pars[location],
+                       'extrapars': extrapars[location],
+                       'layerchars': layerchars[location],
+                       'policies': policies[location],
+                       'contact_matrix': contact_matrix[location],
+                       'age_dist': age_dist[location],
+                       'household_dist': household_dist[location]}
+            for location in locations}
+
+
+def load_databook_cached(db_path, locations, all_lkeys, cache_dir=None, verbose=False) -> dict:
+    """
+    Return compile_databook(), reusing a previous result if the databook hasn't changed
+
+    Parsing the databook takes seconds, so the compiled data is saved in `cache_dir` under its
+    databook_key(), and loaded from there as long as the databook, locations and layers are the same.
+
+    Args:
+        db_path: Path of the databook
+        locations: List of locations to read
+        all_lkeys: List of all layer keys
+        cache_dir: Folder to store the compiled data in, defaults to a 'databook_cache' folder next to the databook
+        verbose: Print whether the data was loaded or compiled
+
+    Returns: The output of compile_databook()
+    """
+    cache_dir = pathlib.Path(db_path).parent/'databook_cache' if cache_dir is None else pathlib.Path(cache_dir)
+    fname = cache_dir/f'{databook_key(db_path, locations, all_lkeys)}.obj'
+    if fname.exists():
+        if verbose:
+            print(f'Loading compiled databook from "{fname}"')
+        return sc.loadobj(str(fname))
+
+    compiled = compile_databook(db_path, locations, all_lkeys)
+
+    # Save to a temporary file first so other processes never load a partially written cache
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_fname = fname.with_suffix(f'.{os.getpid()}.tmp')
+    sc.saveobj(str(tmp_fname), compiled)
+    os.replace(tmp_fname, fname)
+    if verbose:
+        print(f'Saved compiled databook to "{fname}"')
+    return compiled
+
+
+def read_data(locations=None, db_name=None, epi_name=None, all_lkeys=None, dynamic_lkeys=None, calibration_end=None, use_cache=True, cache_dir=None):
+    """
+    Reads in all data in the appropriate format
+
+    The databook is only parsed the first time it is read with the same locations and layers, see
+    load_databook_cached(). Set `use_cache=False` to always parse it.
+    """
+    db_path, epi_path = utils.get_file_paths(db_name=db_name, epi_name=epi_name)
+
+    calibration_end = utils.clean_calibration_end(locations, calibration_end)
+
+    # handle layer names
+    all_lkeys, default_lkeys, dynamic_lkeys, custom_lkeys = utils.get_lkeys(all_lkeys, dynamic_lkeys)
+
+    if use_cache:
+        compiled = load_databook_cached(db_path, locations, all_lkeys, cache_dir)
+    else:
+        compiled = compile_databook(db_path, locations, all_lkeys)
+    pars = {location: compiled[location]['pars'] for location in locations}
+    extrapars = {location: compiled[location]['extrapars'] for location in locations}
     if epi_path is not None:
         complete_epidata, calibration_epidata, imported_cases, daily_tests = get_epi_data(locations, epi_path, pars, extrapars, calibration_end)
     else:
@@ -488,20 +572,13 @@ def read_data(locations=None, db_name=None, epi_name=None, all_lkeys=None, dynam
         calibration_epidata = defaultdict(lambda: None)
         imported_cases = defaultdict(lambda: None)
         daily_tests = defaultdict(lambda: None)
-    age_dist, household_dist = read_popdata(locations, db)
 
     # convert so that outer key is the location
     all_data = {}
     for location in locations:
-        all_data[location] = {'pars': pars[location],
-                              'extrapars': extrapars[location],
-                              'layerchars': layerchars[location],
-                              'policies': policies[location],
-                              'contact_matrix': contact_matrix[location],
+        all_data[location] = {**compiled[location],
                               'complete_epidata': complete_epidata[location],
                               'calibration_epidata': calibration_epidata[location],
-                              'age_dist': age_dist[location],
-                              'household_dist': household_dist[location],
                               'imported_cases': imported_cases[location],
                               'daily_tests': daily_tests[location],
                               'all_lkeys': all_lkeys,
@@ -0,0 +1,166 @@
+import covasim as cv
+import covasim.misc as cvm
+import json
+import numpy as np
+import os
+import pathlib
+import sciris as sc
+import shutil
+import socket
+
+
+class EnsembleStore:
+    """
+    Results of an ensemble of simulations, stored on disk
+
+    The results are kept in a single (runs, timepoints, keys) array that is
+    memory-mapped, so results from each run can be written as soon as it
+    finishes and read back without unpickling any sims. People, contacts and
+    interventions are not stored.
+
+    Stores are directories containing:
+        - results.npy: The result values, indexed by [run, timepoint, key]
+        - completed.npy: Whether each run has been written yet
+        - seeds.npy: The random seed used for each run
+        - meta.json: The result keys, the start day and the number of runs/timepoints
+
+    Use EnsembleStore.create() to make a new store and EnsembleStore(dirname)
+    to open an existing one.
+
+    Args:
+        dirname: The directory the store is saved in
+        mode: 'r' to open read-only, 'r+' to add more runs
+    """
+
+    def __init__(self, dirname, mode='r'):
+        self.dirname = pathlib.Path(dirname)
+        with open(self.dirname/'meta.json') as f:
+            meta = json.load(f)
+        self.keys = meta['keys']
+        self.start_day = meta['start_day']
+        self.n_runs = meta['n_runs']
+        self.npts = meta['npts']
+        self._key_inds = {key: i for i, key in enumerate(self.keys)}
+
+        self.values = np.load(self.dirname/'results.npy', mmap_mode=mode)
+        self.completed = np.load(self.dirname/'completed.npy', mmap_mode=mode)
+        self.seeds = np.load(self.dirname/'seeds.npy', mmap_mode=mode)
+
+    @classmethod
+    def create(cls, dirname, n_runs, keys, npts, start_day):
+        """
+        Make a new, empty store
+
+        Args:
+            dirname: Directory to save the store in, replacing any existing store
+            n_runs: Number of runs in the ensemble
+            keys: Names of the results to store, e.g. ['new_infections', 'new_diagnoses']
+            npts: Number of timepoints in each result
+            start_day: The start day of the simulations, for day()
+
+        Returns: An EnsembleStore opened in 'r+' mode
+        """
+        dirname = pathlib.Path(dirname)
+        os.makedirs(dirname, exist_ok=True)
+        values = np.lib.format.open_memmap(dirname/'results.npy', mode='w+', dtype=np.float64, shape=(n_runs, npts, len(keys)))
+        values.fill(np.nan)
+        values.flush()
+        np.save(dirname/'completed.npy', np.zeros(n_runs, dtype=bool))
+        np.save(dirname/'seeds.npy', np.zeros(n_runs, dtype=np.int64))
+        meta = {'keys': list(keys), 'start_day': str(sc.date(start_day)), 'n_runs': n_runs, 'npts': npts}
+        with open(dirname/'meta.json', 'w') as f:
+            json.dump(meta, f)
+        return cls(dirname, mode='r+')
+
+    @classmethod
+    def from_sims(cls, dirname, sims, keys=None):
+        """
+        Make a store from a list of sims that have already been run
+
+        The store is written to a temporary directory and then moved into place, replacing any existing
+        store, so `dirname` never contains a partially written store.
+
+        Args:
+            dirname: Directory to save the store in
+            sims: A list of sims, e.g. msim.sims
+            keys: Names of the results to store, defaults to all of them
+
+        Returns: An EnsembleStore opened in 'r+' mode
+        """
+        dirname = pathlib.Path(dirname)
+        tmp_dirname = dirname.with_name(f'{dirname.name}.{socket.gethostname()}.{os.getpid()}.tmp')
+        store = None
+        try:
+            for ind, sim in enumerate(sims):
+                if store is None:
+                    store = cls.create(tmp_dirname, len(sims), keys or result_keys(sim), sim.npts, sim['start_day'])
+                store.add(ind, sim)
+            store.flush()
+            del store  # Close the memory-mapped files before moving them
+            if dirname.exists():
+                shutil.rmtree(dirname)
+            os.replace(tmp_dirname, dirname)
+        finally:
+            if tmp_dirname.exists():
+                shutil.rmtree(tmp_dirname)
+        return cls(dirname, mode='r+')
+
+    def add(self, ind, sim):
+        """
+        Write the results of a finished sim as run number `ind`
+        """
+        for i, key in enumerate(self.keys):
+            self.values[ind, :, i] = sim.results[key].values
+        self.seeds[ind] = sim['rand_seed']
+        self.completed[ind] = True
+
+    def flush(self):
+        for arr in [self.values, self.completed, self.seeds]:
+            arr.flush()
+
+    def __getitem__(self, key) -> np.ndarray:
+        """
+        Return the values of a result for all completed runs, as a (runs, timepoints) array
+        """
+        return np.array(self.values[self.completed, :, self._key_inds[key]])
+
+    def __len__(self):
+        return int(self.completed.sum())
+
+    def day(self, day):
+        """
+        Convert a date to a timepoint index, like cv.Sim.day()
+        """
+        return cvm.day(day, start_day=self.start_day)
+
+
+def result_keys(sim):
+    """
+    Return the keys of all the time series results in a sim
+    """
+    return [key for key, result in sim.results.items() if isinstance(result, cv.Result)]
+
+
+def is_complete(dirname) -> bool:
+    """
+    Return True if `dirname` is an EnsembleStore with every run written, e.g. to check whether an ensemble needs rerunning
+    """
+    try:
+        return bool(EnsembleStore(dirname).completed.all())
+    except (FileNotFoundError, NotADirectoryError, ValueError):  # Missing or partially written
+        return False
+
+
+def load_ensemble(filename):
+    """
+    Load the results of an ensemble
+
+    Args:
+        filename: Either a directory saved by EnsembleStore, or a MultiSim saved with msim.save()
+
+    Returns: Either an EnsembleStore or the list of sims in the MultiSim, either
+             of which can be passed to utils.get_individual_traces()
+    """
+    if os.path.isdir(filename):
+        return EnsembleStore(filename)
+    return sc.loadobj(str(filename)).sims
@@ -0,0 +1,148 @@
+import collections
+import covasim as cv
+import covasim.utils as cvu
+import numpy as np
+
+
+class EventIndex():
+    """
+    Index of the people whose dates (e.g. `date_diagnosed`) are set to each day
+
+    Interventions often need to find the people something happens to today, e.g. the people diagnosed today
+    to trace from. Comparing the date array to the day takes time proportional to the population size, while
+    looking the day up here takes time proportional to the number of people it returns.
+
+    The index is filled in by `IndexedPeople` as the dates are assigned. Entries are never removed when a date
+    changes (e.g. when someone is tested again) but are checked against the current date when they are looked up,
+    so the index may only ever contain too many people, never too few.
+
+    Args:
+        keys: The date keys to index, e.g. ['date_diagnosed']
+    """
+
+    def __init__(self, keys):
+        self.keys = set(keys)  #: The date keys that are indexed
+        self._buckets = {key: collections.defaultdict(list) for key in self.keys}  # {key: {day: [arrays of indexes]}}
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def __repr__(self):
+        return f'EventIndex({sorted(self.keys)})'
+
+    def add(self, key, inds, days):
+        """
+        Record that the `key` date of `inds` was set to `days`
+
+        Args:
+            key: Date key, e.g. 'date_diagnosed'
+            inds: Person indexes
+            days: The date of each person, or a single date for all of them. People with a NaN date are skipped
+        """
+        if key not in self.keys:
+            return
+        inds = np.asarray(inds, dtype=np.int64)
+        days = np.broadcast_to(days, inds.shape)
+        valid = ~np.isnan(days)
+        inds, days = inds[valid], days[valid].astype(np.int64)
+        if not len(inds):
+            return
+        order = np.argsort(days, kind='stable')
+        inds, days = inds[order], days[order]
+        starts = np.flatnonzero(np.diff(days, prepend=days[0]-1))
+        for start, end in zip(starts, np.append(starts[1:], len(days))):
+            self._buckets[key][days[start]].append(inds[start:end])
+
+    def remove(self, key):
+        """
+        Stop indexing the `key` date, e.g. if it is assigned somewhere the index can't see
+        """
+        self.keys.discard(key)
+        self._buckets.pop(key, None)
+
+    def on(self, dates, key, day) -> np.ndarray:
+        """
+        Return the (sorted) indexes of the people whose `key` date is `day`
+
+        Args:
+            dates: The current `key` date array, e.g. `people.date_diagnosed`
+            key: Date key
+            day: The day to look up
+
+        Returns: Person indexes
+        """
+        arrays = self._buckets[key].get(int(day), [])
+        if not arrays:
+            return np.empty(0, dtype=np.int64)
+        inds = np.unique(np.concatenate(arrays))
+        return inds[dates[inds] == day]
+
+
+class IndexedPeople(cv.People):
+    """
+    A `cv.People` that keeps an EventIndex of when people become symptomatic, are tested, diagnosed and quarantined
+
+    Only dates that interventions look up are indexed, since indexing a date costs time whenever it is assigned.
+
+    Use `people_on()` to look up the people whose date is a given day, it works for both `cv.People` and this class.
+
+    When a sim initializes the people, it also checks that any co.GroupLayer has a GroupTransmission intervention.
+    """
+
+    event_keys = ['date_symptomatic', 'date_tested', 'date_diagnosed', 'date_quarantined']  #: The dates that are indexed
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.events = EventIndex(self.event_keys)
+
+    def initialize(self):
+        import covasim_australia.contacts as co  # contacts imports this module
+        if 'interventions' in self.pars:  # Initialized by a sim
+            co.check_group_transmission(self.contacts, self.pars['interventions'])
+        self.events = EventIndex(self.event_keys)
+        return super().initialize()
+
+    def infect(self, inds, *args, **kwargs):
+        new_inds = np.unique(inds)
+        new_inds = new_inds[self.susceptible[new_inds]]
+        count = super().infect(inds, *args, **kwargs)
+        self.events.add('date_symptomatic', new_inds, self.date_symptomatic[new_inds])
+        return count
+
+    def test(self, inds, *args, **kwargs):
+        output = super().test(inds, *args, **kwargs)
+        inds = np.unique(inds)
+        self.events.add('date_tested', inds, self.t)
+        pos_inds = inds[self.date_pos_test[inds] == self.t]
+        self.events.add('date_diagnosed', pos_inds, self.date_diagnosed[pos_inds])
+        return output
+
+    def check_quar(self):
+        pending = getattr(self, '_pending_quarantine', None)
+        if pending is None:  # Quarantine is handled differently by this version of covasim
+            self.events.remove('date_quarantined')
+            return super().check_quar()
+        inds = np.array([ind for ind, _ in pending.get(self.t, [])], dtype=np.int64)
+        output = super().check_quar()
+        self.events.add('date_quarantined', inds[self.date_quarantined[inds] == self.t], self.t)
+        return output
+
+
+def people_on(people, key, day) -> np.ndarray:
+    """
+    Return the indexes of the people whose `key` date is `day`, e.g. the people diagnosed today
+
+    This looks the day up in the EventIndex of IndexedPeople and scans the whole date array otherwise, e.g. for
+    populations made before IndexedPeople was added.
+
+    Args:
+        people: A cv.People object
+        key: Date key, e.g. 'date_diagnosed'
+        day: The day to look up
+
+    Returns: Sorted person indexes
+    """
+    events = getattr(people, 'events', None)
+    if events is not None and key in events:
+        return events.on(people[key], key, day)
+    return cvu.true(people[key] == day)
@@ -0,0 +1,203 @@
+import numpy as np
+
+
+class InfectionLog():
+    """
+    Columnar record of infections, a drop-in replacement for `cv.People.infection_log`
+
+    Covasim records each infection by appending a dictionary with keys 'source', 'target', 'date'
+    and 'layer' to a list. This class accepts the same dictionaries, and iterating over it or
+    indexing it still returns them, but the entries are stored in arrays that grow as needed:
+
+        - source: Index of the person who transmitted the infection, -1 for seed infections and importations
+        - target: Index of the person infected
+        - date: Day of the infection
+        - layer: Code of the layer the infection happened in, see `layer_keys`
+
+    Each entry is also linked into per-person lists by source and by target, so finding the
+    infections involving someone takes time proportional to the number of those infections
+    rather than to the length of the log.
+
+    Use `get_infection_log()` to get the log of a `cv.People` object, replacing a list if needed.
+
+    Args:
+        entries: Optionally, a list of infection dictionaries to start with
+        capacity: Initial number of entries to allocate storage for
+    """
+
+    _columns = ['source', 'target', 'date', 'layer', 'next_by_source', 'next_by_target']
+
+    def __init__(self, entries=None, capacity=1000):
+        self.n = 0
+        self.layer_keys = []  #: The layer of each layer code, e.g. ['seed_infection', 'H', ...]
+        self._layer_codes = {}  # {lkey: code}
+        self._source = np.zeros(capacity, dtype=np.int32)
+        self._target = np.zeros(capacity, dtype=np.int32)
+        self._date = np.zeros(capacity, dtype=np.int32)
+        self._layer = np.zeros(capacity, dtype=np.int16)
+        self._next_by_source = np.zeros(capacity, dtype=np.int32)  # Next (earlier) entry with the same source, or -1
+        self._next_by_target = np.zeros(capacity, dtype=np.int32)  # Next (earlier) entry with the same target, or -1
+        self._last_by_source = np.full(0, -1, dtype=np.int32)  # Most recent entry with each person as the source, or -1
+        self._last_by_target = np.full(0, -1, dtype=np.int32)  # Most recent entry with each person as the target, or -1
+        for entry in entries or []:
+            self.append(entry)
+
+    def __getstate__(self):
+        # Only store the filled part of the data columns, the per-person links are rebuilt when loading
+        state = self.__dict__.copy()
+        for col in ['source', 'target', 'date', 'layer']:
+            state[f'_{col}'] = state[f'_{col}'][:self.n].copy()
+        for col in ['_next_by_source', '_next_by_target', '_last_by_source', '_last_by_target']:
+            del state[col]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._next_by_source, self._last_by_source = self._link(self._source)
+        self._next_by_target, self._last_by_target = self._link(self._target)
+
+    @staticmethod
+    def _link(inds):
+        # Link each entry to the previous one with the same person, and each person to their last entry
+        n_people = int(inds.max(initial=-1)) + 1
+        next_entry = np.full(len(inds), -1, dtype=np.int32)
+        last_entry = np.full(n_people, -1, dtype=np.int32)
+        valid = np.nonzero(inds >= 0)[0]
+        order = valid[np.argsort(inds[valid], kind='stable')]  # Entries sorted by person, then in the order they were added
+        same = inds[order[1:]] == inds[order[:-1]]
+        next_entry[order[1:][same]] = order[:-1][same]
+        is_last = np.append(~same, True)[:len(order)]  # Last entry of each person
+        last_entry[inds[order[is_last]]] = order[is_last]
+        return next_entry, last_entry
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        for i in range(self.n):
+            yield self[i]
+
+    def __getitem__(self, i):
+        """
+        Return entry `i` as a dictionary, as covasim would have stored it
+        """
+        if i < 0:
+            i += self.n
+        if not 0 <= i < self.n:
+            raise IndexError(f'Entry {i} is out of range for a log with {self.n} entries')
+        source = int(self._source[i])
+        return dict(source=source if source >= 0 else None, target=int(self._target[i]), date=int(self._date[i]), layer=self.layer_keys[self._layer[i]])
+
+    def __repr__(self):
+        return f'InfectionLog({self.n} infections)'
+
+    def layer_code(self, lkey) -> int:
+        """
+        Return the code stored in `layer` for a layer key, adding it if it hasn't been seen before
+        """
+        if lkey not in self._layer_codes:
+            self._layer_codes[lkey] = len(self.layer_keys)
+            self.layer_keys.append(lkey)
+        return self._layer_codes[lkey]
+
+    def _reserve(self, n_entries, n_people):
+        if n_entries > len(self._source):
+            capacity = max(n_entries, int(1.5*len(self._source)))
+            for col in self._columns:
+                arr = getattr(self, f'_{col}')
+                new_arr = np.zeros(capacity, dtype=arr.dtype)
+                new_arr[:self.n] = arr[:self.n]
+                setattr(self, f'_{col}', new_arr)
+        for col in ['_last_by_source', '_last_by_target']:
+            arr = getattr(self, col)
+            if n_people > len(arr):
+                new_arr = np.full(max(n_people, int(1.5*len(arr))), -1, dtype=np.int32)
+                new_arr[:len(arr)] = arr
+                setattr(self, col, new_arr)
+
+    def append(self, entry):
+        """
+        Add an infection, a dictionary with keys 'source', 'target', 'date' and 'layer' as created by `cv.People.infect()`
+        """
+        source = -1 if entry['source'] is None else int(entry['source'])
+        target = int(entry['target'])
+        i = self.n
+        self._reserve(i + 1, max(source, target) + 1)
+        self._source[i] = source
+        self._target[i] = target
+        self._date[i] = entry['date']
+        self._layer[i] = self.layer_code(entry['layer'])
+        if source >= 0:
+            self._next_by_source[i] = self._last_by_source[source]
+            self._last_by_source[source] = i
+        else:
+            self._next_by_source[i] = -1
+        self._next_by_target[i] = self._last_by_target[target]
+        self._last_by_target[target] = i
+        self.n += 1
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    @property
+    def source(self) -> np.ndarray:
+        return self._source[:self.n]
+
+    @property
+    def target(self) -> np.ndarray:
+        return self._target[:self.n]
+
+    @property
+    def date(self) -> np.ndarray:
+        return self._date[:self.n]
+
+    @property
+    def layer(self) -> np.ndarray:
+        return self._layer[:self.n]
+
+    def _follow(self, last, next_entry, inds):
+        entries = []
+        for ind in np.atleast_1d(inds):
+            if ind < len(last):
+                i = last[ind]
+                while i >= 0:
+                    entries.append(i)
+                    i = next_entry[i]
+        return np.unique(np.array(entries, dtype=np.int64))
+
+    def by_source(self, inds) -> np.ndarray:
+        """
+        Return the (sorted) indexes of the entries where any of `inds` was the source
+        """
+        return self._follow(self._last_by_source, self._next_by_source, inds)
+
+    def by_target(self, inds) -> np.ndarray:
+        """
+        Return the (sorted) indexes of the entries where any of `inds` was infected
+        """
+        return self._follow(self._last_by_target, self._next_by_target, inds)
+
+    def involving(self, inds, lkey=None) -> np.ndarray:
+        """
+        Return the (sorted) indexes of the entries where any of `inds` was the source or the target
+
+        Args:
+            inds: Person indexes
+            lkey: Optionally, only return the infections in this layer
+        """
+        entries = np.union1d(self.by_source(inds), self.by_target(inds))
+        if lkey is not None:
+            entries = entries[self.layer[entries] == self._layer_codes.get(lkey, -1)]
+        return entries
+
+
+def get_infection_log(people) -> InfectionLog:
+    """
+    Return the infection log of a `cv.People` object as an InfectionLog
+
+    If the log is still a list, it is converted, and the people use the InfectionLog from then on.
+    """
+    if not isinstance(people.infection_log, InfectionLog):
+        people.infection_log = InfectionLog(people.infection_log, capacity=max(1000, len(people.infection_log)))
+    return people.infection_log
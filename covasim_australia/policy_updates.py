@@ -1,10 +1,13 @@
 import covasim_australia.contacts as co
+import covasim_australia.events as ev
 import covasim as cv
 import covasim.defaults as cvd
 import datetime as dt
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 import numpy as np
+import pandas as pd
+import pathlib
 import pylab as pl
 import sciris as sc
 import covasim.misc as cvm
@@ -42,6 +45,8 @@ class PolicySchedule(cv.Intervention):
             assert set(layer_values.keys()).issubset(self._baseline.keys()), f'Policy "{policy}" has effects on layers not included in the baseline'
         self.policy_schedule = []  #: Store the scheduling of policies [(start_day, end_day, policy_name)]
         self.days = {}  #: Internal cache for when the beta_layer values need to be recalculated during simulation. Updated using `_update_days`
+        self.layer_keys = list(self._baseline.keys())  #: The layer of each column of `beta_timeline`
+        self.beta_timeline = None  #: Relative beta of each layer on each day, compiled from the schedule by `initialize()`
 
     def start(self, policy_name: str, start_day: int) -> None:
         """
@@ -135,22 +140,37 @@ class PolicySchedule(cv.Intervention):
         # This helper function updates the list of days on which policies start or stop
         # The apply() function only gets run on those days
         self.days = {x[0] for x in self.policy_schedule}.union({x[1] for x in self.policy_schedule if np.isfinite(x[1])})
+        self.beta_timeline = None  # The schedule has changed, so it gets compiled again when needed
 
-    def _compute_beta_layer(self, t: int) -> dict:
-        # Compute beta_layer at a given point in time
-        # The computation is done from scratch each time
-        beta_layer = self._baseline.copy()
+    def compute_beta_timeline(self, npts: int) -> np.ndarray:
+        """
+        Compute the beta_layer values for every day of a simulation
+
+        Args:
+            npts: Number of days
+
+        Returns: A (days x layers) array of relative betas, with the layers in the order of `layer_keys`
+
+        """
+        days = np.arange(npts)
+        timeline = np.tile(np.array([self._baseline[lkey] for lkey in self.layer_keys], dtype=float), (npts, 1))
         for start_day, end_day, policy_name in self.policy_schedule:
             rel_betas = self.policies[policy_name]
-            if t >= start_day and t < end_day:
-                for layer in beta_layer:
-                    if layer in rel_betas:
-                        beta_layer[layer] *= rel_betas[layer]
-        return beta_layer
+            active = (days >= start_day) & (days < end_day)
+            for j, lkey in enumerate(self.layer_keys):
+                if lkey in rel_betas:
+                    timeline[active, j] *= rel_betas[lkey]
+        return timeline
+
+    def initialize(self, sim: cv.BaseSim):
+        super().initialize(sim)
+        self.beta_timeline = self.compute_beta_timeline(sim.npts)
 
     def apply(self, sim: cv.BaseSim):
         if sim.t in self.days:
-            sim['beta_layer'] = self._compute_beta_layer(sim.t)
+            if self.beta_timeline is None or len(self.beta_timeline) < sim.npts:  # The schedule was changed after initialization
+                self.beta_timeline = self.compute_beta_timeline(sim.npts)
+            sim['beta_layer'] = dict(zip(self.layer_keys, self.beta_timeline[sim.t].tolist()))
             if sim['verbose']:
                 print(f"PolicySchedule: Changing beta_layer values to {sim['beta_layer']}")
                 for entry in self.policy_schedule:
@@ -212,6 +232,94 @@ class PolicySchedule(cv.Intervention):
         return fig
 
 
+def beta_timelines(schedules, npts: int) -> np.ndarray:
+    """
+    Compute the beta_layer values of several policy schedules, e.g. the scenarios of a what-if analysis
+
+    Args:
+        schedules: A list of PolicySchedule objects with the same baseline layers
+        npts: Number of days
+
+    Returns: A (schedules x days x layers) array of relative betas, with the layers in the order of `layer_keys` of the schedules
+
+    """
+    for schedule in schedules[1:]:
+        assert schedule.layer_keys == schedules[0].layer_keys, 'All schedules must have the same layers'
+    return np.stack([schedule.compute_beta_timeline(npts) for schedule in schedules])
+
+
+_layer_betas_cache = {}  # Parsed layer betas files, {(path, modification time, layers): (dates, values, changed)}
+
+
+def read_layer_betas(betasfile, layers):
+    """
+    Read a file of relative layer betas by date, e.g. qld-model/inputs/qld_model_layer_betas_01.csv
+
+    The file has a 'date' column and a column of relative betas for each layer. Files are only parsed
+    the first time they are read (or after they are modified), so the arrays returned are shared and
+    must not be changed.
+
+    Args:
+        betasfile: The CSV file to read
+        layers: The layers to read the relative betas of
+
+    Returns: - An array of the date of each row
+             - A (rows x layers) array of relative betas
+             - A (rows x layers) boolean array, True if the relative beta of the layer changes on the row. The
+               first row is always a change, and changes on the last row are ignored
+
+    """
+    path = pathlib.Path(betasfile).resolve()
+    key = (str(path), path.stat().st_mtime_ns, tuple(layers))
+    if key not in _layer_betas_cache:
+        beta_data = pd.read_csv(path, parse_dates=['date'])
+        dates = beta_data['date'].values.astype('datetime64[D]')
+        values = beta_data[list(layers)].to_numpy(dtype=float)
+        changed = np.zeros(values.shape, dtype=bool)
+        changed[0] = True
+        changed[1:-1] = values[1:-1] != values[:-2]
+        for arr in [dates, values, changed]:
+            arr.flags.writeable = False
+        _layer_betas_cache[key] = (dates, values, changed)
+    return _layer_betas_cache[key]
+
+
+class LayerBetaTimeline(cv.Intervention):
+    def __init__(self, betasfile, layers, **kwargs):
+        """
+        Change the beta of each layer over time as specified by a layer betas file
+
+        This is equivalent to a cv.change_beta() for each layer that applies the relative beta on every
+        day it changes in the file, but all layers are updated with a single lookup per day.
+
+        Args:
+            betasfile: CSV file of relative betas by date, see read_layer_betas()
+            layers: List of the layers to change
+            kwargs: Passed to cv.Intervention()
+        """
+        super().__init__(**kwargs)
+        self._store_args()
+        self.betasfile = betasfile
+        self.layers = list(layers)
+        self.betas = None  #: (days x layers) array of the beta of each layer on the days it changes, set by initialize()
+        self.changed = None  #: (days x layers) boolean array, True on the days each layer changes
+
+    def initialize(self, sim):
+        super().initialize(sim)
+        dates, values, changed = read_layer_betas(self.betasfile, self.layers)
+        days = (dates - np.datetime64(sc.date(sim['start_day']), 'D')).astype(int)
+        rows = (days >= 0) & (days < sim.npts)  # Changes outside the simulation never take effect
+        orig_betas = np.array([sim['beta_layer'][lkey] for lkey in self.layers])
+        self.betas = np.full((sim.npts, len(self.layers)), np.nan)
+        self.changed = np.zeros((sim.npts, len(self.layers)), dtype=bool)
+        self.betas[days[rows]] = orig_betas * values[rows]
+        self.changed[days[rows]] = changed[rows]
+
+    def apply(self, sim):
+        for j in np.flatnonzero(self.changed[sim.t]):
+            sim['beta_layer'][self.layers[j]] = self.betas[sim.t, j]
+
+
 class AppBasedTracing(cv.Intervention):
     def __init__(self, name, days, coverage, layers, start_day=0, end_day=None, trace_time=0):
         """
@@ -252,14 +360,14 @@ class AppBasedTracing(cv.Intervention):
         # Index to use for the current day
         idx = np.argmax(self.days > sim.t)-1 # nb. if sim.t<self.days[0] this will be wrong, hence the validation in __init__()
         trace_prob = dict.fromkeys(self.layers, self.coverage[idx] ** 2)  # Probability of both people having the app
-        just_diagnosed_inds = cvu.true(sim.people.date_diagnosed == t)
+        just_diagnosed_inds = ev.people_on(sim.people, 'date_diagnosed', t)
         if len(just_diagnosed_inds):
             sim.people.trace(just_diagnosed_inds, trace_prob, self.trace_time)
         return
 
 
 class UpdateNetworks(cv.Intervention):
-    def __init__(self, layers, contact_numbers, layer_members, start_day=0, end_day=None, dispersion=None):
+    def __init__(self, layers, contact_numbers, layer_members, start_day=0, end_day=None, dispersion=None, turnover=None):
         """
         Update random networks at each time step
         Args:
@@ -267,6 +375,9 @@ class UpdateNetworks(cv.Intervention):
             start_day (int): intervention start day.
             end_day (int): intervention end day
             contact_numbers: dictionary of average contacts for each layer
+            turnover: Optionally rewire only part of each layer every day rather than regenerating it. Either the
+                      fraction of layer members whose contacts are resampled each day (applied to all layers) or a
+                      dictionary of fractions by layer e.g. {'C': 0.2}. Layers without a value are regenerated in full
         """
         super().__init__()
         self.layers = layers
@@ -275,12 +386,30 @@ class UpdateNetworks(cv.Intervention):
         self.contact_numbers = contact_numbers
         self.dispersion = dispersion
         self.layer_members = layer_members  # {lkey: [uids]}
+        if turnover is None or isinstance(turnover, dict):
+            self.turnover = turnover or {}
+        else:
+            self.turnover = dict.fromkeys(layers, turnover)  #: Fraction of members rewired each day by layer {lkey: fraction}
+        self._buffers = {}  #: Preallocated edge storage for each layer {lkey: co.EdgeBuffer}, created when first needed
         return
 
+    def __getstate__(self):
+        # Don't copy the edge buffers when the sim is saved or sent to other processes, they get recreated when needed
+        state = self.__dict__.copy()
+        state['_buffers'] = {}
+        return state
+
+    def _get_buffer(self, lkey):
+        if lkey not in self._buffers:
+            capacity = co.edge_capacity(len(self.layer_members[lkey]), self.contact_numbers[lkey], self.dispersion.get(lkey))
+            self._buffers[lkey] = co.EdgeBuffer(capacity)
+        return self._buffers[lkey]
+
     def initialize(self, sim):
         super().initialize(sim)
         self.start_day = sim.day(self.start_day)
         self.end_day = sim.day(self.end_day)
+        self.dispersion = self.dispersion or {}
         return
 
     def apply(self, sim):
@@ -292,17 +421,96 @@ class UpdateNetworks(cv.Intervention):
 
         # Loop over dynamic keys
         for lkey in self.layers:
-
-            # Sample new contacts, overwriting the existing ones
-            sim.people.contacts[lkey]['p1'], sim.people.contacts[lkey]['p2'] = co.make_random_contacts(include_inds=self.layer_members[lkey],
-                                                                             mean_number_of_contacts=self.contact_numbers[lkey],
-                                                                             dispersion=self.dispersion[lkey],
-                                                                             array_output=True,
-                                                                             )
+            layer = sim.people.contacts[lkey]
+            buffer = self._get_buffer(lkey)
+
+            if self.turnover.get(lkey) is not None:
+                # Rewire a fraction of the edges. The rewired edges only contain indexes that were already
+                # valid, so the layer doesn't need to be validated again
+                p1, p2 = co.rewire_random_contacts(layer['p1'],
+                                                   layer['p2'],
+                                                   include_inds=self.layer_members[lkey],
+                                                   mean_number_of_contacts=self.contact_numbers[lkey],
+                                                   turnover=self.turnover[lkey],
+                                                   dispersion=self.dispersion.get(lkey),
+                                                   pop_size=sim.n,
+                                                   out=buffer)
+                layer['p1'], layer['p2'], layer['beta'] = buffer.view(len(p1))
+                continue
+
+            # Sample new contacts, overwriting the existing ones. The layer is a view of the buffer, so no arrays are allocated
+            p1, p2 = co.make_random_contacts(include_inds=self.layer_members[lkey],
+                                             mean_number_of_contacts=self.contact_numbers[lkey],
+                                             dispersion=self.dispersion.get(lkey),
+                                             array_output=True,
+                                             out=buffer,
+                                             )
             # Update beta shape and check validity
-            sim.people.contacts[lkey]['beta'] = np.ones(sim.people.contacts[lkey]['p1'].shape, dtype=cvd.default_float)
-            sim.people.contacts[lkey].validate()
+            layer['p1'], layer['p2'], layer['beta'] = buffer.view(len(p1))
+            layer.validate()
+
+        return
+
+
+class GroupTransmission(cv.Intervention):
+    def __init__(self, layers=None):
+        """
+        Transmission within co.GroupLayer layers
+
+        Covasim only transmits along the edges of a layer, and group layers don't have any, so this intervention
+        computes their transmission instead, using the same layer parameters (beta_layer, iso_factor and quar_factor)
+        as covasim uses for edges. It should come after any testing and tracing interventions, so that like covasim's
+        own transmission it happens after everything else on that day. Diagnosis and quarantine start at the end
+        of the interventions, so people diagnosed or quarantined today are still treated as they were yesterday.
+
+        cv.clip_edges() has no effect on group layers - use sim['beta_layer'] to change transmission in them instead.
+
+        Args:
+            layers: List of group layer names, defaults to all of the co.GroupLayer layers in the sim
+        """
+        super().__init__()
+        self.layers = layers
+        return
+
+    def transmits(self, lkey) -> bool:
+        """
+        Return True if this intervention transmits in layer `lkey`, see co.check_group_transmission()
+        """
+        return self.layers is None or lkey in self.layers
+
+    def initialize(self, sim):
+        super().initialize(sim)
+        if self.layers is None:
+            self.layers = [lkey for lkey, layer in sim.people.contacts.items() if isinstance(layer, co.GroupLayer)]
+        for lkey in self.layers:
+            assert isinstance(sim.people.contacts[lkey], co.GroupLayer), f'Layer "{lkey}" is not a group layer'
+        return
+
+    def apply(self, sim):
+        if not self.layers:
+            return
 
+        t = sim.t
+        people = sim.people
+        hosp_max = people.count('severe') > sim['n_beds_hosp'] if sim['n_beds_hosp'] else False
+        icu_max = people.count('critical') > sim['n_beds_icu'] if sim['n_beds_icu'] else False
+
+        beta = cvd.default_float(sim['beta'])
+        asymp_factor = cvd.default_float(sim['asymp_factor'])
+        frac_time = cvd.default_float(sim['viral_dist']['frac_time'])
+        load_ratio = cvd.default_float(sim['viral_dist']['load_ratio'])
+        high_cap = cvd.default_float(sim['viral_dist']['high_cap'])
+        viral_load = cvu.compute_viral_load(t, people.date_infectious, people.date_recovered, people.date_dead, frac_time, load_ratio, high_cap)
+
+        for lkey in self.layers:
+            iso_factor = cvd.default_float(sim['iso_factor'][lkey])
+            quar_factor = cvd.default_float(sim['quar_factor'][lkey])
+            beta_layer = cvd.default_float(sim['beta_layer'][lkey])
+            rel_trans, rel_sus = cvu.compute_trans_sus(people.rel_trans, people.rel_sus, people.infectious, people.susceptible, beta_layer, viral_load,
+                                                       people.symptomatic, people.diagnosed, people.quarantined, asymp_factor, iso_factor, quar_factor)
+            source_inds, target_inds = people.contacts[lkey].compute_infections(beta, rel_trans, rel_sus)
+            if len(target_inds):
+                people.infect(inds=target_inds, hosp_max=hosp_max, icu_max=icu_max, source=source_inds, layer=lkey)
         return
 
 
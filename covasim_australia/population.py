@@ -3,4 +3,291 @@
 #   - Demographic distribution
 #   - Household size distribution
 #   - Household mixing matrix
-#   - Optionally household head age distribution
\ No newline at end of file
+#   - Optionally household head age distribution
+
+import covasim as cv
+import covasim.utils as cvu
+import hashlib
+import json
+import numpy as np
+import os
+import pandas as pd
+import pathlib
+import sciris as sc
+import shutil
+
+import covasim_australia.contacts as co
+import covasim_australia.events as ev
+import covasim_australia.infection_log as il
+
+# Bump this whenever the population generation code changes in a way that
+# changes the population produced for the same inputs, to invalidate old caches
+cache_version = 2
+
+
+def _canonical(obj):
+    """
+    Convert the inputs to a population into plain JSON-serializable types
+
+    Dictionaries are sorted by key and pandas/numpy objects are converted
+    to lists so that the same inputs always produce the same JSON string.
+    """
+    if isinstance(obj, dict):
+        return [[str(k), _canonical(obj[k])] for k in sorted(obj, key=str)]
+    elif isinstance(obj, pd.DataFrame):
+        return {'index': _canonical(obj.index.tolist()),
+                'columns': _canonical(obj.columns.tolist()),
+                'values': _canonical(obj.values.tolist())}
+    elif isinstance(obj, pd.Series):
+        return {'index': _canonical(obj.index.tolist()),
+                'values': _canonical(obj.values.tolist())}
+    elif isinstance(obj, np.ndarray):
+        return _canonical(obj.tolist())
+    elif isinstance(obj, (list, tuple)):
+        return [_canonical(x) for x in obj]
+    elif isinstance(obj, np.generic):
+        return obj.item()
+    else:
+        return obj
+
+
+def population_inputs(params, seed=None, group_layers=False, undirected=False):
+    """
+    Collect everything that determines the population made by make_people()
+
+    Args:
+        params: A Parameters() object
+        seed: The random seed used to generate the population
+        group_layers, undirected: Passed to make_people()
+
+    Returns: A dictionary of the population inputs
+    """
+    return {'cache_version': cache_version,
+            'seed': seed,
+            'group_layers': group_layers,
+            'undirected': undirected,
+            'pop_size': params.pars['pop_size'],
+            'contacts': params.pars['contacts'],
+            'household_dist': params.household_dist,
+            'age_dist': params.age_dist,
+            'contact_matrix': params.contact_matrix,
+            'all_lkeys': params.all_lkeys,
+            'custom_lkeys': params.custom_lkeys,
+            'layerchars': params.layerchars}
+
+
+def population_key(params, seed=None, group_layers=False, undirected=False) -> str:
+    """
+    Hash the population inputs
+
+    Two Parameters() objects with the same key generate the same population
+    for the same seed, regardless of any other simulation parameters.
+
+    Args:
+        params: A Parameters() object
+        seed: The random seed used to generate the population
+        group_layers, undirected: Passed to make_people()
+
+    Returns: A hex string
+    """
+    inputs = json.dumps(_canonical(population_inputs(params, seed, group_layers, undirected)), default=str)
+    return hashlib.sha256(inputs.encode()).hexdigest()
+
+
+def make_people_cached(params, seed=None, cache_dir='population_cache', verbose=True, group_layers=False, undirected=False):
+    """
+    Construct a cv.People object, reusing a previously generated one if possible
+
+    Populations are stored in `cache_dir` under their population key, so
+    changing any of the population inputs (e.g. the databook, pop_size, the
+    layers or the seed) generates a new population rather than reusing an old
+    one. Populations made without a seed are not reproducible, so they are
+    never cached.
+
+    Args:
+        params: A Parameters() object
+        seed: The random seed used to generate the population
+        cache_dir: Folder to store the populations in
+        verbose: Print whether the population was loaded or generated
+        group_layers, undirected: Passed to make_people()
+
+    Returns: - People object
+             - A dictionary of layer members, {lkey: [indexes]}
+    """
+    if seed is None:
+        return co.make_people(params, group_layers, undirected)
+
+    key = population_key(params, seed, group_layers, undirected)
+    dirname = pathlib.Path(cache_dir)/key
+
+    if (dirname/'meta.json').exists():
+        if verbose:
+            print(f'Loading cached population from "{dirname}"')
+        people, layer_members = load_people_arrays(dirname, key=key)
+        people.pars = params.pars
+        return people, layer_members
+
+    cvu.set_seed(seed)
+    people, layer_members = co.make_people(params, group_layers, undirected)
+
+    # Save to a temporary directory first so other processes never see a partially written population
+    tmp_dirname = dirname.with_suffix(f'.{os.getpid()}.tmp')
+    save_people_arrays(tmp_dirname, people, layer_members, key)
+    try:
+        os.rename(tmp_dirname, dirname)
+    except OSError:  # Another process saved the same population first
+        shutil.rmtree(tmp_dirname)
+    if verbose:
+        print(f'Saved population to "{dirname}"')
+
+    return people, layer_members
+
+
+def save_people_arrays(dirname, people, layer_members=None, key=None):
+    """
+    Save a population as a directory of .npy files
+
+    Each person attribute, each contact layer column and each set of layer
+    members is stored in its own file, so that load_people_arrays() can
+    memory-map them instead of unpickling the whole population. Group layers
+    (co.GroupLayer) are stored as their group membership arrays.
+
+    Args:
+        dirname: Directory to save to
+        people: A cv.People object
+        layer_members: Optionally, a dictionary of layer members, {lkey: [indexes]}
+        key: The population key, from population_key()
+    """
+    dirname = pathlib.Path(dirname)
+    os.makedirs(dirname, exist_ok=True)
+    layer_members = layer_members or {}
+
+    for pkey in people.keys():
+        np.save(dirname/f'people.{pkey}.npy', people[pkey])
+    group_layer_keys = []
+    for lkey, layer in people.contacts.items():
+        if isinstance(layer, co.GroupLayer):
+            np.save(dirname/f'groups.{lkey}.members.npy', layer.group_members)
+            np.save(dirname/f'groups.{lkey}.ids.npy', layer.group_ids)
+            group_layer_keys.append(lkey)
+            continue
+        for col in layer.meta.keys():
+            np.save(dirname/f'contacts.{lkey}.{col}.npy', layer[col])
+    for lkey, members in layer_members.items():
+        np.save(dirname/f'layer_members.{lkey}.npy', np.asarray(members))
+
+    # Written last, so a directory without it is an incomplete population
+    meta = {'key': key,
+            'pop_size': len(people),
+            'people_keys': people.keys(),
+            'layer_keys': people.layer_keys(),
+            'group_layer_keys': group_layer_keys,
+            'layer_member_keys': list(layer_members.keys())}
+    with open(dirname/'meta.json', 'w') as f:
+        json.dump(meta, f)
+
+
+def load_people_arrays(dirname, mmap_mode='c', key=None):
+    """
+    Load a population saved with save_people_arrays()
+
+    With the default mmap_mode='c' the arrays are memory-mapped copy-on-write:
+    loading is almost instant, processes loading the same population share the
+    memory for it, and any changes made during a simulation stay private to the
+    process making them.
+
+    Args:
+        dirname: Directory to load from
+        mmap_mode: Passed to np.load(), None reads the arrays into memory
+        key: If provided, the population must have been saved with this key
+
+    Returns: - People object
+             - A dictionary of layer members, {lkey: [indexes]}
+    """
+    dirname = pathlib.Path(dirname)
+    with open(dirname/'meta.json') as f:
+        meta = json.load(f)
+    if key is not None and meta['key'] != key:
+        raise Exception(f'Population in "{dirname}" was generated from different inputs (key {meta["key"]}, expected {key})')
+
+    def load(fname):
+        # np.asarray() strips the np.memmap subclass without copying, so numba accepts the arrays
+        return np.asarray(np.load(dirname/fname, mmap_mode=mmap_mode))
+
+    # Make an empty People object and attach the arrays to it
+    people = ev.IndexedPeople(pars={'pop_size': 0})
+    people.pop_size = meta['pop_size']
+    people.pars['pop_size'] = meta['pop_size']
+    for pkey in meta['people_keys']:
+        people[pkey] = load(f'people.{pkey}.npy')
+    people._dtypes = {pkey: people[pkey].dtype for pkey in people.keys()}
+    people.infection_log = il.InfectionLog()
+
+    people.contacts = cv.Contacts(layer_keys=meta['layer_keys'])
+    for lkey in meta.get('group_layer_keys', []):
+        people.contacts[lkey] = co.GroupLayer.from_groups(load(f'groups.{lkey}.members.npy'), load(f'groups.{lkey}.ids.npy'))
+    for lkey, layer in people.contacts.items():
+        if isinstance(layer, co.GroupLayer):
+            continue
+        for col in layer.meta.keys():
+            layer[col] = load(f'contacts.{lkey}.{col}.npy')
+
+    layer_members = {lkey: load(f'layer_members.{lkey}.npy') for lkey in meta['layer_member_keys']}
+
+    return people, layer_members
+
+
+def load_popfile(popfile, mmap_mode='c', key=None, params=None, seed=None):
+    """
+    Load a cv.People object from a pickled popfile or a directory of arrays
+
+    The result can be passed straight to cv.Sim(popfile=..., load_pop=True).
+    If `popfile` is already a cv.People object, it is returned as it is.
+
+    If a population key is given, either directly or as the params and seed the population should have been
+    made from, the popfile must have been saved with that key (see check_popfile()). Otherwise an exception is
+    raised, so a population made from out of date inputs is never used without noticing.
+
+    Args:
+        popfile: A pickled popfile, a directory saved with save_people_arrays(), or a cv.People object
+        mmap_mode: Passed to load_people_arrays()
+        key: Optionally, the population key the popfile must have been saved with
+        params, seed: Optionally, the Parameters() object and seed to calculate the key from, see population_key()
+    """
+    if isinstance(popfile, cv.People):
+        return popfile
+    if key is None and params is not None:
+        key = population_key(params, seed)
+    if key is not None and not check_popfile(popfile, key):
+        raise Exception(f'The population in "{popfile}" is missing or was made from different inputs (expected key {key}), it needs to be made again')
+    if os.path.isdir(popfile):
+        return load_people_arrays(popfile, mmap_mode=mmap_mode)[0]
+    return sc.loadobj(str(popfile))
+
+
+def save_popfile(popfile, people, key):
+    """
+    Save a cv.People object for loading with cv.Sim(popfile=..., load_pop=True)
+
+    The population key is written next to it in `<popfile>.key` so that
+    check_popfile() can tell whether the file is still up to date.
+    """
+    sc.saveobj(str(popfile), people)
+    with open(f'{popfile}.key', 'w') as f:
+        f.write(key)
+
+
+def check_popfile(popfile, key) -> bool:
+    """
+    Return True if `popfile` exists and was saved with this population key
+
+    `popfile` can also be a directory saved with save_people_arrays().
+    """
+    try:
+        if os.path.isdir(popfile):
+            with open(pathlib.Path(popfile)/'meta.json') as f:
+                return json.load(f)['key'] == key
+        with open(f'{popfile}.key') as f:
+            return os.path.exists(popfile) and f.read().strip() == key
+    except FileNotFoundError:
+        return False
@@ -0,0 +1,174 @@
+import copy
+import covasim as cv
+import covasim_australia.contacts as co
+import covasim_australia.ensemble as ens
+import multiprocessing as mp
+
+# The sim being run by run_msim(). Worker processes inherit it when they are forked.
+_base_sim = None
+_shared_arrays = None
+
+# The batch being run by run_batch(): (make_sim, points, people, run_kwargs), and the sim of the point each worker last built
+_batch = None
+_batch_sim = (None, None, None)  # (point index, sim, shared arrays)
+
+
+def _get_shared_arrays(people):
+    """
+    Return the arrays of a cv.People that are never modified in place during a simulation
+
+    These are the contact layers and the person attributes that covasim only
+    reads. Sims copied with _copy_sim() share them instead of copying them.
+    """
+    arrays = [people.uid, people.age]
+    for layer in people.contacts.values():
+        arrays.extend(layer[col] for col in layer.meta.keys())
+        if isinstance(layer, co.GroupLayer):
+            arrays.extend([layer.group_members, layer.group_ids])
+    return arrays
+
+
+def _copy_sim(sim, shared_arrays):
+    # Layers that get changed during a run are replaced with new arrays, never modified in place,
+    # so passing the shared arrays in the memo dictionary makes deepcopy() reuse them
+    memo = {id(arr): arr for arr in shared_arrays}
+    return copy.deepcopy(sim, memo)
+
+
+def _run_copy(args):
+    ind, kwargs = args
+    sim = _copy_sim(_base_sim, _shared_arrays)
+    return ind, cv.single_run(sim, ind=ind, **kwargs)
+
+
+def run_msim(sim, n_runs=4, ncpus=None, reseed=True, noise=0.0, noisepar=None, keep_people=False, run_args=None, sim_args=None, verbose=None, store=None, store_keys=None):
+    """
+    Run multiple copies of a sim in parallel, equivalent to cv.MultiSim(sim).run()
+
+    cv.MultiSim pickles the whole base sim, including the population, and sends
+    it to the worker processes for every run. Here the population is loaded once
+    in this process and the workers are forked from it, so they share its memory.
+    Each run deep-copies the sim apart from the contact layers and the person
+    attributes that don't change during a run.
+
+    The sim itself is not initialized before forking, since initialization
+    depends on the random seed of each run (e.g. for the initial infections).
+
+    Args:
+        sim: A cv.Sim, with its population either already loaded or loadable from sim.popfile
+        n_runs: Number of runs
+        ncpus: Number of worker processes, defaults to the number of CPUs
+        reseed, noise, noisepar, keep_people, run_args, sim_args, verbose: Passed to cv.single_run()
+        store: Optionally, a directory to write the results of each run to as soon as it finishes, see EnsembleStore
+        store_keys: The results to write to the store, defaults to all of them
+
+    Returns: A cv.MultiSim containing the sims that were run
+    """
+    global _base_sim, _shared_arrays
+
+    if 'fork' not in mp.get_all_start_methods():
+        # Worker processes can't share memory with this one, so fall back to pickling the sim
+        msim = cv.MultiSim(base_sim=sim, par_args={'ncpus': ncpus})
+        msim.run(n_runs=n_runs, reseed=reseed, noise=noise, noisepar=noisepar, keep_people=keep_people,
+                 run_args=run_args, sim_args=sim_args, verbose=verbose)
+        if store is not None:
+            ens.EnsembleStore.from_sims(store, msim.sims, store_keys)
+        return msim
+
+    if sim.people is None:
+        sim.load_population()
+    if sim.people is None:
+        raise Exception('The sim must have a population before running, e.g. created with cv.Sim(popfile=..., load_pop=True)')
+
+    kwargs = dict(reseed=reseed, noise=noise, noisepar=noisepar, keep_people=keep_people, run_args=run_args, sim_args=sim_args, verbose=verbose)
+
+    sims = [None]*n_runs
+    results = None
+    _base_sim, _shared_arrays = sim, _get_shared_arrays(sim.people)
+    try:
+        with mp.get_context('fork').Pool(ncpus) as pool:
+            for ind, this_sim in pool.imap_unordered(_run_copy, [(ind, kwargs) for ind in range(n_runs)]):
+                sims[ind] = this_sim
+                if store is not None:
+                    if results is None:
+                        results = ens.EnsembleStore.create(store, n_runs, store_keys or ens.result_keys(this_sim), this_sim.npts, this_sim['start_day'])
+                    results.add(ind, this_sim)
+                    results.flush()
+    finally:
+        _base_sim, _shared_arrays = None, None
+
+    return cv.MultiSim(sims=sims, base_sim=sim)
+
+
+def _run_batch_copy(args):
+    # Run one simulation of a point of the batch, building the sim of the point the first time this worker runs it
+    global _batch_sim
+    point_ind, ind = args
+    make_sim, points, people, kwargs = _batch
+    if _batch_sim[0] != point_ind:
+        _batch_sim = (None, None, None)  # Free the previous sim first
+        sim = make_sim(points[point_ind], copy.deepcopy(people, {id(arr): arr for arr in _get_shared_arrays(people)}))
+        _batch_sim = (point_ind, sim, _get_shared_arrays(sim.people))
+    _, sim, shared_arrays = _batch_sim
+    return point_ind, ind, cv.single_run(_copy_sim(sim, shared_arrays), ind=ind, **kwargs)
+
+
+def run_batch(make_sim, points, people, n_runs=4, ncpus=None, callback=None, reseed=True, noise=0.0, noisepar=None, run_args=None, sim_args=None, verbose=None):
+    """
+    Run an ensemble of simulations for each point of a parameter grid, in a single pool of processes
+
+    Running each point with run_msim() in a separate process means importing covasim, loading the
+    population and starting worker processes again for every point. Here the population is loaded
+    once, the worker processes are forked from this process once, and they run the simulations of all
+    the points. Each worker builds the sim of a point the first time it runs one of its simulations,
+    with a copy of the population that shares the contact layers, and then copies it for each run like
+    run_msim() does.
+
+    Args:
+        make_sim: Function make_sim(point, people) returning the cv.Sim for a point, with the people as its population.
+                  It is called in the worker processes, so it must give the same sim every time it is called
+        points: List of points, e.g. dictionaries of parameter values, passed to make_sim()
+        people: The cv.People object to use as the population of every sim. It isn't changed
+        n_runs: Number of runs of each point
+        ncpus: Number of worker processes, defaults to the number of CPUs. With ncpus=1 the simulations are run in this process
+        callback: Optionally, a function callback(point_ind, msim) called in this process as soon as all the runs of a point have finished
+        reseed, noise, noisepar, run_args, sim_args, verbose: Passed to cv.single_run()
+
+    Returns: A list with a cv.MultiSim for each point, or with None for each point if there is a callback, so
+             the simulations of every point don't need to be kept in memory
+    """
+    global _batch, _batch_sim
+
+    kwargs = dict(reseed=reseed, noise=noise, noisepar=noisepar, run_args=run_args, sim_args=sim_args, verbose=verbose)
+    tasks = [(point_ind, ind) for point_ind in range(len(points)) for ind in range(n_runs)]
+    sims = [[None]*n_runs for _ in points]
+    n_finished = [0]*len(points)
+    msims = [None]*len(points)
+
+    _batch = (make_sim, points, people, kwargs)
+    pool = None
+    try:
+        if ncpus == 1 or 'fork' not in mp.get_all_start_methods():
+            results = map(_run_batch_copy, tasks)
+        else:
+            pool = mp.get_context('fork').Pool(ncpus)
+            results = pool.imap(_run_batch_copy, tasks)  # In order, so workers mostly run the simulations of the same point
+        for point_ind, ind, sim in results:
+            sims[point_ind][ind] = sim
+            n_finished[point_ind] += 1
+            if n_finished[point_ind] == n_runs:
+                msim = cv.MultiSim(sims=sims[point_ind], base_sim=sims[point_ind][0])
+                sims[point_ind] = None
+                if callback is None:
+                    msims[point_ind] = msim
+                else:
+                    callback(point_ind, msim)
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        if pool is not None:
+            pool.terminate()
+        _batch, _batch_sim = None, (None, None, None)
+
+    return msims
@@ -0,0 +1,255 @@
+import covasim_australia.ensemble as ens
+import covasim_australia.runner as runner
+import hashlib
+import itertools
+import json
+import os
+import pathlib
+import socket
+
+
+def expand_grid(grid) -> list:
+    """
+    Return the points of a parameter grid, as a list of dictionaries of parameter values
+
+    Args:
+        grid: Either a dictionary of the values of each parameter, e.g. {'iq_factor': [1, 2], 'cluster_size': [1, 5, 10]},
+              in which case every combination of the values is a point, or a list of points that is returned as it is
+
+    Returns: List of points
+    """
+    if isinstance(grid, dict):
+        return [dict(zip(grid.keys(), values)) for values in itertools.product(*grid.values())]
+    return list(grid)
+
+
+def task_id(point) -> str:
+    """
+    Return the ID of the task running a point, a hash of its parameter values
+
+    The same point always has the same ID, however the grid it is part of is ordered or extended.
+    """
+    return hashlib.sha256(json.dumps(point, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _output_done(filename) -> bool:
+    # An EnsembleStore only counts once all of its runs have been written, other outputs once they exist
+    if os.path.isdir(filename) and os.path.exists(os.path.join(filename, 'meta.json')):
+        return ens.is_complete(filename)
+    return os.path.exists(filename)
+
+
+def _write_json(filename, obj):
+    # Write to a temporary file first so other processes never read a partially written file
+    tmp_filename = f'{filename}.{socket.gethostname()}.{os.getpid()}.tmp'
+    with open(tmp_filename, 'w') as f:
+        json.dump(obj, f, default=str)
+    os.replace(tmp_filename, filename)
+
+
+class SweepManifest():
+    """
+    Record of which tasks of a sweep have finished, stored in a folder
+
+    The folder contains
+        - tasks.json: The point of each task, {task_id: point}
+        - done/<task_id>.json: Written when a task finishes, with its point and its output files
+        - claims/<task_id>: Exists while a process is running the task, containing the host and process ID
+
+    Every file is written atomically and a task is claimed by creating its claim file exclusively, so any number
+    of processes, on one node or on many nodes sharing a filesystem, can work through the same sweep without
+    running a task twice.
+
+    Claims are removed when a task finishes or fails. A claim left behind by a process that was killed is
+    taken over automatically by processes on the same host, claims from other hosts need `release_claims()`.
+
+    Args:
+        folder: Folder to store the manifest in
+        points: Optionally, the points of the sweep to add to tasks.json
+    """
+
+    def __init__(self, folder, points=None):
+        self.folder = pathlib.Path(folder)
+        os.makedirs(self.folder/'done', exist_ok=True)
+        os.makedirs(self.folder/'claims', exist_ok=True)
+        if points:
+            tasks = self.tasks()
+            tasks.update({task_id(point): point for point in points})
+            _write_json(self.folder/'tasks.json', tasks)
+
+    def __repr__(self):
+        return f'SweepManifest("{self.folder}": {len(self.finished())} of {len(self.tasks())} tasks done, {len(self.claimed())} running)'
+
+    def tasks(self) -> dict:
+        """
+        Return the point of each task, {task_id: point}
+        """
+        try:
+            with open(self.folder/'tasks.json') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def finished(self) -> list:
+        """
+        Return the IDs of the tasks that have finished
+        """
+        return sorted(p.stem for p in (self.folder/'done').glob('*.json'))
+
+    def claimed(self) -> list:
+        """
+        Return the IDs of the tasks that are claimed by a process
+        """
+        return sorted(p.name for p in (self.folder/'claims').iterdir() if not p.name.endswith('.tmp'))
+
+    def is_done(self, task) -> bool:
+        return (self.folder/'done'/f'{task}.json').exists()
+
+    def mark_done(self, task, point=None, outputs=None):
+        """
+        Record that a task has finished, with the output files it wrote
+        """
+        _write_json(self.folder/'done'/f'{task}.json', {'point': point, 'outputs': [str(x) for x in outputs or []], 'host': socket.gethostname()})
+
+    def claim(self, task) -> bool:
+        """
+        Claim a task for this process, returning False if another process has already claimed it
+        """
+        filename = self.folder/'claims'/task
+        try:
+            fd = os.open(filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if not self._is_stale(filename):
+                return False
+            os.remove(filename)
+            return self.claim(task)
+        with os.fdopen(fd, 'w') as f:
+            f.write(f'{socket.gethostname()} {os.getpid()}')
+        return True
+
+    @staticmethod
+    def _is_stale(filename) -> bool:
+        # Return True if the claim was made by a process on this host that is no longer running
+        try:
+            with open(filename) as f:
+                host, pid = f.read().split()
+        except (FileNotFoundError, ValueError):  # Released, or still being written
+            return False
+        if host != socket.gethostname() or int(pid) == os.getpid():
+            return False
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+        return False
+
+    def release(self, task):
+        """
+        Remove the claim on a task, so it can be run again
+        """
+        try:
+            os.remove(self.folder/'claims'/task)
+        except FileNotFoundError:
+            pass
+
+    def release_claims(self):
+        """
+        Remove the claims on all the tasks, e.g. after a node running part of the sweep crashed
+
+        Only call this when no other process is running the sweep.
+        """
+        for task in self.claimed():
+            self.release(task)
+
+
+def run_sweep(make_sim, grid, people, folder, n_runs=4, ncpus=None, save=None, outputs=None, chunk_size=None, verbose=True, **kwargs) -> SweepManifest:
+    """
+    Run an ensemble of simulations for each point of a parameter grid, resuming where a previous attempt stopped
+
+    Each point is a task. Tasks are recorded in a SweepManifest in `folder` as they finish, and running
+    the sweep again, e.g. after it was interrupted or some of its tasks failed, only runs the tasks that
+    haven't finished. Tasks whose output files all exist are skipped too, even if they were run outside the
+    sweep. An EnsembleStore output only counts as existing once all of its runs have been written. Outputs
+    should be written so that they only exist once they are complete, e.g. by writing them to a temporary file
+    and moving it into place, as EnsembleStore.from_sims() does. The simulations are run with runner.run_batch(),
+    in a single pool of processes.
+
+    Several processes, e.g. one on each of several nodes sharing a filesystem, can run the same sweep at
+    once. Each process claims `chunk_size` tasks at a time, runs them, and claims more until none are left.
+
+    Args:
+        make_sim: Function make_sim(point, people) returning the cv.Sim for a point, see runner.run_batch()
+        grid: The points to run, a dictionary of the values of each parameter or a list of points, see expand_grid().
+              Points are saved in the manifest, so their values should be JSON serializable
+        people: The cv.People object to use as the population of every sim
+        folder: Folder to store the manifest, and by default the results, in
+        n_runs: Number of runs of each point
+        ncpus: Number of worker processes, defaults to the number of CPUs
+        save: Function save(point, msim) saving the results of a point. By default the results are written to
+              an EnsembleStore in `<folder>/<task_id>.ens`
+        outputs: Function outputs(point) returning the files that `save` writes for a point, used to skip points
+                 that have already been run. List every file `save` writes, or at least the one it writes last.
+                 Defaults to the EnsembleStore written by the default `save`
+        chunk_size: Number of tasks to claim at a time, defaults to all of them. Set it when several processes run the sweep
+        verbose: Print the progress of the sweep
+        kwargs: Passed to runner.run_batch(), e.g. `noise`
+
+    Returns: The SweepManifest of the sweep
+    """
+    folder = pathlib.Path(folder)
+    points = expand_grid(grid)
+    manifest = SweepManifest(folder, points)
+
+    if save is None:
+        save = lambda point, msim: ens.EnsembleStore.from_sims(folder/f'{task_id(point)}.ens', msim.sims)
+        if outputs is None:
+            outputs = lambda point: [folder/f'{task_id(point)}.ens']
+    if outputs is None:
+        outputs = lambda point: []
+
+    def is_done(point):
+        # With outputs, the task is done if they all exist, otherwise if the manifest says it is
+        task, files = task_id(point), outputs(point)
+        if files and all(_output_done(x) for x in files):
+            if not manifest.is_done(task):
+                manifest.mark_done(task, point, files)
+            return True
+        return not files and manifest.is_done(task)
+
+    pending = [point for point in points if not is_done(point)]
+    if verbose:
+        print(f'Sweep "{folder}": {len(points) - len(pending)} of {len(points)} tasks already done')
+
+    while pending:
+        chunk = []
+        for point in pending:
+            if manifest.claim(task_id(point)):
+                if is_done(point):  # Finished by another process since the sweep started
+                    manifest.release(task_id(point))
+                    continue
+                chunk.append(point)
+                if chunk_size is not None and len(chunk) == chunk_size:
+                    break
+        if not chunk:
+            break
+        pending = [point for point in pending if point not in chunk]
+
+        def callback(point_ind, msim):
+            point = chunk[point_ind]
+            save(point, msim)
+            manifest.mark_done(task_id(point), point, outputs(point))
+            manifest.release(task_id(point))
+            if verbose:
+                print(f'Finished task {task_id(point)}: {point}')
+
+        try:
+            runner.run_batch(make_sim, chunk, people, n_runs=n_runs, ncpus=ncpus, callback=callback, **kwargs)
+        finally:
+            for point in chunk:
+                manifest.release(task_id(point))
+
+    if verbose:
+        print(manifest)
+    return manifest
@@ -7,9 +7,14 @@ import covasim.utils as cvu
 import covasim.defaults as cvd
 import covasim.base as cvb
 import covasim.misc as cvm
-import networkx as nx
+import numba as nb
 import pandas as pd
 
+import covasim_australia.contacts as co
+import covasim_australia.ensemble as ens
+import covasim_australia.events as ev
+import covasim_australia.infection_log as il
+
 def get_ndays(start_day, end_day):
     """Calculates the number of days for simulation"""
     # get start and end date
@@ -496,6 +501,49 @@ class DynamicTrigger(cv.Intervention):
             self._ran = True
 
 
+@nb.njit
+def _test_probs(t, swab_delay, test_delay, symp_prob, symp_quar_prob, leaving_quar_prob, inds,
+                symptomatic, quarantined, diagnosed, severe, date_symptomatic, date_quarantined, date_end_quarantine, date_tested):
+    # Testing probability of each person for test_prob_with_quarantine, applying the rules in the same order as
+    # they are listed in apply(), so later rules take precedence. Only the people in `inds` are visited, everyone
+    # else can't be tested today and has a probability of 0
+    test_probs = np.zeros(len(symptomatic))
+    for i in inds:
+        prob = 0.0
+
+        # (1) Symptomatic people test swab_delay days after becoming symptomatic
+        if symptomatic[i] and date_symptomatic[i] == t - swab_delay:
+            prob = symp_prob
+
+        if t > 0:
+            # (2) People who become symptomatic while quarantining test immediately
+            if symptomatic[i] and quarantined[i] and date_symptomatic[i] == t:
+                prob = symp_quar_prob
+            # (3) People who are symptomatic and undiagnosed when they enter quarantine test the next day
+            if date_quarantined[i] == t - 1 and symptomatic[i] and not diagnosed[i]:
+                prob = symp_quar_prob
+
+        # (4) People with severe symptoms are guaranteed to be tested
+        if severe[i]:
+            prob = 1.0
+
+        # (5) People leaving quarantine test before leaving, unless they were tested during their quarantine.
+        # Note that this is not the same as date_tested <= date_quarantined because of NaNs
+        if leaving_quar_prob and quarantined[i] and date_end_quarantine[i] - test_delay == t and not date_tested[i] > date_quarantined[i]:
+            prob = max(prob, leaving_quar_prob)
+
+        # (6) People that have been diagnosed aren't tested
+        if diagnosed[i]:
+            prob = 0.0
+
+        # (7) People waiting for results don't get tested
+        if np.isfinite(date_tested[i]) and date_tested[i] + test_delay > t:
+            prob = 0.0
+
+        test_probs[i] = prob
+    return test_probs
+
+
 class test_prob_with_quarantine(cv.test_prob):
     """
     Testing based on probability with quarantine during tests
@@ -527,16 +575,6 @@ class test_prob_with_quarantine(cv.test_prob):
         # 9. People already on quarantine while tested will not have their quarantine shortened, but if they are tested at the end of their
         #    quarantine, the quarantine will be extended
 
-        # Construct the testing probabilities piece by piece -- complicated, since need to do it in the right order
-        test_probs = np.zeros(sim.n)  # Begin by assigning equal testing probability to everyone
-
-        # (1) People wait swab_delay days before they decide to start testing. If swab_delay is 0 then they will be eligible as soon as they are symptomatic
-        symp_inds = cvu.true(sim.people.symptomatic) # People who are symptomatic
-        symp_test_inds = symp_inds[sim.people.date_symptomatic[symp_inds] == (t-self.swab_delay)]  # People who became symptomatic previously and are eligible to test today
-        test_probs[symp_test_inds] = self.symp_prob
-
-        # People whose symptomatic scheduled day falls during quarantine will test at the symp_quar_prob rate
-        # People who are already symptomatic, missed their test, and then enter quarantine, will test at the symp_quar_prob rate
         # People get quarantined at 11:59pm so the people getting quarantined today haven't been quarantined yet.
         # The order is
         # Day 4 - Test, quarantine people waiting for results
@@ -553,38 +591,22 @@ class test_prob_with_quarantine(cv.test_prob):
         # on not having been diagnosed yet. Hence > is used here so that on day 3+2=5, they won't retest. (i.e. they are
         # waiting for their results if the day they recieve their results is > the current day). Note that they become
         # symptomatic prior to interventions e.g. they wake up with symptoms
-        if sim.t > 0:
-            # If quarantined, there's no swab delay
 
-            # (2) People who become symptomatic while quarantining test immediately
-            quarantine_test_inds = symp_inds[sim.people.quarantined[symp_inds] & (sim.people.date_symptomatic[symp_inds] == t)] # People that became symptomatic today while already on quarantine
-            test_probs[quarantine_test_inds] = self.symp_quar_prob  # People with symptoms in quarantine are eligible to test without waiting
-
-            # (3) People who are symptomatic and undiagnosed before entering quarantine, test as soon as they are quarantined
-            newly_quarantined_test_inds = cvu.true((sim.people.date_quarantined == (sim.t-1)) & sim.people.symptomatic & ~sim.people.diagnosed) # People that just entered quarantine, who are current symptomatic and undiagnosed
-            test_probs[newly_quarantined_test_inds] = self.symp_quar_prob  # People with symptoms that just entered quarantine are eligible to test
-
-        # (4) People with severe symptoms that would be hospitalised are guaranteed to be tested
-        test_probs[sim.people.severe] = 1.0  # People with severe symptoms are guaranteed to be tested unless already diagnosed or awaiting results
-
-        # (5) People leaving quarantine test before leaving
-        # This tests policies for testing people at least once during quarantine
-        # - If leaving_quar_prob=1 then everyone leaving quarantine must have been tested during quarantine
-        # - If someone was tested during their quarantine, they don't need to test again
+        # Only people who became symptomatic or entered quarantine on the days rules (1)-(3) look at, people with
+        # severe symptoms and (for rule 5) people in quarantine can be tested. The first are looked up in the event
+        # index of the people, rather than by scanning the whole population
+        people = sim.people
+        candidates = [ev.people_on(people, 'date_symptomatic', t-self.swab_delay), cvu.true(people.severe)]
+        if t > 0:
+            candidates += [ev.people_on(people, 'date_symptomatic', t), ev.people_on(people, 'date_quarantined', t-1)]
         if self.leaving_quar_prob:
-            to_test = cvu.true(sim.people.quarantined)  # Everyone currently on quarantine
-            to_test = to_test[(sim.people.date_end_quarantine[to_test]-self.test_delay) == sim.t] # Everyone leaving quarantine that needs to have been tested by today at the latest
-            to_test = to_test[~(sim.people.date_tested[to_test] > sim.people.date_quarantined[to_test])] # Note that this is not the same as <= because of NaNs - if someone was never tested, then both <= and > are False
-            test_probs[to_test] = np.maximum(test_probs[to_test], self.leaving_quar_prob) # If they are already supposed to test at a higher rate e.g. severe symptoms, keep it
-
-        # (6) People that have been diagnosed aren't tested
-        diag_inds = cvu.true(sim.people.diagnosed)
-        test_probs[diag_inds] = 0.0  # People who are diagnosed or awaiting test results don't test
+            candidates.append(cvu.true(people.quarantined))
+        inds = np.unique(np.concatenate(candidates).astype(np.int64))
 
-        # (7) People waiting for results don't get tested
-        tested_inds = cvu.true(np.isfinite(sim.people.date_tested))
-        pending_result_inds = tested_inds[(sim.people.date_tested[tested_inds] + self.test_delay) > sim.t]  # People who have been tested and will receive test results after the current timestep
-        test_probs[pending_result_inds] = 0.0  # People awaiting test results don't test
+        # Construct the testing probabilities for rules (1)-(7) in a single pass over the candidates
+        test_probs = _test_probs(t, float(self.swab_delay), float(self.test_delay), float(self.symp_prob), float(self.symp_quar_prob), float(self.leaving_quar_prob or 0), inds,
+                                 people.symptomatic, people.quarantined, people.diagnosed, people.severe,
+                                 people.date_symptomatic, people.date_quarantined, people.date_end_quarantine, people.date_tested)
 
         # Test people based on their per-person test probability
         test_inds = cvu.true(cvu.binomial_arr(test_probs))
@@ -599,7 +621,34 @@ class test_prob_with_quarantine(cv.test_prob):
         return test_probs
 
 
-class limited_contact_tracing(cv.contact_tracing):
+class _indexed_contact_tracing(cv.contact_tracing):
+    """
+    Contact tracing that finds contacts using a co.ContactIndex for each layer
+
+    The indexes of static layers are built the first time they are traced, and the
+    indexes of dynamic layers are rebuilt when the layer has changed since.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._contact_indexes = {}  #: {lkey: co.ContactIndex}, created when first needed
+
+    def __getstate__(self):
+        # Don't copy the indexes when the sim is saved or sent to other processes, they get rebuilt when needed
+        state = self.__dict__.copy()
+        state['_contact_indexes'] = {}
+        return state
+
+    def contact_index(self, sim, lkey):
+        """
+        Return an index of the current contacts in a layer
+        """
+        index = co.get_contact_index(sim.people.contacts[lkey], len(sim.people), self._contact_indexes.get(lkey))
+        self._contact_indexes[lkey] = index
+        return index
+
+
+class limited_contact_tracing(_indexed_contact_tracing):
     """
     Contact tracing with capacity limit
 
@@ -623,7 +672,7 @@ class limited_contact_tracing(cv.contact_tracing):
             return
 
         # Everyone that was diagnosed today could potentially be traced
-        trace_from_inds = cvu.true(sim.people.date_diagnosed == t) # Diagnosed this time step, time to trace
+        trace_from_inds = ev.people_on(sim.people, 'date_diagnosed', t) # Diagnosed this time step, time to trace
         if not len(trace_from_inds):
             return
         trace_from_inds = trace_from_inds.astype(np.int64)
@@ -634,7 +683,7 @@ class limited_contact_tracing(cv.contact_tracing):
 
         ind_set = set(trace_from_inds)
 
-        actual_infections = [x for x in sim.people.infection_log if (x['source'] in ind_set or x['target'] in ind_set)] # People who were infected in a traceable layer involving the person being traced
+        infection_log = il.get_infection_log(sim.people)
 
         # Extract the indices of the people who'll be contacted
         for lkey, this_trace_prob in self.trace_probs.items():
@@ -643,15 +692,14 @@ class limited_contact_tracing(cv.contact_tracing):
                 continue
 
             # Find current layer contacts
-            notification_set = cvu.find_contacts(sim.people.contacts[lkey]['p1'], sim.people.contacts[lkey]['p2'], trace_from_inds)
+            notification_set = self.contact_index(sim, lkey).find_contacts(trace_from_inds, as_array=False)
 
             # Add interactions at previous timesteps that resulted in transmission. It's bi-directional because if the source
             # interacts with the target, the target would be able to name the source as a known contact with the same probability
             # as in the reverse direction.
-            for infection in actual_infections:
-                if infection['layer'] == lkey:
-                    notification_set.add(infection['source'])
-                    notification_set.add(infection['target'])
+            infections = infection_log.involving(trace_from_inds, lkey)  # Infections in this layer involving the people being traced
+            notification_set.update(infection_log.source[infections].tolist())
+            notification_set.update(infection_log.target[infections].tolist())
 
             # Check contacts
             edge_inds = np.fromiter(notification_set.difference(ind_set), dtype=cvd.default_int)
@@ -664,13 +712,83 @@ class limited_contact_tracing(cv.contact_tracing):
                 sim.people.quarantine(contact_inds, start_date=sim.t + this_trace_time) # Schedule quarantine for the notified people to start on the date they will be notified
 
 
-class limited_contact_tracing_2(cv.contact_tracing):
+class NotificationLog():
+    """
+    Record of contact tracing notifications, stored in arrays that grow as needed
+
+    Each notification has
+
+        - notifier: The person who was traced
+        - notified: The contact who was notified that `notifier` was a suspected case
+        - date: The day the contact was notified
+        - layer: Code of the layer they were traced through, see `layer_keys`
+
+    Notifications are appended without checking whether the same pair was notified before, and
+    `first()` returns only the first notification of each pair.
+    """
+
+    _columns = ['notifier', 'notified', 'date', 'layer']
+
+    def __init__(self, capacity=1000):
+        self.n = 0
+        self.layer_keys = []  #: The layer of each layer code
+        self._notifier = np.zeros(capacity, dtype=np.int32)
+        self._notified = np.zeros(capacity, dtype=np.int32)
+        self._date = np.zeros(capacity, dtype=np.int32)
+        self._layer = np.zeros(capacity, dtype=np.int16)
+
+    def __getstate__(self):
+        # Only store the filled part of the arrays
+        state = self.__dict__.copy()
+        for col in self._columns:
+            state[f'_{col}'] = state[f'_{col}'][:self.n].copy()
+        return state
+
+    def __len__(self):
+        return self.n
+
+    def add(self, notifier, notified, date, lkey):
+        """
+        Record that each of `notified` was notified about the corresponding person in `notifier` on `date`
+        """
+        n_new = len(notifier)
+        if self.n + n_new > len(self._notifier):
+            capacity = max(self.n + n_new, int(1.5*len(self._notifier)))
+            for col in self._columns:
+                arr = getattr(self, f'_{col}')
+                new_arr = np.zeros(capacity, dtype=arr.dtype)
+                new_arr[:self.n] = arr[:self.n]
+                setattr(self, f'_{col}', new_arr)
+        if lkey not in self.layer_keys:
+            self.layer_keys.append(lkey)
+        new = slice(self.n, self.n + n_new)
+        self._notifier[new] = notifier
+        self._notified[new] = notified
+        self._date[new] = date
+        self._layer[new] = self.layer_keys.index(lkey)
+        self.n += n_new
+
+    def first(self):
+        """
+        Return the first notification of each (notifier, notified) pair
+
+        Returns: Arrays of the notifier, the notified person, the date and the layer code, in the order the
+                 notifications were made
+        """
+        notifier = self._notifier[:self.n]
+        notified = self._notified[:self.n]
+        key = notifier.astype(np.int64) * (int(notified.max(initial=0)) + 1) + notified
+        first = np.sort(np.unique(key, return_index=True)[1])
+        return notifier[first], notified[first], self._date[:self.n][first], self._layer[:self.n][first]
+
+
+class limited_contact_tracing_2(_indexed_contact_tracing):
     """
     Contact tracing with capacity limit
 
     This implementation actually tracks who the contact was, for the purpose of tracking clusters.
-    Although the tracing should be basically the same as `limited_contact_tracing`, this function
-    is much slower as a result.
+    The tracing is basically the same as `limited_contact_tracing`, but every notification is
+    also recorded in `notifications`.
 
     """
 
@@ -683,7 +801,7 @@ class limited_contact_tracing_2(cv.contact_tracing):
         super().__init__(**kwargs)  # Initialize the Intervention object
         self.capacity = capacity  #: Dict with capacity by layer e.g. {'H': 100, 'W': 50}
         self.dynamic_layers = dynamic_layers or []  #: List of layers to trace via infection log (if their contacts are regenerated each timestep)
-        self.notifications = nx.DiGraph()  # Notification edge a->b means that `b` was notified that `a` was a suspected case
+        self.notifications = NotificationLog()  # Notification a->b means that `b` was notified that `a` was a suspected case
 
     def apply(self, sim):
         t = sim.t
@@ -694,9 +812,9 @@ class limited_contact_tracing_2(cv.contact_tracing):
 
         # Figure out whom to test and trace
         if not self.presumptive:
-            trace_from_inds = cvu.true(sim.people.date_diagnosed == t)  # Diagnosed this time step, time to trace
+            trace_from_inds = ev.people_on(sim.people, 'date_diagnosed', t)  # Diagnosed this time step, time to trace
         else:
-            just_tested = cvu.true(sim.people.date_tested == t)  # Tested this time step, time to trace
+            just_tested = ev.people_on(sim.people, 'date_tested', t)  # Tested this time step, time to trace
             trace_from_inds = cvu.itruei(sim.people.exposed, just_tested)  # This is necessary to avoid infinite chains of asymptomatic testing
 
         capacity = np.floor(self.capacity / sim.rescale_vec[t])  # Scale capacity based on dynamic rescaling factor
@@ -709,42 +827,42 @@ class limited_contact_tracing_2(cv.contact_tracing):
         traceable_layers = {k: v for k, v in self.trace_probs.items() if v != 0.}  # Only trace if there's a non-zero tracing probability
         dynamic_traceable = {k: v for k, v in traceable_layers.items() if k in self.dynamic_layers}
 
-        for ind in trace_from_inds:
-
-            # Interactions at previous timesteps recorded involving this person
-            if dynamic_traceable:
-                dynamic_infections = [x for x in sim.people.infection_log if (x['source'] == ind or x['target'] == ind)]
-            else:
-                dynamic_infections = []
-
-            # Extract the indices of the people who'll be contacted
-            for lkey, this_trace_prob in traceable_layers.items():
+        infection_log = il.get_infection_log(sim.people)
 
-                layer = sim.people.contacts[lkey]
+        # Interactions at previous timesteps recorded involving the people being traced
+        if dynamic_traceable:
+            dynamic_infections = infection_log.involving(trace_from_inds)
+            dynamic_infections = dynamic_infections[infection_log.source[dynamic_infections] >= 0]
+        else:
+            dynamic_infections = np.zeros(0, dtype=np.int64)
+        is_traced = np.zeros(len(sim.people), dtype=bool)
+        is_traced[trace_from_inds] = True
 
-                # All contacts of this person in the current layer at the current timestep
-                a = layer['p2'][layer['p1'] == ind]
-                b = layer['p1'][layer['p2'] == ind]
-                contacts = set(a)
-                contacts.update(b)
+        # Extract the indices of the people who'll be contacted
+        for lkey, this_trace_prob in traceable_layers.items():
 
-                # Then add any dynamic contacts
-                for infection in dynamic_infections:
-                    if infection['layer'] == lkey:
-                        contacts.add(infection['source'])
-                        contacts.add(infection['target'])
+            # All contacts of these people in the current layer at the current timestep, as (person, contact) pairs
+            pairs = [self.contact_index(sim, lkey).find_contact_pairs(trace_from_inds)]
 
-                contacts.discard(ind)  # Can't be a contact of oneself
+            # Then add any dynamic contacts
+            infections = dynamic_infections[infection_log.layer[dynamic_infections] == infection_log.layer_code(lkey)]
+            sources, targets = infection_log.source[infections], infection_log.target[infections]
+            pairs.append((sources[is_traced[sources]], targets[is_traced[sources]]))
+            pairs.append((targets[is_traced[targets]], sources[is_traced[targets]]))
 
-                identified_contacts = cvu.binomial_filter(this_trace_prob, np.array(list(contacts)))  # Filter the indices according to the probability of being able to trace this layer
-                for contact in identified_contacts:
-                    if not self.notifications.has_edge(ind, contact):
-                        self.notifications.add_edge(ind, contact, t=t + self.trace_time[lkey], layer=lkey)
+            # Each person's contacts are only counted once, and they can't be a contact of themselves
+            notifier = np.concatenate([x[0] for x in pairs]).astype(np.int64)
+            notified = np.concatenate([x[1] for x in pairs]).astype(np.int64)
+            key = np.unique(notifier[notifier != notified] * len(sim.people) + notified[notifier != notified])
+            notifier, notified = key // len(sim.people), key % len(sim.people)
 
-                if len(identified_contacts):
-                    sim.people.known_contact[identified_contacts] = True
-                    sim.people.date_known_contact[identified_contacts] = np.fmin(sim.people.date_known_contact[identified_contacts], t + self.trace_time[lkey])
-                    sim.people.quarantine(identified_contacts, start_date=t + self.trace_time[lkey])  # Schedule quarantine for the notified people to start on the date they will be notified
+            identified = cvu.binomial_arr(np.full(len(key), this_trace_prob))  # Filter the contacts according to the probability of being able to trace this layer
+            if identified.any():
+                self.notifications.add(notifier[identified], notified[identified], t + self.trace_time[lkey], lkey)
+                identified_contacts = np.unique(notified[identified]).astype(cvd.default_int)
+                sim.people.known_contact[identified_contacts] = True
+                sim.people.date_known_contact[identified_contacts] = np.fmin(sim.people.date_known_contact[identified_contacts], t + self.trace_time[lkey])
+                sim.people.quarantine(identified_contacts, start_date=t + self.trace_time[lkey])  # Schedule quarantine for the notified people to start on the date they will be notified
 
 
 def story(sim, uid):
@@ -790,7 +908,9 @@ def story(sim, uid):
         if not np.isnan(date):
             events.append((date, message))
 
-    for infection in sim.people.infection_log:
+    infection_log = il.get_infection_log(sim.people)
+    for i in np.union1d(infection_log.by_target(uid), infection_log.by_source(uid)):
+        infection = infection_log[i]
         if infection['target'] == uid:
             if infection["layer"]:
                 events.append((infection['date'], f'was infected with COVID by {infection["source"]} at {infection["layer"]}'))
@@ -798,7 +918,7 @@ def story(sim, uid):
                 events.append((infection['date'], f'was infected with COVID as a seed infection'))
 
         if infection['source'] == uid:
-            x = len([a for a in sim.people.infection_log if a['source'] == infection['target']])
+            x = len(infection_log.by_source(infection['target']))
             events.append((infection['date'],f'gave COVID to {infection["target"]} at {infection["layer"]} ({x} secondary infections)'))
 
     for day, event in sorted(events, key=lambda x: x[0]):
@@ -820,10 +940,18 @@ def save_csv(sim, fname):
 
 
 def get_individual_traces(key, sims, convolve=False, num_days=3):
-    ys = []
-    for this_sim in sims:
-        ys.append(this_sim.results[key].values)
-    yarr = np.array(ys)
+    """
+    Get the traces of a result for every run, as a (timepoints, runs) array
+
+    sims can be a list of sims or an EnsembleStore
+    """
+    if isinstance(sims, ens.EnsembleStore):
+        yarr = sims[key]
+    else:
+        ys = []
+        for this_sim in sims:
+            ys.append(this_sim.results[key].values)
+        yarr = np.array(ys)
 
     if convolve:
         for idx in range(yarr.shape[0]):
@@ -928,69 +1056,158 @@ def detect_outbreak_case(data, day_idx):
     return outbreak_case
 
 
-def calculate_first_case_stats(data_nc, data_ni):
+def detect_outbreak_batch(data, num_cases=5.0):
     """
-    data_nc and data_ni have shape tpts x nruns
-    data_nc --> new_cases
-    data_nc --> 
+    Vectorised detect_outbreak() over all the columns of data
+
+    data has shape tpts x nruns, optionally with more trailing dimensions
+    (e.g. tpts x nruns x nensembles). Returns the outbreak index of each
+    column as a float array of shape data.shape[1:], nan where there is no outbreak.
     """
-    nruns = data_nc.shape[1]
-    local_first_case_idx = []
-    local_first_case_inf = []
-    for idx in range(data_nc.shape[1]):
-        # First case day
-        fc_day_idx = detect_first_case(data_nc[:, idx], use_nan=True)
-        local_first_case_idx.append(fc_day_idx)
-        if np.isnan(fc_day_idx):
-           local_first_case_inf.append(np.nan)
-        else:
-           local_first_case_inf.append(data_ni[fc_day_idx, idx])
+    above = (data >= num_cases).astype(np.int8)
+    window = above + np.roll(above, 1, axis=0) + np.roll(above, -1, axis=0)
+    idx = np.argmax(window, axis=0).astype(float)
+    idx[idx == 0] = np.nan
+    return idx
 
-    local_first_case_day_dist = np.array(local_first_case_idx)
-    local_first_case_inf_dist = np.array(local_first_case_inf)
 
+def detect_first_case_batch(data, num_cases=1.0):
+    """
+    Vectorised detect_first_case() over all the columns of data, see detect_outbreak_batch()
+    """
+    idx = np.argmax(data >= num_cases, axis=0).astype(float)
+    idx[idx == 0] = np.nan
+    return idx
 
-    # Get stats in terms od day to first case
-    fc_day_av = np.nanmean(local_first_case_day_dist)
-    fc_day_md = np.nanmedian(local_first_case_day_dist)
-    fc_day_sd = np.nanstd(local_first_case_day_dist)
-    # get stats, number of infections 
-    fc_inf_av = np.nanmean(local_first_case_inf_dist)
-    fc_inf_md = np.nanmedian(local_first_case_inf_dist)
-    fc_inf_sd = np.nanstd(local_first_case_inf_dist)
 
-    # Get stats of first day cases
-    return fc_day_av, fc_day_md, fc_day_sd, fc_inf_av, fc_inf_md, fc_inf_sd 
+def _from_start(data, start):
+    """
+    Return the time index of data and a mask of the timepoints on or after start in each column
+    """
+    t = np.arange(data.shape[0]).reshape((-1,) + (1,)*(data.ndim-1))
+    return t, t >= start
 
 
-def calculate_outbreak_stats(data):
+def detect_first_case_less_equal_than_batch(data, start, num_cases=4.0):
     """
-    data has shape tpts x nruns
+    Vectorised detect_first_case_less_equal_than(data[start:, i]) over all the columns of data
+
+    start has shape data.shape[1:] and gives the first timepoint to use in each
+    column. Like detect_first_case_less_equal_than(), the three day window wraps
+    around from the end of each column to its start. The result is relative to
+    start, and nan where no day is found.
+    """
+    start = np.asarray(start, dtype=int)
+    tpts = data.shape[0]
+    t, after_start = _from_start(data, start)
+    below = (data <= num_cases).astype(np.int8)
+    prev_t = np.where(t > start, t-1, tpts-1)
+    next_t = np.where(t < tpts-1, t+1, start)
+    window = below + np.take_along_axis(below, prev_t, axis=0) + np.take_along_axis(below, next_t, axis=0)
+    window = np.where(after_start, window, -1)
+    idx = (np.argmax(window, axis=0) - start).astype(float)
+    idx[idx == 0] = np.nan
+    return idx
+
+
+def detect_zeros_batch(data, start, num_days=14):
+    """
+    Vectorised detect_zeros(data[start:, i]) over all the columns of data, see detect_first_case_less_equal_than_batch()
+    """
+    start = np.asarray(start, dtype=int)
+    _, after_start = _from_start(data, start)
+    return ((data < 1.0) & after_start).sum(axis=0) >= num_days
+
 
+def calculate_first_case_stats_batch(data_nc, data_ni):
+    """
+    Vectorised calculate_first_case_stats()
+
+    data_nc and data_ni have shape tpts x nruns x ..., the statistics are
+    calculated over the runs and have shape data_nc.shape[2:]
+    """
+    fc_day = detect_first_case_batch(data_nc)
+    has_case = ~np.isnan(fc_day)
+    fc_inf = np.take_along_axis(data_ni, np.where(has_case, fc_day, 0).astype(int)[np.newaxis], axis=0)[0]
+    fc_inf = np.where(has_case, fc_inf, np.nan)
+
+    return (np.nanmean(fc_day, axis=0), np.nanmedian(fc_day, axis=0), np.nanstd(fc_day, axis=0),
+            np.nanmean(fc_inf, axis=0), np.nanmedian(fc_inf, axis=0), np.nanstd(fc_inf, axis=0))
+
+
+def calculate_outbreak_stats_batch(data):
+    """
+    Vectorised calculate_outbreak_stats()
+
+    data has shape tpts x nruns x ..., the statistics are calculated over the
+    runs and have shape data.shape[2:]
     """
     nruns = data.shape[1]
-    local_outbreak_idx = []
-    case_dict = {'outbreak': 0, 'under_control': 0, 'contained': 0}
-    for idx in range(data.shape[1]):
-        day_idx = detect_outbreak(data[:, idx], use_nan=True)
-        case_label = detect_outbreak_case(data[: idx], day_idx)
-        # Update tally for each case
-        case_dict[case_label] += 1.0/nruns
-        local_outbreak_idx.append(day_idx)
+    day_idx = detect_outbreak_batch(data)
+    outbreak = ~np.isnan(day_idx)
+    contained = ~outbreak & (data.sum(axis=0) == 0)
+    under_control = ~outbreak & ~contained
+
+    ou_prob = outbreak.sum(axis=0) / nruns * 100.0
+    uc_prob = under_control.sum(axis=0) / nruns * 100.0
+    co_prob = contained.sum(axis=0) / nruns * 100.0
+    return np.nanmean(day_idx, axis=0), np.nanmedian(day_idx, axis=0), np.nanstd(day_idx, axis=0), ou_prob, uc_prob, co_prob
+
+
+def calculate_sct_supression_batch(data):
+    """
+    Vectorised calculate_sct_supression()
+
+    data has shape tpts x nruns x ..., returns the percentage of outbreaks that
+    die off, the same as a percentage of 1000 runs, the day each outbreak dies
+    off (shape data.shape[1:], nan if there is no outbreak or it doesn't die
+    off), and the statistics of that day over the runs.
+    """
+    day_idx = detect_outbreak_batch(data)
+    outbreak = ~np.isnan(day_idx)
+    start = np.where(outbreak, day_idx, 0).astype(int)
+    day_off = detect_first_case_less_equal_than_batch(data, start, num_cases=0.0) + start
+    day_off[~outbreak] = np.nan
+
+    n_outbreak = outbreak.sum(axis=0)
+    count_times_dies_off = (~np.isnan(day_off)).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dies_off_prob = np.where(n_outbreak > 0, count_times_dies_off / n_outbreak * 100.0, np.nan)
+    dies_off_prob_1000 = (count_times_dies_off / 1000.0) * 100.0
+    return (dies_off_prob, dies_off_prob_1000, day_off,
+            np.nanmean(day_off, axis=0), np.nanmedian(day_off, axis=0), np.nanstd(day_off, axis=0))
 
-    local_outbreak_dist = np.array(local_outbreak_idx)
 
-    # Get stats of proper "outbreaks"
-    ou_day_av = np.nanmean(local_outbreak_dist)
-    ou_day_md = np.nanmedian(local_outbreak_dist)
-    ou_day_sd = np.nanstd(local_outbreak_dist)
-    ou_prob = case_dict["outbreak"] * 100.0
-    uc_prob = case_dict["under_control"] * 100.0
-    co_prob = case_dict["contained"] *100.0
+def calculate_sct_dies_off_batch(data):
+    """
+    Vectorised calculate_sct_dies_off()
+
+    data has shape tpts x nruns x ..., returns the number of runs that cross
+    the SCT threshold and the number of those that then die off, both with
+    shape data.shape[2:]
+    """
+    day_idx = detect_outbreak_batch(data)
+    outbreak = ~np.isnan(day_idx)
+    dies_off = detect_zeros_batch(data, np.where(outbreak, day_idx, 0)) & outbreak
+    return outbreak.sum(axis=0).astype(float), dies_off.sum(axis=0)
+
 
-    # Get stats of first day cases
+def calculate_first_case_stats(data_nc, data_ni):
+    """
+    data_nc and data_ni have shape tpts x nruns
+    data_nc --> new_cases
+    data_nc --> 
+    """
+    # Get stats in terms of day to first case and number of infections on that day
+    return calculate_first_case_stats_batch(data_nc, data_ni)
+
+
+def calculate_outbreak_stats(data):
+    """
+    data has shape tpts x nruns
 
-    return ou_day_av, ou_day_md, ou_day_sd, ou_prob, uc_prob, co_prob 
+    """
+    return calculate_outbreak_stats_batch(data)
 
 
 def calculate_sct_supression(data):
@@ -1000,47 +1217,12 @@ def calculate_sct_supression(data):
     (die off means that num_infections < 5) within the span of the simulation.
     data has shape tpts x nruns
     """
-    nruns = data.shape[1]
-    tpts = data.shape[0]
-    day_off_index = []
-    case_dict = {'outbreak': 0, 'under_control': 0, 'contained': 0}
-    count_times_dies_off = 0
-    for idx in range(data.shape[1]):
-        # Apply SCT threshold
-        day_idx    = detect_outbreak(data[:, idx], use_nan=True)
-        # Detect if it qualifies as crossing SCT 
-        case_label = detect_outbreak_case(data[: idx], day_idx)
-        # It it does cross SCT
-        if case_label == "outbreak":
-            #Update tally for each case
-            case_dict[case_label] += 1.0
-            # Start checking from day after the SCT threshold is crossed
-            day_off_idx  = detect_first_case_less_equal_than(data[day_idx:, idx], num_cases=0.0, use_nan=True)
-            # If it dies off save it
-            if not np.isnan(day_off_idx):
-                day_off_index.append(day_off_idx+day_idx)
-                # Count that SCT has died off
-                count_times_dies_off +=1
-            else:
-                day_off_index.append(day_off_idx)
-
-    # Calculate how many times SCT dies off
-    if case_dict["outbreak"] > 0:
-        dies_off_prob = (count_times_dies_off / case_dict["outbreak"]) * 100.0
-        # On average when does it happen?  
-        day_off_av = np.nanmean(np.array(day_off_index))
-        day_off_md = np.nanmedian(np.array(day_off_index))
-        day_off_sd = np.nanstd(np.array(day_off_index))
-    else:
+    dies_off_prob, dies_off_prob_1000, day_off, day_off_av, day_off_md, day_off_sd = calculate_sct_supression_batch(data)
+    outbreak = ~np.isnan(detect_outbreak_batch(data))
+    if not outbreak.any():
         print("no outbreak?")
-        dies_off_prob = np.nan
-        day_off_av = np.nan
-        day_off_md = np.nan
-        day_off_sd = np.nan
-    dies_off_prob_1000 = (count_times_dies_off / 1000.0) * 100.0
-    return dies_off_prob, dies_off_prob_1000, day_off_index, day_off_av, day_off_md, day_off_sd 
-
-
+    day_off_index = list(day_off[outbreak])
+    return dies_off_prob, dies_off_prob_1000, day_off_index, day_off_av, day_off_md, day_off_sd
 
 
 def calculate_sct_dies_off(data):
@@ -1050,43 +1232,7 @@ def calculate_sct_dies_off(data):
     (die off means that num_infections == 0) for at least 
     a certain number of days. 
     """
-
-    nruns = data.shape[1]
-    tpts = data.shape[0]
-    day_off_index = []
-    case_dict = {'outbreak': 0, 'under_control': 0, 'contained': 0}
-    count_times_dies_off = 0
-    for idx in range(data.shape[1]):
-        # Apply SCT threshold
-        day_idx    = detect_outbreak(data[:, idx], use_nan=True)
-        # Detect if it qualifies as crossing SCT 
-        case_label = detect_outbreak_case(data[: idx], day_idx)
-        # It it does cross SCT
-        if case_label == "outbreak":
-            #Update tally for each case
-            case_dict[case_label] += 1.0
-            # Start checking from day after the SCT threshold is crossed
-            dies_off  = detect_zeros(data[day_idx:, idx])
-            # If it dies off save it
-            if dies_off > 0: 
-                # Count that SCT has died off
-                count_times_dies_off +=1
-            else:
-                pass
-
-    # Calculate how many times SCT dies off
-    if case_dict["outbreak"] > 0:
-        dies_off_prob = (count_times_dies_off / case_dict["outbreak"]) * 100.0
-        # On average when does it happen?  
-        day_off_av = np.nanmean(np.array(day_off_index))
-        day_off_md = np.nanmedian(np.array(day_off_index))
-        day_off_sd = np.nanstd(np.array(day_off_index))
-    else:
+    n_outbreak, count_times_dies_off = calculate_sct_dies_off_batch(data)
+    if n_outbreak == 0:
         print("no outbreak?")
-        dies_off_prob = np.nan
-        day_off_av = np.nan
-        day_off_md = np.nan
-        day_off_sd = np.nan
-
-    dies_off_prob_1000 = (count_times_dies_off / 1000.0) * 100.0
-    return case_dict["outbreak"], count_times_dies_off
\ No newline at end of file
+    return n_outbreak, count_times_dies_off
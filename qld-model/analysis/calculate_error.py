@@ -9,18 +9,17 @@ import numpy as np
 import sciris as sc
 import pandas as pd
 import covasim.misc as cvm
+import covasim_australia.ensemble as ens
+import covasim_australia.utils as utils
 
 
 
 def get_simulated_data(sims, key, av_days=3, low_q=25, high_q=75):
     """
-    sims: a MultiSim object
+    sims: a list of sims or an EnsembleStore
     key: string with the key of the data we will use
     """
-    ys = []
-    for this_sim in sims:
-        ys.append(this_sim.results[key].values)
-    yarr = np.array(ys)
+    yarr = utils.get_individual_traces(key, sims).T
 
     #Moving average over X-days
     #num_days = av_days
@@ -61,8 +60,7 @@ if __name__ == '__main__':
         for infect_idx, this_infection in enumerate(seed_infections):
             # Generate file name
             this_file = f"qld_update_locally_acquired_recalibration_2020-01-15_2020-05-31_{betas[beta_idx]:.{4}f}_{seed_infections[infect_idx]:02d}.obj"
-            msim = sc.loadobj(f'{resultsfolder}/{this_file}')
-            sims = msim.sims
+            sims = ens.load_ensemble(f'{resultsfolder}/{this_file}')
             data_arr[..., beta_idx, infect_idx] = get_simulated_data(sims, 'new_diagnoses')
 
 
@@ -75,8 +73,9 @@ if __name__ == '__main__':
     data = pd.read_csv("/".join((inputs_folder, input_data)), parse_dates=['date'])
 
     # Get 
-    start_sim_idx = sims[0].day('2020-03-01') # First data point of sim data is 15-01-2020
-    end_sim_idx   = sims[0].day('2020-04-30') # Last data point of simulated data is 15-05-2020 
+    day = sims.day if isinstance(sims, ens.EnsembleStore) else sims[0].day
+    start_sim_idx = day('2020-03-01') # First data point of sim data is 15-01-2020
+    end_sim_idx   = day('2020-04-30') # Last data point of simulated data is 15-05-2020 
 
     start_data_idx = cvm.day('2020-03-01', start_day='2020-01-22')   # First data point of sim data is 22-01-2020
     end_data_idx   = cvm.day('2020-04-30', start_day='2020-01-22')   # Last data point of empirical data is today
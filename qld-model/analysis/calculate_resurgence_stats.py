@@ -24,6 +24,7 @@ import pandas as pd
 import numpy as np
 import argparse
 import sciris as sc
+import covasim_australia.ensemble as ens
 import covasim_australia.utils as utils
 
 from pathlib import Path
@@ -53,14 +54,15 @@ with open(f"{args.filelist_path}/{args.filelist_obj_name}", 'r') as f:
         for f_idx, fname in enumerate(filelist):
             fname_obj = Path(fname)
             fname_csv = fname_obj.with_suffix('.csv')
-            msim = sc.loadobj(f"{args.filelist_path}/{fname}")
+            # Either a .ens results store or a whole MultiSim saved as .obj
+            sims = ens.load_ensemble(f"{args.filelist_path}/{fname}")
 
             # Save basic results to csv
             df_ou = pd.read_csv(f"{args.filelist_path}/{fname_csv}")
 
             # Get ensemble and convolve
-            median_trace, data = utils.get_ensemble_trace('new_diagnoses', msim.sims, **{'convolve': True, 'num_days': 3})
-            median_trace_inf, data_inf = utils.get_ensemble_trace('new_infections', msim.sims, **{'convolve': False, 'num_days': 1})
+            median_trace, data = utils.get_ensemble_trace('new_diagnoses', sims, **{'convolve': True, 'num_days': 3})
+            median_trace_inf, data_inf = utils.get_ensemble_trace('new_infections', sims, **{'convolve': False, 'num_days': 1})
 
             # Get ensemble outbreak
             idx_date = utils.detect_outbreak(median_trace_inf[1:])
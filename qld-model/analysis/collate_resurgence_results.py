@@ -5,17 +5,20 @@ Load csv files and collate them into one file
 
 python collate_resurgence_results.py 
 --filelist_path '/home/paula/mnt_avalon/mnt/lustre/working/lab_jamesr/paulaSL/covid-results/pbs.14809560/sim-data' \
---filelist_name 'filelist.txt' 
 --result_name 'outbreak_14809560.txt'
 
-for n in *.csv; do printf '%s\n' "$n"; done > filelist.txt
+All csv files under filelist_path are collated. Files that were already 
+collated by a previous call are only read again if they have changed since, 
+so this can be rerun cheaply as more jobs of a sweep finish. The collated table, 
+with a source_file column, is kept next to the results file in parquet format 
+(or as a pickle with --summary_format pkl).
 
 # author Paula Sanz-Leon, QIMRB 2021
 
 """
 
-import pandas as pd
 import argparse
+import covasim_australia.collate as collate
 
 
 
@@ -23,28 +26,37 @@ parser = argparse.ArgumentParser()
 
 
 
-parser.add_argument('--filelist_name', 
-                        type=str, 
-                        help='''The name of file with csv file names where results are stored''')
-
 parser.add_argument('--filelist_path', 
                         type=str, 
-                        help='''The absolute path to a file with csv file names where results are stored''')
+                        help='''The absolute path to the folder where results are stored. Subfolders are also searched.''')
 
 parser.add_argument('--result_name', 
                         type=str, 
                         help='''The relative and/or absolute path to a results csv/txt file''')
-args = parser.parse_args()
 
+parser.add_argument('--pattern', 
+                        default='*.csv', 
+                        type=str, 
+                        help='''Glob pattern of the files to collate''')
 
-def load_file(fname):
-    frame = pd.read_csv(fname)
-    return frame
+parser.add_argument('--ncpus', 
+                        default=None, 
+                        type=int, 
+                        help='''Number of processes used to read files. Defaults to the number of cpus.''')
+
+parser.add_argument('--summary_format', 
+                        default='parquet', 
+                        choices=['parquet', 'pkl'], 
+                        type=str, 
+                        help='''Format of the collated table kept next to the results file to collate incrementally.''')
+args = parser.parse_args()
 
 
-with open(f"{args.filelist_path}/{args.filelist_name}", 'r') as f:
-        content = f.readlines()
-        filelist = [l.strip() for l in content] 
-        frames = [load_file(f"{args.filelist_path}/{fname}") for fname in filelist]
-        result = pd.concat(frames)
-        result.to_csv(f"{args.filelist_path}/{args.result_name}")
\ No newline at end of file
+result_file = f"{args.filelist_path}/{args.result_name}"
+result = collate.collate_results(args.filelist_path, 
+                                 f"{result_file}.{args.summary_format}", 
+                                 pattern=args.pattern, 
+                                 ncpus=args.ncpus, 
+                                 exclude=[result_file])
+# Same columns and index as concatenating the files
+result.drop(columns='source_file').to_csv(result_file)
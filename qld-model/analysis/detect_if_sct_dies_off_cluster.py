@@ -8,6 +8,7 @@ Detect cases that cross the SCT threshold but then die off
 import sciris as sc
 import numpy as np
 import covasim as cv
+from covasim_australia import ensemble as ens
 from covasim_australia import utils
 
 # Filepaths
@@ -43,8 +44,7 @@ case_labels = ['A22', 'B117', 'B167']
 for idx, results_folder in enumerate(folder_list_cluster):
     num_cases = len(list_of_files)
     for file_idx, this_file in enumerate(list_of_files):
-        msim = sc.loadobj(f'{results_folder}/{this_file}')
-        sims = msim.sims
+        sims = ens.load_ensemble(f'{results_folder}/{this_file}')
         data = utils.get_individual_traces('new_infections', sims, convolve=False, num_days=1)
         count_times_above_sct, count_times_dies_off  = utils.calculate_sct_dies_off(data)    
         print(case_labels[idx])
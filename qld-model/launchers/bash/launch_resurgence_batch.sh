@@ -0,0 +1,8 @@
+#/usr/bin/bash
+# Same grid as launch_resurgence_distributed.sh, run in a single process with run_qld_batch.py
+cat > grid_resurgence_distributed.json <<GRID
+{"par1": [0.1428, 0.167, 0.2, 0.25, 0.33, 0.5, 1.0, 10.0, 20.0, 30.0, 40.0, 50.0],
+ "iq_factor": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0]}
+GRID
+python run_qld_batch.py --script run_qld_model_resurgence --grid grid_resurgence_distributed.json \
+                        --ncpus 4 --nruns 3 --label 'distributed'
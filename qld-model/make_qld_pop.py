@@ -12,15 +12,14 @@ import sciris as sc
 import covasim_australia.contacts as co
 import covasim_australia.data as data
 import covasim_australia.parameters as parameters
+import covasim_australia.population as population
 import covasim_australia.utils as utils
 import functools
 import numpy as np
 
-def make_qld_people(seed=None, pop_size=200000, pop_infected=50, 
-                savepeople=True, popfile='qldppl.pop', 
-                savepopdict=False, popdictfile='qdlpopdict.pop'):
+def make_qld_params(seed=None, pop_size=200000):
     """
-    Generate  popdict() and People() for Queensland population
+    Set up the Parameters() object the Queensland population is made from
     """
     location = 'QLD'
     db_name  = 'input_data_Australia'
@@ -66,14 +65,43 @@ def make_qld_people(seed=None, pop_size=200000, pop_infected=50,
                                      loc_data=loc_data,
                                      sim_pars=user_pars)
 
+    if seed is None:
+        seed = 1 # Same default as utils.set_rand_seed()
+    params.pars['rand_seed'] = seed
+    return params
+
 
+def qld_population_key(seed=42, pop_size=200000):
+    """
+    Return the population key of the Queensland population, see population.population_key()
 
-    utils.set_rand_seed({'seed': seed})
-    params.pars['rand_seed'] = seed
+    The defaults are those used to make inputs/qldppl.pop. Pass the key to population.load_popfile() to check
+    that a popfile is up to date before running simulations with it.
+    """
+    params = make_qld_params(seed, pop_size)
+    return population.population_key(params, params.pars['rand_seed'])
 
-    people, popdict = co.make_people(params)
-    if savepeople: 
-        sc.saveobj(popfile, people)
+
+def make_qld_people(seed=None, pop_size=200000, pop_infected=50, 
+                savepeople=True, popfile='qldppl.pop', 
+                savepopdict=False, popdictfile='qdlpopdict.pop',
+                cache_dir='population_cache', popdir=None):
+    """
+    Generate  popdict() and People() for Queensland population
+
+    If popdir is given, the population is also saved there as a directory of
+    arrays that can be memory-mapped by population.load_popfile()
+    """
+    params = make_qld_params(seed, pop_size)
+    seed = params.pars['rand_seed']
+
+    # Reuse an existing population if it was made from the same inputs
+    key = population.population_key(params, seed)
+    people, popdict = population.make_people_cached(params, seed=seed, cache_dir=cache_dir)
+    if savepeople and not population.check_popfile(popfile, key):
+        population.save_popfile(popfile, people, key)
+    if popdir is not None and not population.check_popfile(popdir, key):
+        population.save_people_arrays(popdir, people, popdict, key)
     if savepopdict: 
         sc.saveobj(popdictfile, popdict)
     return people, popdict
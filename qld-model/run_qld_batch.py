@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Run every point of a parameter grid of one of the run_qld_model_resurgence* scripts in a single process
+
+Rather than calling the script once per point from a bash loop, which imports covasim, loads the population and
+starts a pool of worker processes again for every point, this loads the population once and runs the simulations
+of all the points in one pool of processes (see covasim_australia.runner.run_batch). The results of each point
+are saved as soon as its runs finish, in the same files the script would save them to.
+
+The points are run as a sweep (see covasim_australia.sweep.run_sweep), so running the same command again after
+it was interrupted only runs the points that haven't finished, and points whose results already exist are
+skipped. Several nodes sharing the results folder can run the same command at once, with --chunk_size set, and
+share out the points between them.
+
+The grid is either
+    - a JSON file of values for each argument, every combination of which is run, e.g.
+      {"iq_factor": [1.0, 2.0, 3.0], "cluster_size": [1, 5, 10], "vax_proportion": [0.2, 0.5], "vax_efficacy": [0.7, 0.9]}
+    - or a CSV file with a column for each argument, where each row is a point
+
+Any other arguments are passed to the script and used for every point, e.g.
+
+    python run_qld_batch.py --script run_qld_model_resurgence_vax --grid grid.json \
+                            --ncpus 28 --nruns 1000 --label cluster --global_beta 0.028231366
+
+"""
+
+import argparse
+import importlib
+import json
+import pandas as pd
+import pathlib
+import sciris as sc
+
+import covasim_australia.ensemble as ens
+import covasim_australia.population as population
+import covasim_australia.sweep as sweep
+import make_qld_pop
+
+parser = argparse.ArgumentParser(allow_abbrev=False)
+
+parser.add_argument('--script', default='run_qld_model_resurgence_vax',
+                              type=str,
+                              help='''The script to run the points of, without the .py extension.''')
+
+parser.add_argument('--grid',
+                              required=True,
+                              type=str,
+                              help='''A JSON file of the values of each argument, or a CSV file with one point per row.''')
+
+parser.add_argument('--manifest',
+                              default=None,
+                              type=str,
+                              help='''Folder to record the finished points in. Defaults to <results_path>/sweep-<label>.''')
+
+parser.add_argument('--chunk_size',
+                              default=None,
+                              type=int,
+                              help='''Number of points to claim at a time, set it when several nodes run the sweep.''')
+
+
+def read_grid(filename, script_parser):
+    """
+    Read the points of a grid file, as dictionaries of argument values
+    """
+    if pathlib.Path(filename).suffix == '.json':
+        with open(filename) as f:
+            values = json.load(f)
+        points = sweep.expand_grid(values)
+    else:
+        points = pd.read_csv(filename, dtype=str).to_dict(orient='records')
+
+    # Convert the values to the types the script expects, e.g. for values read from a CSV file
+    types = {action.dest: action.type for action in script_parser._actions}
+    for point in points:
+        for key, value in point.items():
+            if key not in types:
+                raise Exception(f'"{key}" in "{filename}" is not an argument of the script')
+            if types[key] is not None:
+                point[key] = types[key](value)
+    return points
+
+
+if __name__ == '__main__':
+
+    T = sc.tic()
+
+    args, script_argv = parser.parse_known_args()
+    script = importlib.import_module(args.script)
+    base_args = script.parser.parse_args(script_argv)
+    # Points include every argument, so sweeps with different base arguments are different tasks
+    points = [{**vars(base_args), **point} for point in read_grid(args.grid, script.parser)]
+
+    datafile, agedatafile, populationfile, betasfile = script.input_files(base_args)
+    simfolder, figfolder = script.results_folders(base_args)
+
+    def make_sim(point, people):
+        return script.make_sim(load_pop=True,
+                               popfile=people,
+                               datafile=datafile,
+                               agedatafile=agedatafile,
+                               betasfile=betasfile,
+                               input_args=argparse.Namespace(**point))
+
+    def outputs(point):
+        return [f"{simfolder}/{script.results_filename(argparse.Namespace(**point))}.ens"]
+
+    def save_results(point, msim):
+        # The ensemble is written last, so a point only counts as done once its stats and figures are saved too
+        point_args = argparse.Namespace(**point)
+        script.save_results(point_args, msim, simfolder, figfolder)
+        ens.EnsembleStore.from_sims(f"{simfolder}/{script.results_filename(point_args)}.ens", msim.sims)
+
+    manifest = args.manifest or f'{base_args.results_path}/sweep-{base_args.label}'
+    people = population.load_popfile(populationfile, key=make_qld_pop.qld_population_key())
+    sweep.run_sweep(make_sim, points, people, manifest, n_runs=base_args.nruns, ncpus=base_args.ncpus,
+                    save=save_results, outputs=outputs, chunk_size=args.chunk_size, reseed=True, noise=2**-6)
+
+    sc.toc(T)
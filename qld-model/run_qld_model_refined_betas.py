@@ -25,7 +25,10 @@ import pathlib as pathlib
 # Import IDM/Optima code
 import covasim as cv
 import sciris as sc
+import covasim_australia.policy_updates as policy_updates
 import covasim_australia.utils as utils
+import covasim_australia.population as population
+import make_qld_pop
 
 # Add argument parser
 import argparse
@@ -107,21 +110,6 @@ parser.add_argument('--layer_betas_file',
                               type=str, 
                               help='''The name of the csv file with layer-specific betas.''')
 
-def define_beta_changes(betasfile, layers):
-
-    beta_data  = pd.read_csv(betasfile, parse_dates=['date'])
-    betas_interventions = []
-
-    for this_layer in layers:
-      # Load data for this layer
-      beta_layer = np.array(beta_data[this_layer])
-      # Find index of change, the date in which the change is implemented is the change index + 1
-      change_idx = np.argwhere(beta_layer[0:-2]-beta_layer[1:-1]) + 1
-      betas_interventions.append(cv.change_beta(days=['2020-01-01'] + [beta_data['date'][change_idx.flat[ii]] for ii in range(len(change_idx.flat))], 
-                                                changes= [1.0] + [beta_data[this_layer][change_idx.flat[ii]] for ii in range(len(change_idx.flat))], 
-                                                layers=[this_layer], do_plot=False))
-    return betas_interventions
-
 def make_sim(load_pop=True, popfile='qldppl.pop', datafile=None, agedatafile=None, input_args=None, betasfile=None):
     start_day = input_args.start_calibration_date
     layers = ['H', 'S', 'W', 'C', 
@@ -159,8 +147,7 @@ def make_sim(load_pop=True, popfile='qldppl.pop', datafile=None, agedatafile=Non
                  load_pop=load_pop)
 
     
-    beta_ints = define_beta_changes(betasfile, layers)             
-    sim.pars['interventions'].extend(beta_ints)
+    sim.pars['interventions'].append(policy_updates.LayerBetaTimeline(betasfile, layers, do_plot=False))
 
     # Testing interventions
     data = pd.read_csv(datafile, parse_dates=['date'])
@@ -270,7 +257,7 @@ if __name__ == '__main__':
 
     # Create instance of simulator
     sim  = make_sim(load_pop=True, 
-                    popfile=populationfile, 
+                    popfile=population.load_popfile(populationfile, key=make_qld_pop.qld_population_key()), 
                     datafile=datafile, 
                     agedatafile=agedatafile,
                     betasfile=betasfile,
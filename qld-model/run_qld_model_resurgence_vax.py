@@ -18,7 +18,11 @@ import pathlib as pathlib
 # Import IDM/Optima code
 import covasim as cv
 import sciris as sc
+import covasim_australia.population as population
+import covasim_australia.runner as runner
+import covasim_australia.policy_updates as policy_updates
 import covasim_australia.utils as utils
+import make_qld_pop
 
 # Add argument parser
 import argparse
@@ -100,6 +104,12 @@ parser.add_argument('--epi_file',
                               type=str, 
                               help='''The name of the csv file with empirical data under inputs/.''')
 
+parser.add_argument('--save_msim', 
+                              default=0, 
+                              type=int, 
+                              help='''Whether to also save the whole MultiSim to an .obj file. 
+                                      Results are always saved to a .ens results store.''')
+
 parser.add_argument('--layer_betas_file', 
                               default='qld_model_layer_betas_02.csv', 
                               type=str, 
@@ -111,21 +121,6 @@ parser.add_argument('--vaccinate',
                               type=str, 
                               help='''A string to determine whether we apply vaccine or no. Available: "apply" "donot-apply" ''')
 
-def define_beta_changes(betasfile, layers):
-
-    beta_data  = pd.read_csv(betasfile, parse_dates=['date'])
-    betas_interventions = []
-
-    for this_layer in layers:
-      # Load data for this layer
-      beta_layer = np.array(beta_data[this_layer])
-      # Find index of change, the date in which the change is implemented is the change index + 1
-      change_idx = np.argwhere(beta_layer[0:-2]-beta_layer[1:-1]) + 1
-      betas_interventions.append(cv.change_beta(days=['2020-01-01'] + [beta_data['date'][change_idx.flat[ii]] for ii in range(len(change_idx.flat))], 
-                                                changes= [1.0] + [beta_data[this_layer][change_idx.flat[ii]] for ii in range(len(change_idx.flat))], 
-                                                layers=[this_layer], do_plot=False))
-    return betas_interventions
-
 
 def get_vaccine_subtargets(sim, vax_coverage):
     sim_pop_size = len(sim.people)
@@ -179,14 +174,17 @@ def make_sim(load_pop=True, popfile='qldppl.pop', datafile=None, agedatafile=Non
             'end_day':   input_args.end_simulation_date,
             'verbose': 0}
 
+    # popfile can be a pickled People object or a directory of memory-mapped arrays
+    if load_pop:
+        popfile = population.load_popfile(popfile)
+
     sim = cv.Sim(pars=pars,
                  datafile=datafile,
                  popfile=popfile,
                  load_pop=load_pop)
 
     # Layer-specific betas    
-    beta_ints = define_beta_changes(betasfile, layers)             
-    sim.pars['interventions'].extend(beta_ints)
+    sim.pars['interventions'].append(policy_updates.LayerBetaTimeline(betasfile, layers, do_plot=False))
 
     # 
     ntpts = sim.day(input_args.end_simulation_date)-sim.day(input_args.start_simulation_date)
@@ -256,23 +254,24 @@ def make_sim(load_pop=True, popfile='qldppl.pop', datafile=None, agedatafile=Non
 
     return sim
 
-# Start setting up to run
-# NB, this file assumes that you've already generated a population file saved in the same folder as this script, called qldpop.pop
-
-if __name__ == '__main__':
-    
-    T = sc.tic()
-
-    # Load argparse
-    args = parser.parse_args()
 
+def input_files(args):
+    """
+    Return the paths of the epi data, age data, population and layer betas files
+    """
     # Inputs
     inputsfolder = 'inputs'
     datafile = f'{inputsfolder}/{args.epi_file}'
     agedatafile = f'{inputsfolder}/qld_demo_data_abs.csv'
     populationfile = f'{inputsfolder}/qldppl.pop'
     betasfile = f'{inputsfolder}/{args.layer_betas_file}'
+    return datafile, agedatafile, populationfile, betasfile
+
 
+def results_folders(args):
+    """
+    Return the folders to save the simulation results and figures to, creating them if needed
+    """
     # Results paths
     resultsfolder = args.results_path
     # simulation data path
@@ -282,18 +281,28 @@ if __name__ == '__main__':
 
     pathlib.Path(simfolder).mkdir(parents=True, exist_ok=True)
     pathlib.Path(figfolder).mkdir(parents=True, exist_ok=True)
+    return simfolder, figfolder
 
-    # Create instance of simulator
-    sim  = make_sim(load_pop=True, 
-                    popfile=populationfile, 
-                    datafile=datafile, 
-                    agedatafile=agedatafile,
-                    betasfile=betasfile,
-                    input_args=args)
 
+def results_filename(args):
+    """
+    Return the name the results of a scenario are saved under, without an extension
+    """
     # Do the stuff & save results
-    msim = cv.MultiSim(base_sim=sim, par_args={'ncpus': args.ncpus})
-    msim.run(n_runs=args.nruns, reseed=True, noise=2**-6)
+    if args.label == 'cluster':
+        res_filename = f"qld_{args.label}_{args.start_simulation_date}_{args.end_simulation_date}_iqf_{args.iq_factor/10.0:.{4}f}_vxprop_{args.vax_proportion:.{2}f}_vxeff_{args.vax_efficacy:.{2}f}_{args.cluster_size:04d}"
+        
+    if args.label == 'distributed':
+        res_filename = f"qld_{args.label}_{args.start_simulation_date}_{args.end_simulation_date}_iqf_{args.iq_factor/10.0:.{4}f}_{args.dist}_{args.par1:.{4}f}"
+    return res_filename
+
+
+def save_results(args, msim, simfolder, figfolder):
+    """
+    Save the summary statistics and the plot of the runs of a scenario
+    """
+    res_filename = results_filename(args)
+
     # Get ensemble and convolve
     median_trace, data = utils.get_ensemble_trace('new_diagnoses', msim.sims, **{'convolve': True, 'num_days': 3})
     # Get ensemble outbreak
@@ -363,14 +372,9 @@ if __name__ == '__main__':
 
     df = pd.DataFrame.from_dict(df_dict)
 
-    # Plot all sims together 
-    if args.label == 'cluster':
-        res_filename = f"qld_{args.label}_{args.start_simulation_date}_{args.end_simulation_date}_iqf_{args.iq_factor/10.0:.{4}f}_vxprop_{args.vax_proportion:.{2}f}_vxeff_{args.vax_efficacy:.{2}f}_{args.cluster_size:04d}"
-        
-    if args.label == 'distributed':
-        res_filename = f"qld_{args.label}_{args.start_simulation_date}_{args.end_simulation_date}_iqf_{args.iq_factor/10.0:.{4}f}_{args.dist}_{args.par1:.{4}f}"
-    
-    msim.save(f"{simfolder}/{res_filename}.obj")
+    # The results are already in the .ens store, only keep the whole msim if asked to
+    if args.save_msim:
+        msim.save(f"{simfolder}/{res_filename}.obj")
     # Save basic results to csv
     df.to_csv(f"{simfolder}/{res_filename}.csv")
     
@@ -379,5 +383,32 @@ if __name__ == '__main__':
     msim_fig.savefig(f"{figfolder}/{res_filename}.png", dpi=100)
     plt.close('all')
 
+
+# Start setting up to run
+# NB, this file assumes that you've already generated a population file saved in the same folder as this script, called qldpop.pop
+
+if __name__ == '__main__':
+    
+    T = sc.tic()
+
+    # Load argparse
+    args = parser.parse_args()
+
+    datafile, agedatafile, populationfile, betasfile = input_files(args)
+    simfolder, figfolder = results_folders(args)
+
+    # Create instance of simulator
+    sim  = make_sim(load_pop=True, 
+                    popfile=population.load_popfile(populationfile, key=make_qld_pop.qld_population_key()), 
+                    datafile=datafile, 
+                    agedatafile=agedatafile,
+                    betasfile=betasfile,
+                    input_args=args)
+
+    res_filename = results_filename(args)
+    msim = runner.run_msim(sim, n_runs=args.nruns, ncpus=args.ncpus, reseed=True, noise=2**-6,
+                           store=f"{simfolder}/{res_filename}.ens")
+    save_results(args, msim, simfolder, figfolder)
+
     sc.toc(T)
         
\ No newline at end of file
@@ -16,6 +16,8 @@ import numpy as np
 # Import IDM/Optima code
 import covasim as cv
 import sciris as sc
+import covasim_australia.population as population
+import make_qld_pop
 
 
 def make_sim(whattorun, julybetas=None, load_pop=True, popfile='qldppl.pop', datafile=None, agedatafile=None):
@@ -252,7 +254,7 @@ if __name__ == '__main__':
     if domulti:
         if whattorun == 'calibration':
             sim  = make_sim(whattorun, load_pop=True, 
-                            popfile='inputs/qldppl.pop', 
+                            popfile=population.load_popfile('inputs/qldppl.pop', key=make_qld_pop.qld_population_key()), 
                             datafile=datafile, 
                             agedatafile=agedatafile)
             msim = cv.MultiSim(base_sim=sim)
@@ -268,7 +270,7 @@ if __name__ == '__main__':
         elif whattorun == 'scenarios':
             julybetas = [0.15, 0.2, 1.0]
             for jb in julybetas:
-                sim = make_sim(whattorun, julybetas=jb, load_pop=True, popfile='qldppl.pop', datafile=datafile, agedatafile=agedatafile)
+                sim = make_sim(whattorun, julybetas=jb, load_pop=True, popfile=population.load_popfile('qldppl.pop', key=make_qld_pop.qld_population_key()), datafile=datafile, agedatafile=agedatafile)
                 msim = cv.MultiSim(base_sim=sim)
                 msim.run(n_runs=number_of_runs, reseed=True, noise=0)
                 if dosave: 
@@ -280,7 +282,7 @@ if __name__ == '__main__':
                               axis_args={'hspace': 0.4}, 
                               interval=21)
     else:
-        sim = make_sim(whattorun, load_pop=True, popfile='qldppl.pop', datafile=datafile, agedatafile=agedatafile)
+        sim = make_sim(whattorun, load_pop=True, popfile=population.load_popfile('qldppl.pop', key=make_qld_pop.qld_population_key()), datafile=datafile, agedatafile=agedatafile)
         sim.run()
         if dosave: sim.save(f'{resultsfolder}/qld_{whattorun}.obj')
         if doplot:
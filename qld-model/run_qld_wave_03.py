@@ -22,6 +22,8 @@ import numpy as np
 import covasim as cv
 import sciris as sc
 import covasim_australia.utils as utils
+import covasim_australia.population as population
+import make_qld_pop
 
 # Add argument parser
 import argparse
@@ -357,7 +359,7 @@ if __name__ == '__main__':
     # Create instance of simulator
     sim  = make_sim(case_to_run,
                     load_pop=True, 
-                    popfile=populationfile, 
+                    popfile=population.load_popfile(populationfile, key=make_qld_pop.qld_population_key()), 
                     datafile=datafile, 
                     agedatafile=agedatafile,
                     input_args = args)
@@ -14,5 +14,6 @@ setup(
         'sciris',
         'tqdm',
         'networkx',
+        'pyarrow',
     ],
 )
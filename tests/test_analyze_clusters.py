@@ -0,0 +1,42 @@
+import covasim as cv
+import covasim_australia.analyze_clusters as ac
+import networkx as nx
+import numpy as np
+
+
+def test_cluster_timeseries():
+    # Same clusters as get_clusters() on each day
+    pars = {'pop_size': 5000, 'pop_infected': 30, 'n_days': 40, 'verbose': 0, 'rand_seed': 2}
+    interventions = [cv.test_prob(symp_prob=0.3, asymp_prob=0.02), cv.contact_tracing(trace_probs=0.8, trace_time=1)]
+    sim = cv.Sim(pars=pars, interventions=interventions)
+    sim.run()
+
+    expected = {}
+    for t in range(sim.npts):
+        for label, members in ac.get_clusters(sim, t).items():
+            expected.setdefault(label, np.zeros(sim.npts))[t] = len(members)
+    cluster_sizes = ac.get_cluster_timeseries(sim)
+    assert any(sizes.max() > 1 for sizes in cluster_sizes.values())
+    assert cluster_sizes.keys() == expected.keys()
+    for label in expected:
+        assert np.array_equal(cluster_sizes[label], expected[label])
+
+
+def test_undirected_cluster_timeseries():
+    # Clusters labelled by their earliest member, compared to connected components on each day
+    rng = np.random.default_rng(0)
+    npts = 20
+    node_day = rng.integers(0, npts + 5, size=100)
+    node_key = node_day + rng.random(100)
+    edge_a, edge_b = rng.integers(0, 100, size=(2, 80))
+    edge_day = np.maximum.reduce([node_day[edge_a], node_day[edge_b], rng.integers(0, npts, size=80)])
+
+    row, sizes = ac.cluster_timeseries(node_day, edge_a, edge_b, edge_day, npts, directed=False, node_key=node_key)
+    for t in range(npts):
+        G = nx.Graph()
+        G.add_nodes_from(np.nonzero(node_day <= t)[0])
+        G.add_edges_from((a, b) for a, b, day in zip(edge_a, edge_b, edge_day) if day <= t)
+        expected = np.zeros(len(sizes), dtype=int)
+        for cluster in nx.connected_components(G):
+            expected[row[min(cluster, key=lambda node: node_key[node])]] = len(cluster)
+        assert np.array_equal(sizes[:, t], expected)
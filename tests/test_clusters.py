@@ -0,0 +1,55 @@
+import covasim_australia.clusters as cl
+import numpy as np
+import pandas as pd
+
+
+def make_contact_matrix():
+    bins = ['0-20', '20-40', '40-60', '60-80']
+    matrix = pd.DataFrame(np.array([[4, 2, 1, 1],
+                                    [2, 4, 1, 1],
+                                    [1, 1, 4, 2],
+                                    [1, 1, 2, 4]], dtype=float), index=bins, columns=bins)
+    return {'matrix': matrix, 'age_lb': [0, 20, 40, 60], 'age_ub': [19, 39, 59, 79]}
+
+
+def test_household_clusters():
+    n_households = pd.Series([30, 20, 10], index=[1, 2, 3])
+    pop_size = sum(n_households * n_households.index)
+    household_heads = np.random.randint(20, 80, size=n_households.sum())
+    uids = np.arange(pop_size)
+
+    household_ids, ages = cl.make_household_clusters(n_households, pop_size, household_heads, uids, make_contact_matrix())
+
+    # Household sizes match the requested household distribution
+    sizes = np.bincount(household_ids)
+    assert np.array_equal(np.bincount(sizes)[1:], n_households.values)
+
+    # The first member of each household is the household head
+    first_members = np.unique(household_ids, return_index=True)[1]
+    assert np.array_equal(ages[first_members], household_heads)
+
+    # Everyone else has an age from one of the contact matrix bins
+    assert ages.min() >= 0 and ages.max() <= 80
+
+
+def test_cluster_sizes():
+    sizes = cl.cluster_sizes(10000, 20)
+    assert sizes.sum() == 10000 and sizes.min() > 0
+    assert 19 < sizes[:-1].mean() < 21
+    assert len(cl.cluster_sizes(0, 20)) == 0
+    assert cl.create_clustering(np.arange(5), 100) == [[0, 1, 2, 3, 4]]
+
+
+def test_school_clusters():
+    uids = np.arange(5000)
+    ages = np.random.randint(0, 80, size=5000)
+    inds, classroom_ids = cl.make_sclusters(uids, ages, 20)
+
+    # Everyone aged 5-17 is in exactly one classroom
+    assert np.array_equal(np.sort(inds[ages[inds] < 18]), uids[(ages >= 5) & (ages < 18)])
+
+    # Each classroom has one teacher and children of a single age
+    is_teacher = ages[inds] > 18
+    assert np.array_equal(np.bincount(classroom_ids[is_teacher]), np.ones(classroom_ids.max()+1))
+    for classroom in range(classroom_ids.max()+1):
+        assert len(np.unique(ages[inds[(classroom_ids == classroom) & ~is_teacher]])) == 1
@@ -0,0 +1,53 @@
+import covasim_australia.collate as collate
+import os
+import pandas as pd
+import pytest
+
+
+def write_result(path, value):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({'value': [value]}).to_csv(path)
+
+
+def test_collate_results(tmp_path):
+    results = tmp_path/'results'
+    for i in range(5):
+        write_result(results/f'job{i}'/'result.csv', i)
+    summary_file = tmp_path/'summary.pkl'
+
+    summary = collate.collate_results(results, summary_file, ncpus=2, verbose=False)
+    assert sorted(summary['value']) == [0, 1, 2, 3, 4]
+    assert set(summary['source_file']) == {os.path.join(f'job{i}', 'result.csv') for i in range(5)}
+
+    # Only new, modified and deleted files change the summary
+    write_result(results/'job5'/'result.csv', 5)
+    write_result(results/'job0'/'result.csv', 10)
+    os.utime(results/'job0'/'result.csv', (0, 0))
+    os.remove(results/'job1'/'result.csv')
+    summary = collate.collate_results(results, summary_file, ncpus=2, verbose=False)
+    assert sorted(summary['value']) == [2, 3, 4, 5, 10]
+
+    # Files that haven't changed are not read again
+    stat = os.stat(results/'job2'/'result.csv')
+    pd.DataFrame({'value': [-1]}).to_csv(results/'job2'/'result.csv')
+    os.utime(results/'job2'/'result.csv', ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert sorted(collate.collate_results(results, summary_file, verbose=False)['value']) == sorted(summary['value'])
+
+    # Without the source_file column, the summary is the same table as concatenating the files
+    os.utime(results/'job2'/'result.csv', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**6))
+    files = sorted(results.rglob('*.csv'))
+    expected = pd.concat([pd.read_csv(path) for path in files])
+    summary = collate.collate_results(results, summary_file, verbose=False)
+    pd.testing.assert_frame_equal(summary.drop(columns='source_file'), expected)
+
+
+def test_collate_results_parquet(tmp_path):
+    pytest.importorskip('pyarrow')
+    results = tmp_path/'results'
+    for i in range(3):
+        write_result(results/f'job{i}'/'result.csv', i)
+    summary = collate.collate_results(results, tmp_path/'summary.parquet', ncpus=1, verbose=False)
+    write_result(results/'job3'/'result.csv', 3)
+    updated = collate.collate_results(results, tmp_path/'summary.parquet', ncpus=1, verbose=False)
+    assert sorted(updated['value']) == [0, 1, 2, 3]
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path/'summary.parquet'), updated)
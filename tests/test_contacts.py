@@ -0,0 +1,165 @@
+import covasim as cv
+import covasim.utils as cvu
+import covasim_australia.contacts as co
+import numpy as np
+
+
+def edge_set(p1, p2):
+    return set(zip(p1.tolist(), p2.tolist()))
+
+
+def dict_edge_set(contacts):
+    return {(source, target) for source, targets in contacts.items() for target in targets.tolist()}
+
+
+def test_cluster_edges():
+    # Everyone in a cluster is connected to everyone else in both directions
+    p1, p2 = co.cluster_edges(np.array([1, 2, 3, 4, 5]), np.array([0, 0, 0, 1, 1]))
+    assert len(p1) == 8
+    assert edge_set(p1, p2) == {(1, 2), (1, 3), (2, 1), (2, 3), (3, 1), (3, 2), (4, 5), (5, 4)}
+
+
+def test_cluster_edges_matches_dict_contacts():
+    # People appearing in more than one cluster shouldn't produce self-contacts or duplicate edges
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        clusters = [rng.integers(0, 50, size=rng.integers(0, 8)).tolist() for _ in range(rng.integers(1, 15))]
+        p1, p2 = co.cluster_edges(*co.clusters_to_ids(clusters))
+        expected = dict_edge_set(co.clusters_to_contacts(clusters))
+        assert len(p1) == len(expected)
+        assert edge_set(p1, p2) == expected
+
+
+def test_cluster_edges_empty():
+    p1, p2 = co.cluster_edges(*co.clusters_to_ids([]))
+    assert len(p1) == 0 and len(p2) == 0
+
+
+def test_rewire_random_contacts():
+    include_inds = np.arange(0, 2000, 2)
+    p1, p2 = co.make_random_contacts(include_inds, 10, array_output=True)
+
+    # Nobody is resampled
+    new_p1, new_p2 = co.rewire_random_contacts(p1, p2, include_inds, 10, turnover=0)
+    assert np.array_equal(new_p1, p1) and np.array_equal(new_p2, p2)
+
+    # Some people are resampled, the rest keep their contacts
+    new_p1, new_p2 = co.rewire_random_contacts(p1, p2, include_inds, 10, turnover=0.2)
+    assert set(new_p1.tolist()).union(new_p2.tolist()).issubset(include_inds.tolist())
+    assert abs(len(new_p1) - len(p1)) < 0.05*len(p1)
+    kept = edge_set(p1, p2).intersection(edge_set(new_p1, new_p2))
+    assert 0.7*len(p1) < len(kept) < 0.9*len(p1)
+
+
+def test_random_contacts_buffer():
+    # Filling a preallocated buffer gives the same edges as allocating new arrays
+    include_inds = np.arange(0, 2000, 2)
+    cvu.set_seed(1)
+    p1, p2 = co.make_random_contacts(include_inds, 10, array_output=True)
+
+    buffer = co.EdgeBuffer(co.edge_capacity(len(include_inds), 10))
+    cvu.set_seed(1)
+    buf_p1, buf_p2 = co.make_random_contacts(include_inds, 10, array_output=True, out=buffer)
+    assert buffer.holds(buf_p1) and buffer.holds(buf_p2)
+    assert np.array_equal(p1, buf_p1) and np.array_equal(p2, buf_p2)
+
+    # Rewiring in the buffer happens in place, and the buffer grows if it runs out of space
+    buffer = co.EdgeBuffer(10)
+    buf_p1, buf_p2 = co.rewire_random_contacts(p1, p2, include_inds, 10, turnover=0.5, out=buffer)
+    assert buffer.capacity >= len(buf_p1) > 10
+    assert buffer.holds(buf_p1) and buffer.holds(buf_p2)
+
+
+def test_group_layer_find_contacts():
+    # Group layers find the same contacts as the edges of the same clusters
+    rng = np.random.default_rng(1)
+    for _ in range(20):
+        inds, group_ids = co.clusters_to_ids([rng.integers(0, 50, size=rng.integers(0, 8)).tolist() for _ in range(rng.integers(1, 15))])
+        p1, p2 = co.cluster_edges(inds, group_ids)
+        edge_layer = cv.Layer(p1=p1, p2=p2, beta=np.ones(len(p1), dtype=np.float32))
+        group_layer = co.GroupLayer(inds, group_ids)
+        assert np.array_equal(group_layer.members, np.unique(np.concatenate([p1, p2])))
+        trace_inds = rng.integers(0, 50, size=5)
+        assert np.array_equal(group_layer.find_contacts(trace_inds), edge_layer.find_contacts(trace_inds))
+        assert group_layer.find_contacts(trace_inds, as_array=False) == edge_layer.find_contacts(trace_inds, as_array=False)
+
+
+def test_group_layer_infections():
+    # Each person is infected with the same probability as through the edges between them and the rest of their group
+    beta = 0.02
+    inds = np.arange(20)
+    group_ids = np.repeat([0, 1], 10)
+    layer = co.GroupLayer(inds, group_ids)
+    rel_trans = np.zeros(20, dtype=np.float32)
+    rel_trans[[0, 1, 10]] = [1.0, 2.0, 0.5]
+    rel_sus = np.ones(20, dtype=np.float32)
+    rel_sus[[0, 1, 10]] = 0  # The infectious people aren't susceptible
+    rel_sus[5] = 3
+
+    np.random.seed(0)
+    n_reps = 20000
+    infected = np.zeros(20)
+    for _ in range(n_reps):
+        sources, targets = layer.compute_infections(beta, rel_trans, rel_sus)
+        assert np.array_equal(group_ids[sources], group_ids[targets])
+        assert np.isin(sources, [0, 1, 10]).all()
+        infected[targets] += 1
+
+    # Both directions of each edge are evaluated, so each source-target pair gets two chances
+    expected = np.array([1 - np.prod([(1 - beta*rel_trans[i]*rel_sus[j])**2 for i in inds[group_ids == group_ids[j]] if i != j]) for j in inds])
+    assert np.allclose(infected/n_reps, expected, atol=0.01)
+
+
+def test_undirected_edges():
+    # Half the edges, with the same transmission rates
+    inds, cluster_ids = co.clusters_to_ids([[0, 1, 2, 3], [4, 5], [6, 7, 8]])
+    p1, p2 = co.cluster_edges(inds, cluster_ids)
+    u1, u2 = co.undirected_edges(p1, p2)
+    assert len(u1) == len(p1)//2
+    assert edge_set(u1, u2) | edge_set(u2, u1) == edge_set(p1, p2)
+
+    beta = np.float32(0.02)
+    rel_trans = np.array([1, 0, 0, 0, 2, 0, 0.5, 0, 0], dtype=np.float32)
+    rel_sus = np.array([0, 1, 1, 3, 0, 1, 0, 1, 2], dtype=np.float32)
+    np.random.seed(0)
+    n_reps = 20000
+    infected = {}
+    for name, (s1, s2, edge_beta) in {'directed': (p1, p2, 1.0), 'undirected': (u1, u2, co.undirected_beta)}.items():
+        betas = np.full(len(s1), edge_beta, dtype=np.float32)
+        infected[name] = np.zeros(len(rel_sus))
+        for _ in range(n_reps):
+            for sources, targets in [[s1, s2], [s2, s1]]:  # As in cv.Sim.step()
+                infected[name][cvu.compute_infections(beta, sources, targets, betas, rel_trans, rel_sus)[1]] += 1
+    assert np.allclose(infected['directed']/n_reps, infected['undirected']/n_reps, atol=0.01)
+
+
+def test_contact_index():
+    include_inds = np.arange(0, 2000, 2)
+    p1, p2 = co.make_random_contacts(include_inds, 10, array_output=True)
+    layer = cv.Layer(p1=p1, p2=p2, beta=np.ones(len(p1), dtype=np.float32))
+    index = co.get_contact_index(layer, 2000)
+
+    # Same contacts as Layer.find_contacts()
+    for inds in [[0], [1], [4, 10, 1998], np.arange(0, 2000, 7)]:
+        assert np.array_equal(index.find_contacts(inds), layer.find_contacts(np.array(inds)))
+        assert index.find_contacts(inds, as_array=False) == layer.find_contacts(np.array(inds), as_array=False)
+
+    # The index is only rebuilt when the layer changes
+    assert co.get_contact_index(layer, 2000, index) is index
+    layer['p1'], layer['p2'] = co.make_random_contacts(include_inds, 10, array_output=True)
+    new_index = co.get_contact_index(layer, 2000, index)
+    assert new_index is not index
+    assert np.array_equal(new_index.find_contacts([4]), layer.find_contacts(np.array([4])))
+
+
+def test_find_contact_pairs():
+    # Each person's contacts are the same as finding their contacts separately
+    rng = np.random.default_rng(2)
+    inds, group_ids = co.clusters_to_ids([rng.integers(0, 100, size=rng.integers(0, 8)).tolist() for _ in range(40)])
+    p1, p2 = co.cluster_edges(inds, group_ids)
+    layer = cv.Layer(p1=p1, p2=p2, beta=np.ones(len(p1), dtype=np.float32))
+    trace_inds = rng.choice(100, 20, replace=False)
+    for index in [co.get_contact_index(layer, 100), co.GroupLayer(inds, group_ids)]:
+        owners, contacts = index.find_contact_pairs(trace_inds)
+        for ind in trace_inds:
+            assert set(contacts[owners == ind].tolist()) == layer.find_contacts(np.array([ind]), as_array=False)
@@ -0,0 +1,32 @@
+import covasim_australia.data as data
+import numpy as np
+import pandas as pd
+
+
+def assert_same(a, b):
+    if isinstance(a, dict):
+        assert a.keys() == b.keys()
+        for key in a:
+            assert_same(a[key], b[key])
+    elif isinstance(a, (pd.DataFrame, pd.Series)):
+        assert a.equals(b)
+    elif isinstance(a, (np.ndarray, list)):
+        assert np.array_equal(a, b)
+    elif isinstance(a, float) and np.isnan(a):
+        assert np.isnan(b)
+    else:
+        assert a == b
+
+
+def test_databook_cache(tmp_path):
+    kwargs = dict(locations=['QLD'], db_name='input_data_Australia', epi_name=None)
+    loc_data = data.read_data(**kwargs, use_cache=False)
+    compiled_data = data.read_data(**kwargs, cache_dir=tmp_path)  # Compiles the databook
+    assert len(list(tmp_path.glob('*.obj'))) == 1
+    cached_data = data.read_data(**kwargs, cache_dir=tmp_path)  # Loads the compiled databook
+    assert_same(loc_data, compiled_data)
+    assert_same(loc_data, cached_data)
+
+    # Different layers are compiled separately
+    data.read_data(**kwargs, all_lkeys=['H', 'S', 'W', 'C', 'church'], cache_dir=tmp_path)
+    assert len(list(tmp_path.glob('*.obj'))) == 2
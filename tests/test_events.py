@@ -0,0 +1,48 @@
+import covasim as cv
+import covasim_australia.contacts as co
+import covasim_australia.data as data
+import covasim_australia.events as ev
+import covasim_australia.parameters as parameters
+import numpy as np
+
+all_lkeys = ['H', 'S', 'W', 'C', 'church', 'pSport', 'cSport', 'entertainment', 'cafe_restaurant', 'pub_bar', 'transport', 'public_parks', 'large_events', 'social']
+dynamic_lkeys = ['C', 'entertainment', 'cafe_restaurant', 'pub_bar', 'transport', 'public_parks', 'large_events']
+
+
+def test_event_index():
+    index = ev.EventIndex(['date_diagnosed'])
+    dates = np.full(10, np.nan)
+    dates[[1, 2, 5]] = [3, 4, 3]
+    index.add('date_diagnosed', [1, 2, 5], dates[[1, 2, 5]])
+    index.add('date_tested', [1], 3)  # Not indexed
+    assert np.array_equal(index.on(dates, 'date_diagnosed', 3), [1, 5])
+    assert np.array_equal(index.on(dates, 'date_diagnosed', 4), [2])
+
+    # Entries whose date has changed since are left out
+    dates[5] = 6
+    index.add('date_diagnosed', [5], 6)
+    assert np.array_equal(index.on(dates, 'date_diagnosed', 3), [1])
+    assert np.array_equal(index.on(dates, 'date_diagnosed', 6), [5])
+    assert len(index.on(dates, 'date_diagnosed', 7)) == 0
+
+
+def test_people_on():
+    loc_data = data.read_data(locations=['QLD'], db_name='input_data_Australia', epi_name=None, all_lkeys=all_lkeys, dynamic_lkeys=dynamic_lkeys)
+    params = parameters.setup_params(location='QLD', loc_data=loc_data, sim_pars={'pop_size': 5000})
+    people, _ = co.make_people(params)
+    assert isinstance(people, ev.IndexedPeople)
+
+    def check(sim):
+        # The index finds the same people as scanning the dates
+        assert isinstance(sim.people, ev.IndexedPeople)
+        for key in ev.IndexedPeople.event_keys:
+            for day in [sim.t-1, sim.t, sim.t+2]:
+                assert np.array_equal(ev.people_on(sim.people, key, day), cv.true(sim.people[key] == day)), (key, day)
+
+    interventions = [cv.test_prob(symp_prob=0.2, asymp_prob=0.01, test_delay=2),
+                     cv.contact_tracing(trace_probs=0.8, trace_time=1),
+                     check]
+    sim = cv.Sim(pars={'pop_size': 5000, 'pop_infected': 50, 'n_days': 30, 'verbose': 0}, popfile=people, load_pop=True, interventions=interventions)
+    sim.run()
+    assert sim.results['cum_diagnoses'][-1] > 0
+    assert sim.results['cum_quarantined'][-1] > 0
@@ -0,0 +1,50 @@
+"""
+Run this file directly to time importing the package, e.g. `python tests/test_imports.py`
+"""
+
+import covasim_australia
+import importlib
+import inspect
+import subprocess
+import sys
+
+
+def imported_modules(code):
+    # Return the modules imported by running `code` in a new process
+    output = subprocess.run([sys.executable, '-c', f'{code}; import sys; print(" ".join(sys.modules))'], check=True, capture_output=True, text=True).stdout
+    return set(output.splitlines()[-1].split())
+
+
+def test_lazy_imports():
+    assert imported_modules('import covasim_australia') & {'covasim', 'covasim_australia.utils'} == set()
+
+    # Running simulations doesn't need the plotting and cluster analysis code
+    modules = imported_modules('import covasim_australia as cva; cva.run_msim; cva.limited_contact_tracing_2; cva.make_people')
+    assert 'covasim_australia.utils' in modules
+    assert modules & {'networkx', 'covasim_australia.analyze_clusters', 'covasim_australia.plot', 'covasim_australia.scenarios'} == set()
+
+
+def test_package_names():
+    # Everything a submodule defines is available from the package, as it would be with `from .submodule import *`
+    names = {}
+    for submodule in covasim_australia._submodule_names:
+        module = importlib.import_module(f'covasim_australia.{submodule}')
+        assert getattr(covasim_australia, submodule) is module
+        for name, value in vars(module).items():
+            if not name.startswith('_') and not inspect.ismodule(value) and getattr(value, '__module__', module.__name__) == module.__name__:
+                names[name] = value
+    assert set(names) == set(covasim_australia.__all__) - {'datadir'}
+    for name, value in names.items():
+        assert getattr(covasim_australia, name) is value, name
+
+
+if __name__ == '__main__':
+    import time
+    for code in ['import covasim', 'import covasim_australia', 'import covasim_australia as cva; cva.run_msim; cva.limited_contact_tracing_2; cva.make_people',
+                 'import covasim_australia.analyze_clusters, covasim_australia.plot, covasim_australia.scenarios, covasim_australia.utils']:
+        times = []
+        for i in range(5):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', code], check=True, capture_output=True)
+            times.append(time.perf_counter() - start)
+        print(f'{min(times):6.3f} s  {code}')
@@ -0,0 +1,57 @@
+import covasim as cv
+import covasim_australia.infection_log as il
+import numpy as np
+import pickle
+import sciris as sc
+
+
+def run_sim():
+    sim = cv.Sim(pop_size=5000, pop_infected=20, n_days=30, verbose=0, rand_seed=1)
+    sim.run()
+    return sim
+
+
+def test_infection_log():
+    sim = run_sim()
+    entries = sim.people.infection_log
+    log = il.InfectionLog(entries, capacity=1)
+
+    # The log behaves like the list of dictionaries it replaces
+    assert len(log) == len(entries)
+    assert list(log) == entries
+    assert log[-1] == entries[-1]
+    assert log.layer_keys[log.layer[0]] == 'seed_infection'
+    assert (log.source[:20] == -1).all()
+
+    # Lookups by person match scanning the list
+    for ind in np.random.choice(sim.n, 50):
+        assert [entries[i] for i in log.by_source(ind)] == [x for x in entries if x['source'] == ind]
+        assert [entries[i] for i in log.by_target(ind)] == [x for x in entries if x['target'] == ind]
+    inds = log.target[::10]
+    assert [entries[i] for i in log.involving(inds, 'h')] == [x for x in entries if (x['source'] in inds or x['target'] in inds) and x['layer'] == 'h']
+    assert len(log.involving([sim.n + 10])) == 0
+
+    # Only the filled part of the arrays is saved
+    loaded = pickle.loads(pickle.dumps(log))
+    assert len(loaded.source) == len(log) and list(loaded) == entries
+    loaded.append({'source': None, 'target': 0, 'date': 30, 'layer': 'importation'})
+    assert loaded[-1]['layer'] == 'importation' and len(loaded.by_target(0)) == len(log.by_target(0)) + 1
+    for ind in np.random.choice(sim.n, 50):
+        assert np.array_equal(loaded.by_source(ind), log.by_source(ind))
+    loaded.append({'source': sim.n - 1, 'target': sim.n + 5, 'date': 30, 'layer': 'h'})
+    assert np.array_equal(loaded.involving(sim.n - 1), np.union1d(log.involving(sim.n - 1), [len(loaded) - 1]))
+
+    # Empty logs, e.g. of a population that hasn't been run yet, can be saved too
+    empty = pickle.loads(pickle.dumps(il.InfectionLog()))
+    assert len(empty) == 0 and len(empty.by_target(0)) == 0
+
+
+def test_people_infection_log():
+    # The log is filled by covasim itself once the people use it
+    people = cv.make_people(cv.Sim(pop_size=5000))
+    il.get_infection_log(people)
+    sim = cv.Sim(pop_size=5000, pop_infected=20, n_days=30, verbose=0, rand_seed=1, popfile=sc.dcp(people), load_pop=True)
+    sim.run()
+    assert isinstance(sim.people.infection_log, il.InfectionLog)
+    assert len(sim.people.infection_log) == sim.results['cum_infections'][-1]
+
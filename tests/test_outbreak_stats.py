@@ -0,0 +1,89 @@
+import covasim_australia.utils as utils
+import numpy as np
+
+
+def make_data():
+    # Four runs: an outbreak that dies off, an outbreak that keeps going, some cases but no outbreak, and no cases
+    data = np.zeros((30, 4))
+    data[5:10, 0] = 6
+    data[5:, 1] = 6
+    data[3, 2] = 2
+    return data
+
+
+def test_detect_outbreak_batch():
+    data = make_data()
+    expected = [utils.detect_outbreak(data[:, i], use_nan=True) for i in range(data.shape[1])]
+    assert np.array_equal(utils.detect_outbreak_batch(data), expected, equal_nan=True)
+    assert np.array_equal(utils.detect_first_case_batch(data), [5, 5, 3, np.nan], equal_nan=True)
+
+
+def test_calculate_outbreak_stats():
+    ou_day_av, ou_day_md, ou_day_sd, ou_prob, uc_prob, co_prob = utils.calculate_outbreak_stats(make_data())
+    assert ou_day_av == ou_day_md == 6 and ou_day_sd == 0
+    assert ou_prob == 50 and uc_prob == 25 and co_prob == 25
+
+
+def test_calculate_sct_dies_off():
+    assert utils.calculate_sct_dies_off(make_data()) == (2, 1)
+
+
+def loop_outbreak_stats(data):
+    # The statistics calculated one run at a time with the scalar detectors, as calculate_outbreak_stats() used to
+    day_idx = np.array([utils.detect_outbreak(data[:, i], use_nan=True) for i in range(data.shape[1])])
+    labels = [utils.detect_outbreak_case(data[:, i], day_idx[i]) for i in range(data.shape[1])]
+    probs = [labels.count(label) / data.shape[1] * 100.0 for label in ['outbreak', 'under_control', 'contained']]
+    return (np.nanmean(day_idx), np.nanmedian(day_idx), np.nanstd(day_idx), *probs)
+
+
+def loop_sct_supression(data):
+    # The day each outbreak dies off, one run at a time, as calculate_sct_supression() used to
+    day_off = []
+    for i in range(data.shape[1]):
+        day_idx = utils.detect_outbreak(data[:, i], use_nan=True)
+        if not np.isnan(day_idx):
+            day_off.append(utils.detect_first_case_less_equal_than(data[day_idx:, i], num_cases=0.0, use_nan=True) + day_idx)
+    n_dies_off = int(np.sum(~np.isnan(day_off)))
+    return n_dies_off / len(day_off) * 100.0, n_dies_off / 1000.0 * 100.0, day_off
+
+
+def loop_sct_dies_off(data):
+    # The number of outbreaks, and of those that go back to zero cases, one run at a time, as calculate_sct_dies_off() used to
+    n_outbreak, n_dies_off = 0, 0
+    for i in range(data.shape[1]):
+        day_idx = utils.detect_outbreak(data[:, i], use_nan=True)
+        if not np.isnan(day_idx):
+            n_outbreak += 1
+            n_dies_off += utils.detect_zeros(data[day_idx:, i])
+    return n_outbreak, n_dies_off
+
+
+def loop_first_case_stats(data_nc, data_ni):
+    fc_day = np.array([utils.detect_first_case(data_nc[:, i], use_nan=True) for i in range(data_nc.shape[1])])
+    fc_inf = np.array([np.nan if np.isnan(day) else data_ni[int(day), i] for i, day in enumerate(fc_day)])
+    return np.nanmean(fc_day), np.nanmedian(fc_day), np.nanstd(fc_day), np.nanmean(fc_inf), np.nanmedian(fc_inf), np.nanstd(fc_inf)
+
+
+def test_batch_stats_over_ensembles():
+    # Stacking ensembles along a third axis gives the same statistics as applying the scalar detectors to each run
+    rng = np.random.default_rng(0)
+    data = rng.poisson(rng.uniform(0, 6, size=(1, 20, 5)), size=(40, 20, 5)).astype(float)
+    data[:, :3, 0] = 0  # Some runs with no cases
+    data[10:, 3:5] = 0  # Some outbreaks that go back to zero cases
+    data_ni = rng.poisson(4, size=data.shape).astype(float)
+
+    outbreak_stats = utils.calculate_outbreak_stats_batch(data)
+    first_case_stats = utils.calculate_first_case_stats_batch(data, data_ni)
+    supression = utils.calculate_sct_supression_batch(data)
+    dies_off = utils.calculate_sct_dies_off_batch(data)
+    for k in range(data.shape[2]):
+        assert np.allclose([x[k] for x in outbreak_stats], loop_outbreak_stats(data[..., k]), equal_nan=True)
+        assert np.allclose([x[k] for x in first_case_stats], loop_first_case_stats(data[..., k], data_ni[..., k]), equal_nan=True)
+
+        dies_off_prob, dies_off_prob_1000, day_off = loop_sct_supression(data[..., k])
+        assert np.allclose([supression[0][k], supression[1][k]], [dies_off_prob, dies_off_prob_1000])
+        outbreak = ~np.isnan(utils.detect_outbreak_batch(data[..., k]))
+        assert np.array_equal(supression[2][:, k][outbreak], day_off, equal_nan=True)
+        assert np.allclose([supression[3][k], supression[4][k], supression[5][k]], [np.nanmean(day_off), np.nanmedian(day_off), np.nanstd(day_off)], equal_nan=True)
+
+        assert [dies_off[0][k], dies_off[1][k]] == list(loop_sct_dies_off(data[..., k]))
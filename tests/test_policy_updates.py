@@ -0,0 +1,75 @@
+import covasim as cv
+import covasim_australia.policy_updates as policy_updates
+import numpy as np
+import pandas as pd
+
+
+def make_schedule():
+    baseline = {'h': 1, 's': 0.75, 'w': 0.5, 'c': 1}
+    policies = {'Close schools': {'s': 0}, 'Work from home': {'w': 0.2, 'h': 1.5}, 'Distancing': {'w': 0.5}}
+    schedule = policy_updates.PolicySchedule(baseline, policies)
+    schedule.add('Close schools', 5, 15)
+    schedule.add('Work from home', 10)
+    schedule.add('Distancing', 8, 12)
+    return schedule
+
+
+def test_beta_timeline():
+    schedule = make_schedule()
+    timeline = schedule.compute_beta_timeline(20)
+    assert timeline.shape == (20, 4)
+    assert schedule.layer_keys == ['h', 's', 'w', 'c']
+    assert np.array_equal(timeline[0], [1, 0.75, 0.5, 1])
+    assert np.array_equal(timeline[5], [1, 0, 0.5, 1])
+    assert np.array_equal(timeline[10], [1.5, 0, 0.5*0.2*0.5, 1])
+    assert np.array_equal(timeline[15], [1.5, 0.75, 0.5*0.2, 1])
+
+    other = make_schedule()
+    other.remove('Close schools')
+    timelines = policy_updates.beta_timelines([schedule, other], 20)
+    assert timelines.shape == (2, 20, 4)
+    assert np.array_equal(timelines[1, :, 1], np.full(20, 0.75))
+
+
+def test_apply():
+    schedule = make_schedule()
+    beta_layers = {}
+
+    def record(sim):
+        beta_layers[sim.t] = dict(sim['beta_layer'])
+
+    sim = cv.Sim(pars={'pop_size': 1000, 'pop_type': 'hybrid', 'n_days': 19, 'verbose': 0}, interventions=[schedule, record])
+    sim.run()
+    assert beta_layers[5] == {'h': 1, 's': 0, 'w': 0.5, 'c': 1}
+    assert beta_layers[10] == {'h': 1.5, 's': 0, 'w': 0.5*0.2*0.5, 'c': 1}
+    assert beta_layers[19] == {'h': 1.5, 's': 0.75, 'w': 0.5*0.2, 'c': 1}
+
+
+def test_layer_beta_timeline(tmp_path):
+    layers = ['h', 's', 'w', 'c']
+    dates = pd.date_range('2020-01-01', '2020-03-01')
+    betas = pd.DataFrame({'date': dates, 'h': 1.0, 's': 1.0, 'w': 1.0, 'c': 1.0})
+    betas.loc[dates >= '2020-02-05', 's'] = 0.0
+    betas.loc[dates >= '2020-02-10', 'w'] = 0.5
+    betas.loc[dates >= '2020-02-20', 'w'] = 0.8
+    betas.loc[dates >= '2020-01-20', 'c'] = 0.3
+    betas.to_csv(tmp_path/'betas.csv', index=False)
+
+    # The same changes as a cv.change_beta() for each layer
+    change_betas = []
+    for lkey in layers:
+        change_idx = np.flatnonzero(betas[lkey].values[:-2] != betas[lkey].values[1:-1]) + 1
+        change_betas.append(cv.change_beta(days=['2020-01-01'] + [betas['date'][i] for i in change_idx], changes=[1.0] + [betas[lkey][i] for i in change_idx], layers=[lkey]))
+
+    def run(interventions):
+        beta_layers = []
+        pars = {'pop_size': 1000, 'pop_type': 'hybrid', 'start_day': '2020-02-01', 'n_days': 40, 'verbose': 0}
+        sim = cv.Sim(pars=pars, interventions=interventions + [lambda sim: beta_layers.append(dict(sim['beta_layer']))])
+        sim.run()
+        return beta_layers
+
+    beta_layers = run([policy_updates.LayerBetaTimeline(tmp_path/'betas.csv', layers)])
+    assert beta_layers == run(change_betas)
+    assert beta_layers[0]['c'] == cv.make_pars(pop_type='hybrid')['beta_layer']['c']  # The change on 2020-01-20 was before the start
+    assert beta_layers[5]['s'] == 0
+    assert policy_updates.read_layer_betas(tmp_path/'betas.csv', layers)[1] is policy_updates.read_layer_betas(tmp_path/'betas.csv', layers)[1]
@@ -0,0 +1,146 @@
+import covasim as cv
+import covasim_australia.contacts as co
+import covasim_australia.data as data
+import covasim_australia.parameters as parameters
+import covasim_australia.policy_updates as policy_updates
+import covasim_australia.population as population
+import numpy as np
+import pytest
+import sciris as sc
+
+all_lkeys = ['H', 'S', 'W', 'C', 'church', 'pSport', 'cSport', 'entertainment', 'cafe_restaurant', 'pub_bar', 'transport', 'public_parks', 'large_events', 'social']
+dynamic_lkeys = ['C', 'entertainment', 'cafe_restaurant', 'pub_bar', 'transport', 'public_parks', 'large_events']
+
+
+def make_params(pop_size):
+    loc_data = data.read_data(locations=['QLD'], db_name='input_data_Australia', epi_name=None, all_lkeys=all_lkeys, dynamic_lkeys=dynamic_lkeys)
+    return parameters.setup_params(location='QLD', loc_data=loc_data, sim_pars={'pop_size': pop_size})
+
+
+def test_population_key():
+    params = make_params(2000)
+    key = population.population_key(params, seed=1)
+    assert key == population.population_key(make_params(2000), seed=1)
+    assert key != population.population_key(params, seed=2)
+    assert key != population.population_key(make_params(3000), seed=1)
+
+    params.pars['contacts']['C'] += 1
+    assert key != population.population_key(params, seed=1)
+
+    # Parameters that don't affect the population don't change the key
+    params.pars['contacts']['C'] -= 1
+    params.pars['beta'] = 0.5
+    assert key == population.population_key(params, seed=1)
+
+
+def test_make_people_cached(tmp_path):
+    params = make_params(2000)
+    people, layer_members = population.make_people_cached(params, seed=1, cache_dir=tmp_path, verbose=False)
+    assert len(list(tmp_path.iterdir())) == 1
+
+    cached_people, cached_layer_members = population.make_people_cached(params, seed=1, cache_dir=tmp_path, verbose=False)
+    assert np.array_equal(people.age, cached_people.age)
+    assert np.array_equal(people.contacts['W']['p1'], cached_people.contacts['W']['p1'])
+    assert np.array_equal(layer_members['church'], cached_layer_members['church'])
+
+    # A file made from different inputs is never loaded
+    dirname = next(tmp_path.iterdir())
+    with pytest.raises(Exception):
+        population.load_people_arrays(dirname, key=population.population_key(params, seed=2))
+
+
+def test_popfile(tmp_path):
+    params = make_params(2000)
+    people, _ = population.make_people_cached(params, seed=1, cache_dir=tmp_path, verbose=False)
+    popfile = str(tmp_path/'ppl.pop')
+    key = population.population_key(params, seed=1)
+    assert not population.check_popfile(popfile, key)
+    population.save_popfile(popfile, people, key)
+    assert population.check_popfile(popfile, key)
+    assert not population.check_popfile(popfile, population.population_key(params, seed=2))
+
+    # Loading checks the key, so a popfile made from other inputs isn't used without noticing
+    assert np.array_equal(population.load_popfile(popfile, key=key).age, people.age)
+    assert np.array_equal(population.load_popfile(popfile, params=params, seed=1).age, people.age)
+    with pytest.raises(Exception):
+        population.load_popfile(popfile, params=params, seed=2)
+    with pytest.raises(Exception):
+        population.load_popfile(str(tmp_path/'missing.pop'), key=key)
+
+
+def test_people_arrays(tmp_path):
+    params = make_params(2000)
+    people, layer_members = population.make_people_cached(params, seed=1, cache_dir=tmp_path/'cache', verbose=False)
+    population.save_people_arrays(tmp_path/'ppl', people, layer_members)
+    loaded_people, loaded_layer_members = population.load_people_arrays(tmp_path/'ppl')
+
+    assert len(loaded_people) == len(people)
+    for key in people.keys():
+        assert np.array_equal(people[key], loaded_people[key], equal_nan=True)
+    for lkey in people.layer_keys():
+        for col in ['p1', 'p2', 'beta']:
+            assert np.array_equal(people.contacts[lkey][col], loaded_people.contacts[lkey][col])
+    for lkey in layer_members:
+        assert np.array_equal(layer_members[lkey], loaded_layer_members[lkey])
+
+    # A simulation can change the people without changing the saved population
+    sim = cv.Sim(pars={'pop_size': 2000, 'pop_infected': 20, 'n_days': 10, 'verbose': 0},
+                 popfile=population.load_popfile(str(tmp_path/'ppl')), load_pop=True)
+    sim.run()
+    assert sim.results['cum_infections'][-1] > 20
+    assert population.load_people_arrays(tmp_path/'ppl')[0].susceptible.all()
+
+
+def test_group_layers(tmp_path):
+    params = make_params(2000)
+    people, layer_members = population.make_people_cached(params, seed=1, cache_dir=tmp_path, verbose=False, group_layers=True)
+    assert population.population_key(params, seed=1, group_layers=True) != population.population_key(params, seed=1)
+    for lkey, cluster_type in params.layerchars['cluster_type'].items():
+        if lkey in params.custom_lkeys and cluster_type in ['complete', 'cluster']:
+            assert isinstance(people.contacts[lkey], co.GroupLayer)
+            assert len(people.contacts[lkey]) == 0
+
+    # Group layers are saved as their group membership arrays
+    loaded_people, _ = population.make_people_cached(params, seed=1, cache_dir=tmp_path, verbose=False, group_layers=True)
+    assert len(list(tmp_path.iterdir())) == 1
+    for lkey, layer in people.contacts.items():
+        if isinstance(layer, co.GroupLayer):
+            assert np.array_equal(layer.group_members, loaded_people.contacts[lkey].group_members)
+            assert np.array_equal(layer.group_ids, loaded_people.contacts[lkey].group_ids)
+
+    # Infections in group layers come from GroupTransmission, from someone in the same group
+    group_lkeys = [lkey for lkey, layer in people.contacts.items() if isinstance(layer, co.GroupLayer)]
+    sim = cv.Sim(pars={'pop_size': 2000, 'pop_infected': 50, 'n_days': 20, 'verbose': 0, 'beta_layer': dict.fromkeys(people.layer_keys(), 2.0)},
+                 popfile=loaded_people, load_pop=True, interventions=policy_updates.GroupTransmission())
+    sim.run()
+    group_infections = [x for x in sim.people.infection_log if x['layer'] in group_lkeys]
+    assert group_infections
+    for infection in group_infections:
+        layer = sim.people.contacts[infection['layer']]
+        assert infection['target'] in layer.find_contacts([infection['source']])
+
+    # Without GroupTransmission, or with it only for some of the group layers, there would be no transmission in them
+    pars = {'pop_size': 2000, 'pop_infected': 50, 'n_days': 20, 'verbose': 0}
+    for interventions in [[], [policy_updates.GroupTransmission(layers=group_lkeys[:1])]]:
+        with pytest.raises(Exception, match='GroupTransmission'):
+            cv.Sim(pars=pars, popfile=sc.dcp(loaded_people), load_pop=True, interventions=interventions).initialize()
+
+
+def test_undirected(tmp_path):
+    params = make_params(2000)
+    people, layer_members = population.make_people_cached(params, seed=1, cache_dir=tmp_path, verbose=False)
+    undirected_people, undirected_layer_members = population.make_people_cached(params, seed=1, cache_dir=tmp_path, verbose=False, undirected=True)
+    assert len(list(tmp_path.iterdir())) == 2
+
+    # Static layers keep one direction of each edge, the other layers are the same
+    for lkey in people.layer_keys():
+        layer, undirected_layer = people.contacts[lkey], undirected_people.contacts[lkey]
+        if lkey in ['H', 'S', 'W'] or params.layerchars['cluster_type'][lkey] in ['complete', 'cluster']:
+            assert 2*len(undirected_layer) == len(layer)
+            assert (undirected_layer['beta'] == co.undirected_beta).all()
+            assert np.array_equal(undirected_layer.members, layer.members)
+        else:
+            assert np.array_equal(undirected_layer['p1'], layer['p1'])
+            assert (undirected_layer['beta'] == 1).all()
+    for lkey in layer_members:
+        assert np.array_equal(layer_members[lkey], undirected_layer_members[lkey])
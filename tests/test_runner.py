@@ -0,0 +1,65 @@
+import covasim as cv
+import covasim_australia.ensemble as ens
+import covasim_australia.runner as runner
+import covasim_australia.utils as utils
+import numpy as np
+import sciris as sc
+
+
+def make_sim(people):
+    pars = {'pop_size': 2000, 'pop_infected': 20, 'n_days': 20, 'verbose': 0}
+    return cv.Sim(pars=pars, popfile=sc.dcp(people), load_pop=True)
+
+
+def test_run_msim():
+    people = cv.make_people(cv.Sim(pop_size=2000))
+
+    msim = cv.MultiSim(base_sim=make_sim(people))
+    msim.run(n_runs=3, reseed=True, noise=0.1, parallel=False)
+    shared_msim = runner.run_msim(make_sim(people), n_runs=3, ncpus=2, reseed=True, noise=0.1)
+
+    # Runs are identical to those from cv.MultiSim, without changing the base sim
+    assert len(shared_msim.sims) == 3
+    for sim, shared_sim in zip(msim.sims, shared_msim.sims):
+        assert np.array_equal(sim.results['new_infections'].values, shared_sim.results['new_infections'].values)
+    assert shared_msim.base_sim.people.susceptible.all()
+
+
+def test_run_msim_store(tmp_path):
+    people = cv.make_people(cv.Sim(pop_size=2000))
+    msim = runner.run_msim(make_sim(people), n_runs=3, ncpus=2, store=tmp_path/'results', store_keys=['new_infections', 'new_diagnoses'])
+
+    store = ens.EnsembleStore(tmp_path/'results')
+    assert len(store) == 3
+    assert store.keys == ['new_infections', 'new_diagnoses']
+    assert np.array_equal(store['new_infections'], np.array([sim.results['new_infections'].values for sim in msim.sims]))
+    assert np.array_equal(store.seeds, [sim['rand_seed'] for sim in msim.sims])
+    assert store.day('2020-03-05') == msim.sims[0].day('2020-03-05')
+
+    # Ensemble traces are the same whether they come from the store or the sims
+    assert np.array_equal(utils.get_individual_traces('new_diagnoses', store, convolve=True),
+                          utils.get_individual_traces('new_diagnoses', msim.sims, convolve=True))
+
+
+def test_run_batch():
+    people = cv.make_people(cv.Sim(pop_size=2000))
+    points = [{'beta': 0.01}, {'beta': 0.02}]
+
+    def make_point_sim(point, people):
+        pars = {'pop_size': 2000, 'pop_infected': 20, 'n_days': 20, 'verbose': 0, 'beta': point['beta']}
+        return cv.Sim(pars=pars, popfile=people, load_pop=True)
+
+    finished = []
+    msims = runner.run_batch(make_point_sim, points, people, n_runs=3, ncpus=2, noise=0.1, callback=lambda point_ind, msim: finished.append((point_ind, msim)))
+    assert msims == [None, None]
+    assert sorted(point_ind for point_ind, _ in finished) == [0, 1]
+    assert people.susceptible.all()
+
+    # Each point gives the same runs as run_msim(), whether or not the runs are in separate processes
+    serial_msims = runner.run_batch(make_point_sim, points, people, n_runs=3, ncpus=1, noise=0.1)
+    for point_ind, msim in finished:
+        expected = runner.run_msim(make_point_sim(points[point_ind], sc.dcp(people)), n_runs=3, ncpus=2, noise=0.1)
+        for sims in [msim.sims, serial_msims[point_ind].sims]:
+            assert len(sims) == 3
+            for sim, expected_sim in zip(sims, expected.sims):
+                assert np.array_equal(sim.results['new_infections'].values, expected_sim.results['new_infections'].values)
@@ -0,0 +1,93 @@
+import covasim as cv
+import covasim_australia.ensemble as ens
+import covasim_australia.sweep as sweep
+import numpy as np
+import pytest
+import socket
+
+
+def make_point_sim(point, people):
+    pars = {'pop_size': 2000, 'pop_infected': 20, 'n_days': 20, 'verbose': 0, 'beta': point['beta']}
+    return cv.Sim(pars=pars, popfile=people, load_pop=True)
+
+
+def test_expand_grid():
+    assert sweep.expand_grid({'a': [1, 2], 'b': ['x']}) == [{'a': 1, 'b': 'x'}, {'a': 2, 'b': 'x'}]
+    assert sweep.expand_grid([{'a': 1}]) == [{'a': 1}]
+    assert sweep.task_id({'a': 1, 'b': 'x'}) == sweep.task_id({'b': 'x', 'a': 1}) != sweep.task_id({'a': 2, 'b': 'x'})
+
+
+def test_manifest_claims(tmp_path):
+    manifest = sweep.SweepManifest(tmp_path, [{'a': 1}])
+    task = sweep.task_id({'a': 1})
+    assert list(manifest.tasks()) == [task]
+    assert manifest.claim(task)
+    assert not manifest.claim(task)
+    manifest.release(task)
+    assert manifest.claim(task)
+
+    # A claim left by a process on this host that is no longer running is taken over
+    with open(tmp_path/'claims'/task, 'w') as f:
+        f.write(f'{socket.gethostname()} 999999999')
+    assert manifest.claim(task)
+    manifest.release_claims()
+    assert manifest.claimed() == []
+
+
+def test_run_sweep(tmp_path):
+    people = cv.make_people(cv.Sim(pop_size=2000))
+    grid = {'beta': [0.01, 0.02, 0.03]}
+    tasks = [sweep.task_id(point) for point in sweep.expand_grid(grid)]
+
+    # A sweep that fails part way through keeps the tasks that finished
+    def failing_save(point, msim):
+        if point['beta'] == 0.02:
+            raise Exception('Failed')
+        ens.EnsembleStore.from_sims(tmp_path/f'{sweep.task_id(point)}.ens', msim.sims)
+
+    with pytest.raises(Exception, match='Failed'):
+        sweep.run_sweep(make_point_sim, grid, people, tmp_path, n_runs=2, ncpus=1, save=failing_save,
+                        outputs=lambda point: [tmp_path/f'{sweep.task_id(point)}.ens'], verbose=False)
+    manifest = sweep.SweepManifest(tmp_path)
+    assert manifest.finished() == [tasks[0]]
+    assert manifest.claimed() == []
+
+    # Running it again only runs the remaining tasks
+    ran = []
+    manifest = sweep.run_sweep(lambda point, people: ran.append(point['beta']) or make_point_sim(point, people), grid, people, tmp_path,
+                               n_runs=2, ncpus=1, verbose=False)
+    assert sorted(set(ran)) == [0.02, 0.03]
+    assert manifest.finished() == sorted(tasks)
+
+    # The results are the same as running the points in one go
+    msims = sweep.runner.run_batch(make_point_sim, sweep.expand_grid(grid), people, n_runs=2, ncpus=1)
+    for msim, task in zip(msims, tasks):
+        store = ens.EnsembleStore(tmp_path/f'{task}.ens')
+        assert len(store) == 2
+        assert np.array_equal(store['new_infections'], np.array([sim.results['new_infections'].values for sim in msim.sims]))
+
+    # Tasks whose outputs exist are skipped
+    ran.clear()
+    sweep.run_sweep(lambda point, people: ran.append(point['beta']) or make_point_sim(point, people), grid, people, tmp_path, n_runs=2, ncpus=1, verbose=False)
+    assert ran == []
+
+
+def test_partial_outputs(tmp_path):
+    people = cv.make_people(cv.Sim(pop_size=2000))
+    grid = [{'beta': 0.01}]
+    filename = tmp_path/f'{sweep.task_id(grid[0])}.ens'
+
+    # A store left by a process killed while writing it, with only some of its runs written
+    sims = sweep.runner.run_batch(make_point_sim, grid, people, n_runs=2, ncpus=1)[0].sims
+    store = ens.EnsembleStore.create(filename, 2, ens.result_keys(sims[0]), sims[0].npts, sims[0]['start_day'])
+    store.add(0, sims[0])
+    store.flush()
+    assert not ens.is_complete(filename)
+
+    ran = []
+    manifest = sweep.run_sweep(lambda point, people: ran.append(point['beta']) or make_point_sim(point, people), grid, people, tmp_path,
+                               n_runs=2, ncpus=1, verbose=False)
+    assert ran == [0.01]
+    assert ens.is_complete(filename)
+    assert manifest.finished() == [sweep.task_id(grid[0])]
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(['claims', 'done', 'tasks.json', filename.name])  # No temporary stores left behind
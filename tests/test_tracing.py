@@ -0,0 +1,15 @@
+import covasim_australia.utils as utils
+import numpy as np
+import pickle
+
+
+def test_notification_log():
+    log = utils.NotificationLog(capacity=2)
+    log.add(np.array([1, 1, 2]), np.array([5, 6, 5]), 3, 'H')
+    log.add(np.array([1, 3]), np.array([5, 1]), 4, 'W')
+    assert len(log) == 5
+    notifier, notified, date, layer = log.first()
+    assert notifier.tolist() == [1, 1, 2, 3] and notified.tolist() == [5, 6, 5, 1]
+    assert date.tolist() == [3, 3, 3, 4]
+    assert [log.layer_keys[x] for x in layer] == ['H', 'H', 'H', 'W']
+    assert pickle.loads(pickle.dumps(log)).first()[0].tolist() == [1, 1, 2, 3]